@@ -0,0 +1,250 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+Every process counts requests and latencies per resolved URL name in
+memory. With METRICS_DIR set, each process also writes its numbers to
+``<METRICS_DIR>/<pid>.json`` at most every METRICS_FLUSH_INTERVAL seconds,
+and the metrics endpoint adds up the files of all workers. Point
+METRICS_DIR at a directory shared by the gunicorn workers of one host.
+When the metrics are collected, the counts of workers that are no longer
+running are added to ``exited.json`` and their files removed, so the
+totals never go down when a worker is replaced.
+"""
+import atexit
+import bisect
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the environment
+    fcntl = None
+
+# Histogram upper bounds in seconds; one more bucket catches everything above
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Counts of workers that have exited, kept in METRICS_DIR
+EXITED_FILE = 'exited.json'
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # One file write at a time; never held while counting requests
+        self.flush_lock = threading.Lock()
+        self.requests = {}  # (view, method, status) -> count
+        self.latency = {}  # (view, method) -> [bucket counts, sum, count]
+        self.last_flush = time.monotonic()
+        self.loaded = False
+
+    def observe(self, view, method, status, seconds):
+        with self.lock:
+            self._load_once()
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            buckets, total, count = self.latency.get((view, method)) or ([0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0)
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency[(view, method)] = [buckets, total + seconds, count + 1]
+            now = time.monotonic()
+            due = now - self.last_flush >= settings.METRICS_FLUSH_INTERVAL
+            if due:
+                # Claimed here, so other threads do not flush the same interval
+                self.last_flush = now
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': [[*key, count] for key, count in self.requests.items()],
+                'latency': [[*key, list(buckets), total, count] for key, (buckets, total, count) in self.latency.items()],
+            }
+
+    def flush(self):
+        """Write this process's numbers to METRICS_DIR, atomically; never raises"""
+        directory = _directory()
+        if directory is None:
+            return
+        with self.flush_lock:
+            with self.lock:
+                self.last_flush = time.monotonic()
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+                _write(directory / f'{os.getpid()}.json', self.snapshot())
+            except OSError:
+                # Metrics must never fail the request that triggered the flush
+                logger.exception("Writing metrics to %s failed", directory)
+
+    def _load_once(self):
+        # A restarted worker that reuses a pid carries on from its old file
+        # instead of overwriting it, so counters never go backwards
+        if self.loaded:
+            return
+        self.loaded = True
+        directory = _directory()
+        path = directory and directory / f'{os.getpid()}.json'
+        if path and path.exists():
+            _merge(self.requests, self.latency, json.loads(path.read_text()))
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.latency.clear()
+            self.loaded = False
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def _directory():
+    return Path(settings.METRICS_DIR) if settings.METRICS_DIR else None
+
+
+def _write(path, data):
+    """Replace path with data as JSON, so readers never see half a file"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'{path.stem}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as out:
+            out.write(json.dumps(data))
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+@contextlib.contextmanager
+def _directory_lock(directory):
+    """Held by one process at a time, so exited workers are counted once"""
+    try:
+        lock = open(directory / 'exited.lock', 'a')
+    except OSError:
+        # A read-only directory, where nothing can be folded either
+        lock = None
+    if fcntl is None or lock is None:
+        yield
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _merge(requests, latency, data):
+    for view, method, status, count in data['requests']:
+        key = (view, method, status)
+        requests[key] = requests.get(key, 0) + count
+    for view, method, buckets, total, count in data['latency']:
+        current = latency.get((view, method))
+        if current is None:
+            latency[(view, method)] = [list(buckets), total, count]
+        else:
+            current[0] = [a + b for a, b in zip(current[0], buckets)]
+            current[1] += total
+            current[2] += count
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def _fold_exited(directory):
+    """Add the files of workers that are no longer running to EXITED_FILE and remove them"""
+    exited = [path for path in directory.glob('*.json') if path.stem.isdigit() and not _running(int(path.stem))]
+    if not exited:
+        return
+    requests, latency = {}, {}
+    path = directory / EXITED_FILE
+    if path.exists():
+        _merge(requests, latency, json.loads(path.read_text()))
+    for worker in exited:
+        try:
+            _merge(requests, latency, json.loads(worker.read_text()))
+        except ValueError:
+            # Half-written by a crashed worker; nothing to keep
+            pass
+    _write(path, {
+        'requests': [[*key, count] for key, count in requests.items()],
+        'latency': [[*key, buckets, total, count] for key, (buckets, total, count) in latency.items()],
+    })
+    # Only once their counts are safely in EXITED_FILE
+    for worker in exited:
+        worker.unlink(missing_ok=True)
+
+
+def collect():
+    """Numbers of all workers: the files in METRICS_DIR plus this process live"""
+    requests, latency = {}, {}
+    directory = _directory()
+    own = f'{os.getpid()}.json'
+    if directory is not None and directory.is_dir():
+        with registry.flush_lock, _directory_lock(directory):
+            try:
+                _fold_exited(directory)
+            except (OSError, ValueError):
+                # Counted as they are; folded by a later collection
+                logger.exception("Folding exited workers' metrics in %s failed", directory)
+            for path in directory.glob('*.json'):
+                if path.name == own:
+                    continue
+                try:
+                    _merge(requests, latency, json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    # Vanished or half-written by a crashed worker
+                    continue
+    _merge(requests, latency, registry.snapshot())
+    return requests, latency
+
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    requests, latency = collect()
+    lines = [
+        '# HELP library_http_requests_total HTTP requests by view, method and status code.',
+        '# TYPE library_http_requests_total counter',
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(f'library_http_requests_total{_labels(view=view, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP library_http_request_duration_seconds HTTP request latency by view and method.',
+        '# TYPE library_http_request_duration_seconds histogram',
+    ]
+    for (view, method), (buckets, total, count) in sorted(latency.items()):
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += bucket
+            labels = _labels(view=view, method=method, le=bound)
+            lines.append(f'library_http_request_duration_seconds_bucket{labels} {cumulative}')
+        labels = _labels(view=view, method=method)
+        lines.append(f'library_http_request_duration_seconds_sum{labels} {total}')
+        lines.append(f'library_http_request_duration_seconds_count{labels} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,135 @@
+"""
+Per-request SQL and latency instrumentation, and the request metrics feed.
+
+Counts the queries a request runs, their total time and how many of them
+repeat an earlier statement (the usual sign of an N+1), then reports it in
+a ``Server-Timing`` header and logs requests over the configured limits.
+A streaming response sends its headers before the body is generated, so
+its header only covers the view; the body's queries and time are added
+as it streams and the totals are checked against the limits at the end.
+
+Either middleware removes itself from the stack at startup when its
+setting (REQUEST_TIMING_ENABLED, METRICS_ENABLED) is off, so it then
+costs nothing.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Collapse IN lists so "IN (%s, %s)" and "IN (%s, %s, %s)" share a fingerprint
+_IN_LIST_RE = re.compile(r'IN \((?:%s(?:, )?)+\)')
+
+
+def fingerprint(sql):
+    return _IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryStats:
+    """Execute wrapper that records every query run on a connection"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def top_duplicates(self, limit=3):
+        return [(sql, count) for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+
+@contextmanager
+def recording(stats):
+    """Run stats as an execute wrapper on every connection"""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield
+
+
+class QueryTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with recording(stats):
+            response = self.get_response(request)
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={(time.perf_counter() - started) * 1000:.1f}',
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f'dup;desc="{stats.duplicates} duplicate queries"',
+        ])
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.streamed(response.streaming_content, request, response, stats, started)
+        else:
+            self.check(request, response, stats, started)
+        return response
+
+    def streamed(self, content, request, response, stats, started):
+        with recording(stats):
+            yield from content
+        self.check(request, response, stats, started)
+
+    def check(self, request, response, stats, started):
+        """Log the request if it went over any of the limits"""
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.duration * 1000
+        if (
+            total_ms > settings.REQUEST_TIMING_SLOW_MS
+            or stats.count > settings.REQUEST_TIMING_MAX_QUERIES
+            or stats.duplicates > settings.REQUEST_TIMING_MAX_DUPLICATES
+        ):
+            logger.warning(
+                '%s %s -> %s in %.1f ms, %d queries (%.1f ms), %d duplicates %s',
+                request.method, request.path, response.status_code, total_ms,
+                stats.count, db_ms, stats.duplicates, stats.top_duplicates(),
+            )
+
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """Counts requests and latency per resolved URL name, see backend/metrics.py"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        # URL names, not paths, so /api/books/<id>/ is one label value
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        metrics.registry.observe(view, method, response.status_code, time.perf_counter() - started)
+        return response
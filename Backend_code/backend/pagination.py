@@ -0,0 +1,111 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination used by every list endpoint.
+
+    Cursors are opaque and carry every ordering field of the last row seen,
+    so a page is fetched with ``WHERE (key1, key2) < (last1, last2)`` on an
+    indexed ordering and page N costs the same as page 1. The orderings end
+    in the primary key, so positions are unique and no OFFSET is needed for
+    rows that tie on the first field. Subclasses only pick the ordering that
+    matches an index on their table.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        # Ranked search results are paged in rank order, not by date
+        if 'search_rank' in queryset.query.annotations:
+            return ('search_rank', 'pk')
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.beyond(position, reverse))
+            except (TypeError, ValueError, ValidationError):
+                # A position value its field cannot parse
+                raise NotFound(self.invalid_cursor_message)
+
+        # One extra row tells whether there is a page after this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.next_position = self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def beyond(self, position, reverse):
+        """
+        Rows after position in the requested direction, as
+        ``a < x OR (a = x AND b < y) ...`` plus a plain bound on the first
+        field so the index range scan starts at the cursor.
+        """
+        values = self.decode_position(position)
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        first = self.ordering[0].lstrip('-')
+        bound = 'lte' if self.ordering[0].startswith('-') != reverse else 'gte'
+        return Q(**{f'{first}__{bound}': values[0]}) & condition
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.next_position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.previous_position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            values = [instance[field] for field in fields]
+        else:
+            values = [getattr(instance, field) for field in fields]
+        return json.dumps([str(value) for value in values], separators=(',', ':'))
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.MetricsMiddleware',
+    'backend.middleware.QueryTimingMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +60,23 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'backend.urls'
 
+# Per-request SQL count/time and Server-Timing headers (backend/middleware.py).
+# Requests over any of the limits are logged as warnings. Off by default:
+# the header exposes query counts to clients, so turn it on for local
+# profiling only.
+REQUEST_TIMING_ENABLED = False
+REQUEST_TIMING_SLOW_MS = 500
+REQUEST_TIMING_MAX_QUERIES = 20
+REQUEST_TIMING_MAX_DUPLICATES = 3
+
+# Request counters and latency histograms per URL name, served to admins in
+# Prometheus format at /api/metrics/ (backend/metrics.py). Under gunicorn
+# with several workers set METRICS_DIR to a directory they all share, e.g.
+# '/tmp/library-metrics', so the endpoint reports every worker.
+METRICS_ENABLED = True
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -83,6 +102,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts. A return reads
+            # its loan and then writes; with the default deferred BEGIN,
+            # two such transactions both hold read locks and one fails with
+            # "database is locked" instead of waiting. The busy timeout
+            # bounds that wait.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -126,6 +154,12 @@ STATIC_URL = 'static/'
 # Media files (uploaded by users)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Cache lifetime of content-addressed covers (books/storage.py), whose
+# bytes never change under the same URL
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Stored files saved or re-used this recently are never deleted as unused:
+# the book saving them may not have committed yet (books/dedup.py)
+MEDIA_RELEASE_GRACE = 10 * 60
 
 
 # REST_FRAMEWORK = {
@@ -137,10 +171,96 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.LibraryJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # orjson-backed JSON when it is installed, the stdlib otherwise,
+    # see backend/fastjson.py
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.fastjson.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend.fastjson.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Catalog reads (book list, detail, count, by-category) are cached with
+# versioned keys, see books/cache.py. The local-memory default is private to
+# each process, so with several workers use a shared backend instead, e.g.
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': '/var/tmp/library_cache',
+# or
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#   'LOCATION': 'redis://127.0.0.1:6379/1',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library',
+    }
 }
 
+# Lifetime of cached book list, detail and count responses
+BOOKS_CACHE_TIMEOUT = 5 * 60
+
+# Upper bound on ranked full-text matches returned for ?search= on /api/books/
+BOOK_SEARCH_MAX_RESULTS = 500
+
+# ?fuzzy=1 search: least trigram similarity (0-1) for a catalog word to
+# count as a misspelling of a search word, and how many such words are
+# tried per search word
+BOOK_FUZZY_THRESHOLD = 0.3
+BOOK_FUZZY_CANDIDATES = 3
+
+# /api/books/autocomplete/: suggestions returned by default (at most 20),
+# seconds before a worker rebuilds its in-memory index in the background
+# to pick up other workers' changes and new loan counts, and how many
+# distinct queries it remembers between changes
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_REFRESH = 5 * 60
+AUTOCOMPLETE_CACHE_SIZE = 4096
+
+# Public /api/books/by-category/: default books per category, server-side
+# cache lifetime and the Cache-Control max-age sent to browsers and proxies
+BOOKS_BY_CATEGORY_LIMIT = 20
+BOOKS_BY_CATEGORY_CACHE_TIMEOUT = 60 * 60
+BOOKS_BY_CATEGORY_MAX_AGE = 60
+
+# Bulk catalog import (/api/books/import/, manage.py import_books): rows
+# upserted per statement, and most row errors listed in the report
+BOOK_IMPORT_BATCH_SIZE = 1000
+BOOK_IMPORT_MAX_ERRORS = 1000
+
+# Cover variants written next to each upload by generate_cover_variants
+# (books/covers.py): widths in px, formats and encoder quality
+COVER_VARIANT_WIDTHS = (64, 200, 600)
+COVER_VARIANT_FORMATS = ('webp', 'jpeg')
+COVER_VARIANT_QUALITY = 80
+
+# /api/books/{id}/pdf/ streams PDFs from Python unless a front proxy takes
+# over the transfer: None, 'x-accel-redirect' (nginx, to the internal
+# location BOOK_PDF_ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile'
+BOOK_PDF_SENDFILE = None
+BOOK_PDF_ACCEL_PREFIX = '/protected-media/'
+
+# Chunked PDF/cover uploads (/api/books/uploads/, books/uploads.py): bytes
+# per chunk, largest file accepted, where chunks wait until the upload is
+# completed, and seconds of inactivity before purge_uploads removes a session
+BOOK_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+BOOK_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+BOOK_UPLOAD_DIR = BASE_DIR / 'uploads'
+BOOK_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Most books a single /api/transactions/issue-batch/ or return-batch/ call may carry
+TRANSACTION_BATCH_MAX_SIZE = 50
+
+# Rows fetched per database round trip, and written per chunk, by the
+# streaming CSV/NDJSON exports (backend/export.py)
+EXPORT_CHUNK_SIZE = 2000
+
 SIMPLE_JWT = {
     # Access token lifetime
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -160,10 +280,26 @@ SIMPLE_JWT = {
 
     # Security / behavior
     'UPDATE_LAST_LOGIN': True,
+
+    # Tokens carry username, role and staff flags (see users/authentication.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.authentication.LibraryTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.authentication.LibraryTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'users.authentication.LibraryTokenUser',
 }
 
+# Build request.user from the access token claims instead of reading the
+# user row on every request. Role changes and deactivation then take effect
+# when the access token is next refreshed.
+AUTH_STATELESS_TOKENS = False
+
+# Per-process cache of full User rows for views that need more than the claims
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_SIZE = 1024
+
 
 CORS_ALLOW_ALL_ORIGINS = True
+# Read by the PDF reader to fetch /api/books/{id}/pdf/ in ranges
+CORS_EXPOSE_HEADERS = ['Accept-Ranges', 'Content-Range', 'ETag']
 
 # Email (Console for dev)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -182,6 +318,12 @@ EMAIL_HOST_USER = 'your_email@example.com'
 EMAIL_HOST_PASSWORD = 'your_password'
 DEFAULT_FROM_EMAIL = 'library@example.com'
 
+# Email outbox, drained by `manage.py send_outbox_emails`
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BACKOFF = 60  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_LEASE = 300  # seconds a claimed batch is hidden from other workers
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
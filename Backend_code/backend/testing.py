@@ -0,0 +1,106 @@
+"""
+Query-count budgets and query-plan checks for API tests.
+
+A budget test builds a dataset of each size in ``sizes``, calls the endpoint
+once per size and fails when any call runs more than ``max_queries``
+queries, or when the count changes with the dataset size (an N+1 usually
+grows by one query per row):
+
+    class BookQueryBudgetTest(QueryBudgetMixin, APITestCase):
+
+        @query_budget(1, status=200)
+        def test_list(self, size):
+            make_books(size)
+            return lambda: self.client.get("/api/books/")
+
+The test method receives the size, sets up that much data and returns the
+call to measure. Every size runs in its own savepoint that is rolled back
+afterwards, with the caches cleared, so the sizes do not see each other's
+rows or cached responses.
+
+QueryPlanMixin.assertUsesIndex checks that the plan of a queryset names
+one of the given indexes.
+"""
+import functools
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from books import autocomplete
+from users import cache as user_cache
+
+DEFAULT_SIZES = (1, 10, 50)
+
+
+def _format_queries(context):
+    return '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, 1))
+
+
+class QueryBudgetMixin:
+    """assertQueryBudget / assertConstantQueries for TestCase subclasses"""
+
+    def reset_query_budget_state(self):
+        """Forget cached responses so each measurement does its real work"""
+        cache.clear()
+        user_cache.clear()
+        autocomplete.reset()
+
+    def assertQueryBudget(self, max_queries, call, status=None):
+        """Run call() and fail if it runs more than max_queries queries"""
+        with CaptureQueriesContext(connection) as context:
+            result = call()
+        if status is not None:
+            self.assertEqual(getattr(result, 'status_code', None), status, getattr(result, 'data', result))
+        self.assertLessEqual(
+            len(context), max_queries,
+            f"{len(context)} queries, budget is {max_queries}:\n{_format_queries(context)}",
+        )
+        return len(context)
+
+    def assertConstantQueries(self, max_queries, build, sizes=DEFAULT_SIZES, status=None):
+        """
+        For every size, call build(size) to set up data and get the call to
+        measure, then check the budget and that the count does not change.
+        """
+        counts = {}
+        for size in sizes:
+            with transaction.atomic():
+                call = build(size)
+                self.reset_query_budget_state()
+                counts[size] = self.assertQueryBudget(max_queries, call, status=status)
+                transaction.set_rollback(True)
+            self.reset_query_budget_state()
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"query count grows with the data (size: queries) {counts}",
+        )
+        return counts
+
+
+class QueryPlanMixin:
+    """query_plan / assertUsesIndex for TestCase subclasses"""
+
+    def query_plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The planner rightly prefers a seq scan on a five-row table
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, *names):
+        """Fail unless the plan of queryset uses one of the indexes names"""
+        plan = self.query_plan(queryset)
+        self.assertTrue(any(name in plan for name in names), f"none of {names} in plan:\n{plan}")
+
+
+def query_budget(max_queries, sizes=DEFAULT_SIZES, status=None):
+    """Turn `def test_x(self, size) -> call` into a constant-query budget test"""
+
+    def decorator(build):
+        @functools.wraps(build)
+        def test(self):
+            self.assertConstantQueries(max_queries, lambda size: build(self, size), sizes=sizes, status=status)
+        return test
+
+    return decorator
@@ -0,0 +1,255 @@
+import io
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from books.models import Book
+from . import fastjson, metrics
+from .middleware import QueryStats, fingerprint
+
+User = get_user_model()
+
+
+class QueryTimingMiddlewareTest(APITestCase):
+    """Tests for the Server-Timing query instrumentation"""
+
+    def setUp(self):
+        cache.clear()
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled_adds_nothing(self):
+        """Test no header is sent when the middleware is off"""
+        response = self.client.get("/api/books/count/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True)
+    def test_reports_queries_in_server_timing(self):
+        """Test the header carries wall time, SQL time and query count"""
+        response = self.client.get("/api/books/count/")
+        timing = response["Server-Timing"]
+        self.assertIn("total;dur=", timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('dup;desc="0 duplicate queries"', timing)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_MAX_QUERIES=0)
+    def test_logs_requests_over_the_limit(self):
+        """Test a request over the query limit is logged"""
+        with self.assertLogs("backend.middleware", "WARNING") as logs:
+            self.client.get("/api/books/count/")
+        self.assertIn("GET /api/books/count/ -> 200", logs.output[0])
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_MAX_QUERIES=0)
+    def test_streamed_body_is_timed_as_it_streams(self):
+        """Test the queries of a streaming body count once the body is sent, not at the headers"""
+        admin = User.objects.create_superuser(username="admin", email="admin@test.com", password="Admin@123")
+        self.client.force_authenticate(user=admin)
+        with self.assertNoLogs("backend.middleware", "WARNING"):
+            response = self.client.get("/api/transactions/export/", {"format": "ndjson"})
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+        with self.assertLogs("backend.middleware", "WARNING") as logs:
+            b"".join(response.streaming_content)
+        self.assertIn("GET /api/transactions/export/ -> 200", logs.output[0])
+        self.assertIn("1 queries", logs.output[0])
+
+    def test_counts_repeated_statements_as_duplicates(self):
+        """Test an N+1 pattern shows up as duplicates"""
+        for i in range(3):
+            Book.objects.create(
+                title=f"Book {i}", author="Author", category="Fiction",
+                isbn=f"978000000000{i}", quantity=1, available_quantity=1
+            )
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            for book_id in Book.objects.values_list("id", flat=True):
+                Book.objects.get(id=book_id)
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.duplicates, 2)
+        self.assertEqual(stats.top_duplicates()[0][1], 3)
+
+    def test_fingerprint_collapses_in_lists(self):
+        """Test IN lists of any length share one fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT 1 WHERE "id" IN (%s, %s)'),
+            fingerprint('SELECT 1 WHERE "id" IN (%s, %s, %s)'),
+        )
+
+
+class MetricsTest(APITestCase):
+    """Tests for the per-view metrics and the /api/metrics/ endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+
+    def scrape(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_admin_only(self):
+        """Test members cannot read the metrics"""
+        self.client.force_authenticate(user=self.member)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+    def test_requests_are_labelled_by_url_name(self):
+        """Test counters use URL names, not raw paths"""
+        self.client.force_authenticate(user=self.member)
+        self.client.get("/api/books/")
+        self.client.get("/api/books/1/")
+        self.client.get("/api/books/2/")
+        self.client.get("/nowhere/")
+        text = self.scrape()
+        self.assertIn('library_http_requests_total{view="books-list",method="GET",status="200"} 1', text)
+        self.assertIn('library_http_requests_total{view="books-detail",method="GET",status="404"} 2', text)
+        self.assertIn('library_http_requests_total{view="unmatched",method="GET",status="404"} 1', text)
+        self.assertNotIn("/api/books/1/", text)
+
+    def test_latency_histogram_is_cumulative(self):
+        """Test the +Inf bucket equals the request count"""
+        self.client.force_authenticate(user=self.member)
+        for _ in range(3):
+            self.client.get("/api/books/count/")
+        text = self.scrape()
+        self.assertIn(
+            'library_http_request_duration_seconds_bucket{view="books-count",method="GET",le="+Inf"} 3', text
+        )
+        self.assertIn('library_http_request_duration_seconds_count{view="books-count",method="GET"} 3', text)
+
+    def test_workers_are_aggregated_through_the_directory(self):
+        """Test the endpoint adds up the files of other workers"""
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            buckets = [0] * (len(metrics.LATENCY_BUCKETS) + 1)
+            buckets[0] = 4
+            # Any running process stands in for another worker
+            with open(os.path.join(directory, f"{os.getppid()}.json"), "w") as other_worker:
+                json.dump({
+                    "requests": [["books-count", "GET", "200", 4]],
+                    "latency": [["books-count", "GET", buckets, 0.01, 4]],
+                }, other_worker)
+
+            self.client.force_authenticate(user=self.member)
+            self.client.get("/api/books/count/")
+            text = self.scrape()
+            self.assertIn('library_http_requests_total{view="books-count",method="GET",status="200"} 5', text)
+
+            metrics.registry.flush()
+            with open(os.path.join(directory, f"{os.getpid()}.json")) as own:
+                self.assertIn(["books-count", "GET", "200", 1], json.load(own)["requests"])
+
+    def test_counts_of_exited_workers_are_kept(self):
+        """Test a file whose worker is gone is folded into exited.json, so totals never go down"""
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            counter = 'library_http_requests_total{view="books-count",method="GET",status="200"}'
+            for requests in (4, 3):
+                process = subprocess.Popen(["true"])
+                process.wait()
+                path = os.path.join(directory, f"{process.pid}.json")
+                with open(path, "w") as exited:
+                    json.dump({"requests": [["books-count", "GET", "200", requests]], "latency": []}, exited)
+                text = self.scrape()
+                self.assertFalse(os.path.exists(path))
+            self.assertIn(f"{counter} 7", text)
+            self.assertIn(f"{counter} 7", self.scrape())
+            with open(os.path.join(directory, metrics.EXITED_FILE)) as exited:
+                self.assertEqual(json.load(exited)["requests"], [["books-count", "GET", "200", 7]])
+
+    def test_concurrent_flushes_do_not_fail(self):
+        """Test flushes from many threads, or into an unwritable directory, never raise"""
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            metrics.registry.observe("books-count", "GET", 200, 0.01)
+            errors = []
+
+            def flush():
+                try:
+                    for _ in range(20):
+                        metrics.registry.flush()
+                except Exception as error:
+                    errors.append(error)
+
+            threads = [threading.Thread(target=flush) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(os.listdir(directory), [f"{os.getpid()}.json"])
+
+            blocked = os.path.join(directory, "file")
+            open(blocked, "w").close()
+            with self.settings(METRICS_DIR=os.path.join(blocked, "metrics")), \
+                    self.assertLogs("backend.metrics", "ERROR"):
+                metrics.registry.flush()
+
+
+class FastJSONTest(APITestCase):
+    """Tests for the orjson renderer and parser and their stdlib fallback"""
+
+    payload = {
+        "fine": Decimal("12.50"),
+        "issued": datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        "label": gettext_lazy("Overdue"),
+        "line": "a\u2028b",
+        "results": [{"id": 1, "title": "Clean Code"}],
+        7: "int key",
+    }
+
+    def test_renders_like_the_stock_renderer(self):
+        """Test Decimal, aware datetimes and lazy strings encode identically"""
+        self.assertEqual(fastjson.FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_falls_back_without_orjson(self):
+        """Test both classes still work when orjson is not installed"""
+        with mock.patch.object(fastjson, "orjson", None):
+            rendered = fastjson.FastJSONRenderer().render(self.payload)
+            self.assertEqual(rendered, JSONRenderer().render(self.payload))
+            parsed = fastjson.FastJSONParser().parse(io.BytesIO(rendered))
+        self.assertEqual(parsed["fine"], 12.5)
+
+    def test_parse_errors_are_bad_requests(self):
+        """Test invalid bodies and NaN raise ParseError"""
+        for body in (b"{bad", b'{"amount": NaN}'):
+            with self.assertRaises(ParseError):
+                fastjson.FastJSONParser().parse(io.BytesIO(body))
+
+    def test_api_round_trip(self):
+        """Test JSON requests and responses go through the fast classes"""
+        member = User.objects.create_user(username="member", email="member@test.com", password="Member@123")
+        self.client.force_authenticate(user=member)
+        response = self.client.post(
+            "/api/transactions/issue-batch/", {"book_ids": [999]}, format="json"
+        )
+        self.assertIsInstance(response.accepted_renderer, fastjson.FastJSONRenderer)
+        self.assertEqual(json.loads(response.content), response.data)
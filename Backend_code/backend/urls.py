@@ -22,13 +22,16 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from books.storage import serve_media
+from .views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/books/', include('books.urls')),
     path('api/transactions/', include('transactions.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),  # Admin only
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from . import metrics
+
+
+# Request metrics for Prometheus (Admin Only)
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,360 @@
+"""
+Typeahead suggestions for /api/books/autocomplete/?q=, served from memory.
+
+Each process keeps a prefix index over the words of every title and
+author: a sorted list of distinct words, the books using each word, and
+the title, author and popularity (number of loans) of each book. A query
+such as ``pragm prog`` matches books with a word starting with every
+token, most borrowed first, without touching the database. Words are
+compared lowercased and without accents, so ``godel`` finds "Gödel".
+Prefixes of up to TOP_PREFIX characters, which match the most words,
+keep their best books ranked in advance.
+
+The index is built on the first request, not at worker start. Book saves
+and deletes in this process update it once their transaction commits;
+changes made by other processes, and new loan counts, are picked up by a
+rebuild in a background thread every AUTOCOMPLETE_REFRESH seconds, while
+the old index keeps serving.
+"""
+import bisect
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+')
+# Sorts after every word that starts with a given prefix
+_PREFIX_END = '\U0010ffff'
+# The most suggestions one request gets
+MAX_LIMIT = 20
+# Prefixes this short match the most words, so their best books are kept
+# ready instead of being ranked per request
+TOP_PREFIX = 3
+
+
+def normalize(text):
+    """Lowercase words of text with accents removed: 'Gödel, Escher' -> ['godel', 'escher']"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return _WORD_RE.findall(''.join(char for char in decomposed if not unicodedata.combining(char)).casefold())
+
+
+class PrefixIndex:
+    """Prefix index over book titles and authors; not thread-safe by itself"""
+
+    def __init__(self):
+        self.words = []  # distinct words, sorted
+        self.postings = {}  # word -> ids of the books using it
+        self.books = {}  # id -> (title, author, popularity, words)
+        self.top = {}  # prefix of up to TOP_PREFIX characters -> its best MAX_LIMIT ids, best first
+        self.results = {}  # (tokens, limit) -> suggestions, until a change to a matching book
+        self.version = 0  # bumped by every change
+
+    def load(self, rows):
+        """Fill an empty index from (id, title, author, popularity) rows"""
+        for book_id, title, author, popularity in rows:
+            self.books[book_id] = (title, author, popularity, self._link(book_id, title, author))
+        self.words = sorted(self.postings)
+        # The best books of a prefix are among the best books of its words
+        best = {}
+        for word, ids in self.postings.items():
+            ranked = heapq.nsmallest(MAX_LIMIT, ids, key=self._rank)
+            for prefix in _short_prefixes([word]):
+                best.setdefault(prefix, set()).update(ranked)
+        self.top = {prefix: heapq.nsmallest(MAX_LIMIT, ids, key=self._rank) for prefix, ids in best.items()}
+
+    def _link(self, book_id, title, author):
+        # Interned, so books sharing a word share one string
+        words = tuple({sys.intern(word) for word in normalize(title) + normalize(author)})
+        for word in words:
+            self.postings.setdefault(word, set()).add(book_id)
+        return words
+
+    def _rank(self, book_id):
+        title, _, popularity, _ = self.books[book_id]
+        return -popularity, title, book_id
+
+    def add(self, book_id, title, author, popularity=None):
+        """Insert or update one book; its popularity is kept unless given"""
+        self._forget(self._add(book_id, title, author, popularity))
+
+    def update(self, rows):
+        """Insert or update (id, title, author) rows, keeping their popularity"""
+        changed = []
+        for book_id, title, author in rows:
+            changed += self._add(book_id, title, author)
+        self._forget(changed)
+
+    def _add(self, book_id, title, author, popularity=None):
+        """The words of the book before and after the change"""
+        previous = self.books.get(book_id)
+        if previous is not None:
+            popularity = previous[2] if popularity is None else popularity
+            self._remove(book_id)
+        words = self._link(book_id, title, author)
+        for word in words:
+            if len(self.postings[word]) == 1:
+                bisect.insort(self.words, word)
+        self.books[book_id] = (title, author, popularity or 0, words)
+        rank = self._rank(book_id)
+        for prefix in _short_prefixes(words):
+            best = self.top.get(prefix)
+            # A full list only takes books that beat its last one
+            if best is None or (len(best) == MAX_LIMIT and rank > self._rank(best[-1])):
+                continue
+            best.insert(bisect.bisect_left([self._rank(other) for other in best], rank), book_id)
+            del best[MAX_LIMIT:]
+        self.version += 1
+        return (previous[3] if previous else ()) + words
+
+    def remove(self, book_id):
+        self._forget(self._remove(book_id))
+
+    def _remove(self, book_id):
+        entry = self.books.pop(book_id, None)
+        if entry is None:
+            return ()
+        for word in entry[3]:
+            ids = self.postings[word]
+            ids.discard(book_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+        for prefix in _short_prefixes(entry[3]):
+            best = self.top.get(prefix)
+            if best is None or book_id not in best:
+                continue
+            if len(best) == MAX_LIMIT:
+                # The next best book is unknown; found again when next needed
+                del self.top[prefix]
+            else:
+                # The list held every book with the prefix
+                best.remove(book_id)
+        self.version += 1
+        return entry[3]
+
+    def _forget(self, words):
+        """Drop remembered results that a book with one of words could be part of"""
+        if not self.results or not words:
+            return
+        words = sorted(set(words))
+
+        def matches(token):
+            i = bisect.bisect_left(words, token)
+            return i < len(words) and words[i].startswith(token)
+
+        for key in [key for key in self.results if all(matches(token) for token in key[0])]:
+            del self.results[key]
+
+    def _span(self, prefix):
+        return bisect.bisect_left(self.words, prefix), bisect.bisect_left(self.words, prefix + _PREFIX_END)
+
+    def _suggestion(self, book_id):
+        title, author, _, _ = self.books[book_id]
+        return {'id': book_id, 'title': title, 'author': author}
+
+    def lookup(self, tokens, limit):
+        """Suggestions for tokens that are ready without ranking, as a new list, or None"""
+        cached = self.results.get((tokens, limit))
+        if cached is not None:
+            return list(cached)
+        if len(tokens) > 1 or len(tokens[0]) > TOP_PREFIX or limit > MAX_LIMIT:
+            return None
+        prefix = tokens[0]
+        if prefix not in self.top:
+            self.top[prefix] = self.rank(self.candidates(tokens)[0], (), MAX_LIMIT, ids=True)
+        return [self._suggestion(book_id) for book_id in self.top[prefix][:limit]]
+
+    def candidates(self, tokens):
+        """
+        (ids, others): a new set of the books with a word starting with the
+        token matching the fewest words, and the other tokens, still to check
+        """
+        spans = sorted(((self._span(token), token) for token in tokens), key=lambda item: item[0][1] - item[0][0])
+        (start, end), _ = spans[0]
+        ids = set()
+        for word in self.words[start:end]:
+            ids.update(self.postings[word])
+        return ids, [token for _, token in spans[1:]]
+
+    def rank(self, candidates, others, limit, ids=False):
+        """
+        The limit most borrowed candidates with a word starting with each of
+        others. Safe while the index changes: books removed meanwhile are
+        skipped.
+        """
+        books = self.books
+        entries = {book_id: books.get(book_id) for book_id in candidates}
+        if others:
+            entries = {
+                book_id: entry for book_id, entry in entries.items()
+                if entry is not None and all(any(word.startswith(token) for word in entry[3]) for token in others)
+            }
+        best = heapq.nsmallest(
+            limit, (book_id for book_id, entry in entries.items() if entry is not None),
+            key=lambda book_id: (-entries[book_id][2], entries[book_id][0], book_id),
+        )
+        if ids:
+            return best
+        return [{'id': book_id, 'title': entries[book_id][0], 'author': entries[book_id][1]} for book_id in best]
+
+    def remember(self, tokens, limit, suggestions, version):
+        """Keep suggestions ranked from the index at version, unless it changed since"""
+        if version != self.version:
+            return
+        if len(self.results) >= settings.AUTOCOMPLETE_CACHE_SIZE:
+            self.results.clear()
+        self.results[(tokens, limit)] = suggestions
+
+    def search(self, query, limit):
+        """Up to limit {'id', 'title', 'author'} matching every word of query, most borrowed first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        found = self.lookup(tokens, limit)
+        if found is None:
+            found = self.rank(*self.candidates(tokens), limit)
+            self.remember(tokens, limit, found, self.version)
+        return found
+
+
+def tokenize(query):
+    """The distinct normalized words of query, in order"""
+    return tuple(dict.fromkeys(normalize(query)))
+
+
+def _short_prefixes(words):
+    return {word[:length] for word in words for length in range(1, min(len(word), TOP_PREFIX) + 1)}
+
+
+def build_index():
+    """A new index over every book, ranked by its number of loans"""
+    transaction_model = apps.get_model('transactions', 'Transaction')
+    loans = dict(transaction_model.objects.order_by().values_list('book_id').annotate(Count('id')))
+    index = PrefixIndex()
+    rows = Book.objects.values_list('id', 'title', 'author').iterator(chunk_size=5000)
+    index.load((book_id, title, author, loans.get(book_id, 0)) for book_id, title, author in rows)
+    return index
+
+
+_index = None
+_built_at = 0.0
+_building = False
+_rebuilding = False
+# Changes committed while the first build or a rebuild runs, replayed onto
+# the new index
+_pending = []
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """This process's index: built on first use, refreshed in the background once stale"""
+    global _index, _built_at, _rebuilding
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _build()
+        return _index
+    if time.monotonic() - _built_at > settings.AUTOCOMPLETE_REFRESH:
+        with _lock:
+            if _rebuilding:
+                return _index
+            _rebuilding = True
+        threading.Thread(target=_rebuild, name='autocomplete-rebuild', daemon=True).start()
+    return _index
+
+
+def _build():
+    """The first build; a save committed while it reads the books is queued, not lost"""
+    global _index, _built_at, _building
+    with _lock:
+        _building = True
+    try:
+        index = build_index()
+        with _lock:
+            for change in _pending:
+                change(index)
+            _index, _built_at = index, time.monotonic()
+    finally:
+        with _lock:
+            _building = False
+            if not _rebuilding:
+                _pending.clear()
+
+
+def _rebuild():
+    global _index, _built_at, _rebuilding
+    try:
+        index = build_index()
+        with _lock:
+            for change in _pending:
+                change(index)
+            _index, _built_at = index, time.monotonic()
+    except Exception:
+        # The old index keeps serving; the next request tries again
+        logger.exception("Rebuilding the autocomplete index failed")
+    finally:
+        with _lock:
+            _rebuilding = False
+            if not _building:
+                _pending.clear()
+        connection.close()
+
+
+def suggest(query, limit):
+    """
+    Like PrefixIndex.search; the index is only locked to read from it, so
+    ranking many candidates does not hold up saves and other requests
+    """
+    index = get_index()
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    with _lock:
+        found = index.lookup(tokens, limit)
+        if found is not None:
+            return found
+        version = index.version
+        candidates, others = index.candidates(tokens)
+    suggestions = index.rank(candidates, others, limit)
+    with _lock:
+        index.remember(tokens, limit, suggestions, version)
+    return suggestions
+
+
+def _apply(change):
+    """Apply change(index) to the built index, if any, and to one being built"""
+    with _lock:
+        if _index is not None:
+            change(_index)
+        if _building or _rebuilding:
+            _pending.append(change)
+
+
+def index_books(books):
+    """Add or update (id, title, author) rows, after they are committed"""
+    _apply(lambda index: index.update(books))
+
+
+def unindex_book(book_id):
+    _apply(lambda index: index.remove(book_id))
+
+
+def reset():
+    """Forget the index; the next request builds a new one"""
+    global _index, _built_at
+    with _lock:
+        _index, _built_at = None, 0.0
+        _pending.clear()
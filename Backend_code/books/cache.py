@@ -0,0 +1,75 @@
+"""
+Cache keys for catalog reads.
+
+Keys embed a version number that is bumped whenever the underlying rows
+change, so stale entries simply age out of the cache. A version is bumped
+by deleting it: the next read seeds a new one from the clock, which is
+always past any version handed out before.
+
+There is one version per book (detail responses), one for the whole
+catalog (list and count) and one for the by-category payload. They are
+bumped by the Book signals and, since issuing and returning update stock
+with ``QuerySet.update()``, by the transaction views. The versions live in
+the same cache as the entries, so every process sharing a file or Redis
+cache sees a bump at once.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+BY_CATEGORY_VERSION_KEY = 'books:by_category:version'
+CATALOG_VERSION_KEY = 'books:catalog:version'
+
+# Columns shown by the by-category endpoint; saves touching none of them
+# (e.g. inventory updates) leave the cached payload valid.
+BY_CATEGORY_FIELDS = ('title', 'author', 'category', 'cover_image', 'cover_variants')
+
+
+def _version(key):
+    # Seeded from the clock so an evicted counter never reuses an old version
+    return cache.get_or_set(key, time.time_ns, None)
+
+
+def _digest(uri):
+    # Responses embed absolute URLs (pagination links, covers), so the full
+    # request URI is part of the key
+    return hashlib.md5(uri.encode()).hexdigest()
+
+
+def book_version_key(book_id):
+    return f'books:book:{book_id}:version'
+
+
+def detail_key(book_id, uri):
+    return f'books:detail:{book_id}:v{_version(book_version_key(book_id))}:{_digest(uri)}'
+
+
+def list_key(uri):
+    return f'books:list:v{_version(CATALOG_VERSION_KEY)}:{_digest(uri)}'
+
+
+def count_key():
+    return f'books:count:v{_version(CATALOG_VERSION_KEY)}'
+
+
+def _bump(keys):
+    cache.delete_many(keys)
+    # A reader in another process may cache the old rows between now and
+    # the commit, so bump once more after it
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_books(book_ids):
+    """Bump the versions of these books and of the catalog"""
+    _bump([book_version_key(book_id) for book_id in book_ids] + [CATALOG_VERSION_KEY])
+
+
+def by_category_key(limit):
+    return f'books:by_category:v{_version(BY_CATEGORY_VERSION_KEY)}:limit{limit}'
+
+
+def invalidate_by_category():
+    _bump([BY_CATEGORY_VERSION_KEY])
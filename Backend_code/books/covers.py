@@ -0,0 +1,146 @@
+"""
+Resized cover variants for catalog grids.
+
+For every uploaded cover, ``manage.py generate_cover_variants`` writes
+COVER_VARIANT_WIDTHS x COVER_VARIANT_FORMATS recompressed copies next to the
+original (``covers/x.jpg`` -> ``covers/x_200.webp``, ``covers/x_200.jpg``, ...)
+and records them in ``Book.cover_variants``:
+
+    {"source": "covers/x.jpg", "widths": {"200": {"webp": "covers/x_200.webp", ...}}}
+
+Uploads only store the original; the command is the background worker
+(``--loop``) and the backfill (``--workers`` resizes in parallel threads,
+Pillow releases the GIL while it works). A book is pending while its
+recorded source differs from its current cover, so replacing a cover
+queues it again and the API never serves variants of an old image.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F, Q
+from django.db.models.fields.json import KT
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import cache as book_cache
+from .models import Book
+
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def cover_storage():
+    return Book._meta.get_field('cover_image').storage
+
+
+def variant_name(source, width, fmt):
+    root, _ = os.path.splitext(source)
+    return f'{root}_{width}.{EXTENSIONS[fmt]}'
+
+
+def pending_books():
+    """Books with a cover whose variants are missing or were made from another file"""
+    return (
+        Book.objects.exclude(cover_image='')
+        .annotate(variants_source=KT('cover_variants__source'))
+        .filter(Q(variants_source__isnull=True) | ~Q(variants_source=F('cover_image')))
+    )
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    options = {'quality': settings.COVER_VARIANT_QUALITY}
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    image.save(buffer, PIL_FORMATS[fmt], **options)
+    return buffer.getvalue()
+
+
+def render_variants(source, storage=None):
+    """Write every variant of source to storage and return the cover_variants record"""
+    storage = storage or cover_storage()
+    try:
+        with storage.open(source, 'rb') as handle:
+            original = ImageOps.exif_transpose(Image.open(handle))
+            original.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        # Recorded, so a broken upload is not retried on every pass
+        return {'source': source, 'error': str(exc)[:200]}
+
+    if original.mode in ('RGBA', 'LA', 'P'):
+        # JPEG has no alpha; flatten transparent covers onto white
+        rgba = original.convert('RGBA')
+        original = Image.new('RGB', rgba.size, 'white')
+        original.paste(rgba, mask=rgba.getchannel('A'))
+    elif original.mode != 'RGB':
+        original = original.convert('RGB')
+
+    widths = {}
+    for width in settings.COVER_VARIANT_WIDTHS:
+        image = original.copy()
+        # Never upscale: small originals are only recompressed
+        image.thumbnail((width, original.height), Image.LANCZOS)
+        widths[str(width)] = {}
+        for fmt in settings.COVER_VARIANT_FORMATS:
+            # Named after the source, so books sharing a cover share its variants
+            name = variant_name(source, width, fmt)
+            widths[str(width)][fmt] = storage.save_derived(name, ContentFile(_encode(image, fmt)))
+    return {'source': source, 'widths': widths}
+
+
+def variant_urls(record, cover, url=None):
+    """{width: {format: url}} for a book's cover_variants, or {} if stale or missing"""
+    if not record or not cover or record.get('source') != str(cover) or 'widths' not in record:
+        return {}
+    url = url or cover_storage().url
+    return {
+        width: {fmt: url(name) for fmt, name in formats.items()}
+        for width, formats in record['widths'].items()
+    }
+
+
+def _delete_files(record, keep, storage):
+    for formats in (record or {}).get('widths', {}).values():
+        for name in formats.values():
+            if name not in keep:
+                storage.delete(name)
+
+
+def generate_pending(batch_size=100, workers=1, force=False, after_id=0):
+    """
+    Render and save variants for the next batch_size books with an id above
+    after_id. With force, books are redone even if they are up to date.
+    Returns (rendered, failed, last id seen), last id None when none were left.
+    """
+    queryset = Book.objects.exclude(cover_image='') if force else pending_books()
+    books = list(
+        queryset.filter(id__gt=after_id).order_by('id')
+        .values_list('id', 'cover_image', 'cover_variants')[:batch_size]
+    )
+    if not books:
+        return 0, 0, None
+    storage = cover_storage()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        records = list(pool.map(lambda book: render_variants(book[1], storage), books))
+
+    rendered = failed = 0
+    for (book_id, source, previous), record in zip(books, records):
+        # Only if the cover was not replaced meanwhile; otherwise the next
+        # pass picks up the new one
+        updated = Book.objects.filter(id=book_id, cover_image=source).update(cover_variants=record)
+        if updated and (previous or {}).get('source') == source:
+            # Re-rendered, e.g. with other widths. Variants of a replaced cover
+            # are removed with it once no book uses it (books/dedup.py)
+            keep = {name for formats in record.get('widths', {}).values() for name in formats.values()}
+            _delete_files(previous, keep, storage)
+        if 'error' in record:
+            failed += 1
+        else:
+            rendered += 1
+    book_cache.invalidate_books([book_id for book_id, _, _ in books])
+    book_cache.invalidate_by_category()
+    return rendered, failed, books[-1][0]
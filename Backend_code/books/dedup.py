@@ -0,0 +1,151 @@
+"""
+Reference counting and migration for the content-addressed media store.
+
+A stored file can back the cover or PDF of any number of books, so it is
+only deleted once no Book row refers to it any more. The count is read
+from the table (an indexed lookup per column) rather than kept in a
+counter, so it cannot drift from the rows that hold the names. Releases
+run after the transaction that replaced or deleted the file commits.
+
+A save of bytes already stored writes nothing but touches the file, and
+files touched within MEDIA_RELEASE_GRACE seconds are never released: the
+book re-using one may not have committed when the references are counted.
+``manage.py dedupe_media`` later removes files skipped that way.
+
+``manage.py dedupe_media`` moves files saved under their upload names
+into the content-addressed layout and reports the space saved.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache as book_cache
+from .covers import variant_name
+from .models import FILE_FIELDS, Book
+from .storage import content_hash, content_storage, is_content_addressed
+
+
+def references(name):
+    """Books whose cover or PDF is the stored file `name`"""
+    query = Q()
+    for field in FILE_FIELDS:
+        query |= Q(**{field: name})
+    return Book.objects.filter(query).count()
+
+
+def derived_files(name):
+    """Cover variants written next to a stored file by generate_cover_variants"""
+    return [
+        variant_name(name, width, fmt)
+        for width in settings.COVER_VARIANT_WIDTHS
+        for fmt in settings.COVER_VARIANT_FORMATS
+    ]
+
+
+def recently_saved(name):
+    """True while a book saving the stored file `name` may still be uncommitted"""
+    try:
+        modified = content_storage.get_modified_time(name)
+    except FileNotFoundError:
+        return False
+    return timezone.now() - modified < timedelta(seconds=settings.MEDIA_RELEASE_GRACE)
+
+
+def release(names):
+    """Delete each stored file no book uses any more, with its cover variants"""
+    deleted = []
+    for name in sorted(set(filter(None, names))):
+        # References are counted last, right before the delete
+        if recently_saved(name) or references(name):
+            continue
+        content_storage.delete(name)
+        for derived in derived_files(name):
+            content_storage.delete(derived)
+        deleted.append(name)
+    return deleted
+
+
+def stored_files():
+    """Content-addressed names of every cover and PDF on disk"""
+    for field in FILE_FIELDS:
+        top = Book._meta.get_field(field).upload_to.rstrip('/')
+        try:
+            shards, _ = content_storage.listdir(top)
+        except FileNotFoundError:
+            continue
+        for shard in shards:
+            for name in content_storage.listdir(posixpath.join(top, shard))[1]:
+                path = posixpath.join(top, shard, name)
+                if is_content_addressed(path):
+                    yield path
+
+
+def purge_unused():
+    """Release every stored file no book uses, e.g. ones a release() skipped as recent"""
+    return release(list(stored_files()))
+
+
+def dedupe_existing(dry_run=False):
+    """
+    Move every file still stored under its upload name to its content
+    hash and point the books at it. Cover variants of moved covers are
+    dropped; generate_cover_variants renders them again. Returns a report
+    of what was (or, with dry_run, would be) moved and the bytes saved.
+    """
+    report = {'books': 0, 'files': 0, 'missing': 0, 'bytes_before': 0}
+    targets = {}
+    sizes = {}
+    stale = set()
+    rows = Book.objects.order_by('id').values_list('id', 'cover_variants', *FILE_FIELDS)
+    for book_id, cover_variants, *names in rows.iterator():
+        changes = {}
+        for field, name in zip(FILE_FIELDS, names):
+            if not name or is_content_addressed(name):
+                continue
+            if name not in targets:
+                targets[name] = _move(name, dry_run)
+                if targets[name] is None:
+                    report['missing'] += 1
+                    continue
+                target, size = targets[name]
+                report['files'] += 1
+                report['bytes_before'] += size
+                sizes[target] = size
+            if targets[name] is not None:
+                changes[field] = targets[name][0]
+        if not changes:
+            continue
+        report['books'] += 1
+        if 'cover_image' in changes:
+            changes['cover_variants'] = {}
+            stale.update(
+                variant for formats in (cover_variants or {}).get('widths', {}).values()
+                for variant in formats.values()
+            )
+        if not dry_run:
+            Book.objects.filter(id=book_id).update(**changes)
+            book_cache.invalidate_books([book_id])
+
+    report['stored'] = len(sizes)
+    report['bytes_after'] = sum(sizes.values())
+    if not dry_run:
+        # Every book now points at the new names
+        for name in [*targets, *stale]:
+            content_storage.delete(name)
+        book_cache.invalidate_by_category()
+    return report
+
+
+def _move(name, dry_run):
+    """(content-addressed name, size) for the upload-named file `name`, stored unless dry_run"""
+    try:
+        size = content_storage.size(name)
+        with content_storage.open(name, 'rb') as handle:
+            if dry_run:
+                return content_storage.hashed_name(name, content_hash(handle)), size
+            return content_storage.save(name, handle), size
+    except FileNotFoundError:
+        return None
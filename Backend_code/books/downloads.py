@@ -0,0 +1,186 @@
+"""
+Authenticated PDF downloads for /api/books/{id}/pdf/.
+
+The file is streamed from storage in FileResponse blocks, so a large PDF
+is never held in worker memory. Readers can seek and resume with a
+single ``Range: bytes=...`` (206 Partial Content); a Range guarded by a
+stale ``If-Range`` gets the whole file, as HTTP asks. ``If-None-Match``
+and ``If-Modified-Since`` answer 304 without opening the file.
+
+With BOOK_PDF_SENDFILE set, the permission and freshness checks still
+run here but the bytes are sent by the front proxy:
+
+* ``'x-accel-redirect'`` (nginx): ``X-Accel-Redirect`` to
+  BOOK_PDF_ACCEL_PREFIX + the file name, which must be an ``internal``
+  location aliased to MEDIA_ROOT.
+* ``'x-sendfile'`` (Apache mod_xsendfile, lighttpd): ``X-Sendfile`` with
+  the file's path on disk.
+
+The proxy then serves Range requests itself.
+"""
+import hashlib
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import renderers, status
+from rest_framework.exceptions import NotFound
+
+from backend.fastjson import dumps
+
+from .models import Book
+
+CONTENT_TYPE = 'application/pdf'
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class PDFRenderer(renderers.BaseRenderer):
+    """Lets clients ask for application/pdf; errors are still written as JSON"""
+    media_type = CONTENT_TYPE
+    format = 'pdf'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return dumps(data) if data is not None else b''
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def pdf_storage():
+    return Book._meta.get_field('pdf_file').storage
+
+
+def parse_range(header, size):
+    """
+    (start, end) byte offsets, both inclusive, for a single-range Range
+    header, or None when the whole file should be sent: no header, a
+    malformed one, or several ranges. RangeNotSatisfiable when the range
+    starts past the end of the file.
+    """
+    match = _RANGE.fullmatch((header or '').replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start >= size:
+            raise RangeNotSatisfiable
+        return start, min(end, size - 1)
+    if not last:
+        return None
+    # bytes=-N: the last N bytes
+    suffix = int(last)
+    if suffix == 0 or size == 0:
+        raise RangeNotSatisfiable
+    return max(0, size - suffix), size - 1
+
+
+class RangeFile:
+    """Read-only view of length bytes of an open file, from its current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _not_modified(request, etag, modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # If-Modified-Since is ignored when If-None-Match is sent
+        return if_none_match.strip() == '*' or etag in parse_etags(if_none_match)
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(modified) <= since
+
+
+def _range_applies(request, etag, modified):
+    """False when If-Range names another version of the file"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Weak tags never match for ranges
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(modified)
+
+
+def _handoff(name, storage):
+    response = HttpResponse(content_type=CONTENT_TYPE)
+    if settings.BOOK_PDF_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.BOOK_PDF_ACCEL_PREFIX.rstrip('/') + '/' + quote(name)
+    else:
+        response['X-Sendfile'] = storage.path(name)
+    return response
+
+
+def pdf_response(request, name, storage=None, filename=None):
+    """Response serving the stored PDF `name` for a GET or HEAD request, offered as filename"""
+    storage = storage or pdf_storage()
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name).timestamp()
+    except (OSError, NotImplementedError):
+        raise NotFound('The PDF file for this book is missing.')
+    etag = '"%s"' % hashlib.md5(f'{name}:{size}:{modified}'.encode()).hexdigest()
+
+    byte_range = None
+    if _not_modified(request, etag, modified):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    elif settings.BOOK_PDF_SENDFILE:
+        response = _handoff(name, storage)
+    else:
+        try:
+            if _range_applies(request, etag, modified):
+                byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+        else:
+            start, end = byte_range or (0, size - 1)
+            length = end - start + 1 if size else 0
+            response = _file_response(request, name, storage, start, length, size, filename)
+            response['Content-Length'] = str(length)
+            if byte_range:
+                response.status_code = status.HTTP_206_PARTIAL_CONTENT
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    # Revalidated on every use; only the reader's own browser may keep it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _file_response(request, name, storage, start, length, size, filename=None):
+    filename = filename or os.path.basename(name)
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+        return response
+    file = storage.open(name, 'rb')
+    if length < size:
+        file.seek(start)
+        file = RangeFile(file, length)
+    # The whole file is passed as is, so servers with wsgi.file_wrapper
+    # can sendfile() it
+    return FileResponse(file, content_type=CONTENT_TYPE, filename=filename)
@@ -0,0 +1,226 @@
+"""
+Bulk catalog import from CSV or JSON Lines.
+
+Rows are read one at a time from the file, validated, and upserted by
+ISBN in batches: one locking SELECT and one ``INSERT ... ON CONFLICT DO
+UPDATE`` per batch. Memory therefore depends on the batch size, not on
+the file size. Invalid rows are skipped and listed in the report (up to
+BOOK_IMPORT_MAX_ERRORS of them) with their line number.
+
+Columns: ``title``, ``author`` and ``isbn`` are required; ``category``
+and ``quantity`` (default 1) are optional. ISBN-10s are converted to
+ISBN-13 so each book has one key. When a book already exists, its
+available copies move by the change in quantity, so copies out on loan
+stay accounted for.
+
+bulk_create sends no signals, so the search indexes and catalog caches
+are refreshed once per batch.
+"""
+import codecs
+import csv
+import json
+import re
+
+from django.conf import settings
+from django.db import transaction
+
+from . import autocomplete
+from . import cache as book_cache
+from . import search
+from .models import Book
+
+REQUIRED_COLUMNS = ('title', 'author', 'isbn')
+UPDATE_FIELDS = ('title', 'author', 'category', 'quantity', 'available_quantity')
+FORMATS = ('csv', 'jsonl')
+
+_ISBN_SEPARATORS = re.compile(r'[\s-]')
+_ISBN10 = re.compile(r'\d{9}[\dX]')
+_ISBN13 = re.compile(r'97[89]\d{10}')
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be read, e.g. a CSV without an isbn column"""
+
+
+class RowError(ValueError):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def isbn13_check_digit(first12):
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(first12))
+    return str(-total % 10)
+
+
+def normalize_isbn(value):
+    """ISBN-13 digits for an ISBN-10 or ISBN-13 with or without hyphens"""
+    isbn = _ISBN_SEPARATORS.sub('', str(value)).upper()
+    if _ISBN10.fullmatch(isbn):
+        total = sum((10 - i) * (10 if char == 'X' else int(char)) for i, char in enumerate(isbn))
+        if total % 11:
+            raise ValueError('ISBN-10 check digit does not match.')
+        first12 = '978' + isbn[:9]
+        return first12 + isbn13_check_digit(first12)
+    if _ISBN13.fullmatch(isbn):
+        if isbn13_check_digit(isbn[:12]) != isbn[12]:
+            raise ValueError('ISBN-13 check digit does not match.')
+        return isbn
+    raise ValueError('Expected a 10 or 13 digit ISBN.')
+
+
+def clean_row(record):
+    """Validated field values for one input row, or RowError"""
+    errors = {}
+    values = {}
+    for name in ('title', 'author', 'category'):
+        value = str(record.get(name) or '').strip()
+        max_length = Book._meta.get_field(name).max_length
+        if not value and name in REQUIRED_COLUMNS:
+            errors[name] = 'This field is required.'
+        elif len(value) > max_length:
+            errors[name] = f'Ensure this field has no more than {max_length} characters.'
+        values[name] = value
+
+    try:
+        values['isbn'] = normalize_isbn(record.get('isbn') or '')
+    except ValueError as exc:
+        errors['isbn'] = str(exc)
+
+    quantity = record.get('quantity')
+    try:
+        values['quantity'] = 1 if quantity in (None, '') else int(quantity)
+        if values['quantity'] < 0 or isinstance(quantity, float) and not quantity.is_integer():
+            raise ValueError
+    except (TypeError, ValueError):
+        errors['quantity'] = 'Expected a whole number of copies, 0 or more.'
+
+    if errors:
+        raise RowError(errors)
+    return values
+
+
+def read_csv(stream):
+    """(line, record) for each row of a binary CSV stream with a header row"""
+    reader = csv.DictReader(codecs.getreader('utf-8-sig')(stream))
+    columns = [(name or '').strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ImportFormatError(f"Missing column(s): {', '.join(missing)}")
+    reader.fieldnames = columns
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(stream):
+    """(line, record) for each line of a binary JSON Lines stream; bad lines give RowError"""
+    for line, raw in enumerate(codecs.getreader('utf-8-sig')(stream), 1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield line, RowError({'line': f'Invalid JSON: {exc}'})
+            continue
+        if not isinstance(record, dict):
+            yield line, RowError({'line': 'Expected a JSON object.'})
+            continue
+        yield line, record
+
+
+def read_rows(stream, file_format):
+    return read_jsonl(stream) if file_format == 'jsonl' else read_csv(stream)
+
+
+def guess_format(name, content_type=''):
+    if (name or '').lower().endswith(('.jsonl', '.ndjson')) or 'json' in (content_type or ''):
+        return 'jsonl'
+    return 'csv'
+
+
+class BookImporter:
+    """Upserts rows from read_rows() into Book, batch_size rows per statement"""
+
+    def __init__(self, batch_size=None, max_errors=None):
+        self.batch_size = batch_size or settings.BOOK_IMPORT_BATCH_SIZE
+        self.max_errors = settings.BOOK_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.rows = self.created = self.updated = self.failed = 0
+        self.errors = []
+        self.error = None
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def run(self, rows):
+        """Import every row; a file that stops being readable ends the run with report['error']"""
+        batch = {}
+        try:
+            for line, record in rows:
+                self.rows += 1
+                try:
+                    if isinstance(record, RowError):
+                        raise record
+                    values = clean_row(record)
+                except RowError as exc:
+                    self.add_error(line, exc.errors)
+                    continue
+                # A later row for the same ISBN wins; one row per key keeps
+                # ON CONFLICT from touching a row twice
+                batch[values['isbn']] = values
+                if len(batch) >= self.batch_size:
+                    self.upsert(batch)
+                    batch = {}
+        except ImportFormatError as exc:
+            self.error = str(exc)
+        except (csv.Error, UnicodeDecodeError) as exc:
+            self.error = f"Unreadable file after {self.rows} row(s): {exc}"
+        # Rows read before a format error are still imported
+        self.upsert(batch)
+        return self.report()
+
+    def upsert(self, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            existing = {
+                isbn: (book_id, quantity, available)
+                for isbn, book_id, quantity, available in (
+                    Book.objects.select_for_update().filter(isbn__in=list(batch))
+                    .values_list('isbn', 'id', 'quantity', 'available_quantity')
+                )
+            }
+            books = []
+            for isbn, values in batch.items():
+                book = Book(**values, available_quantity=values['quantity'])
+                if isbn in existing:
+                    _, quantity, available = existing[isbn]
+                    book.available_quantity = max(0, available + values['quantity'] - quantity)
+                books.append(book)
+            Book.objects.bulk_create(
+                books, update_conflicts=True, unique_fields=['isbn'], update_fields=UPDATE_FIELDS,
+            )
+            for book in books:
+                if book.isbn in existing:
+                    book.pk = existing[book.isbn][0]
+            # Backends that cannot return ids leave new books unindexed
+            indexed = [book for book in books if book.pk is not None]
+            search.index_books(indexed)
+            rows = [(book.pk, book.title, book.author) for book in indexed]
+            transaction.on_commit(lambda: autocomplete.index_books(rows))
+            book_cache.invalidate_books([book_id for book_id, _, _ in existing.values()])
+            book_cache.invalidate_by_category()
+        self.updated += len(existing)
+        self.created += len(batch) - len(existing)
+
+    def report(self):
+        return {
+            'error': self.error,
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
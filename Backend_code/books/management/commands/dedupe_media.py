@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from books.dedup import dedupe_existing, purge_unused
+
+
+def human_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Move covers and PDFs stored under their upload names to content-addressed names, "
+        "then delete stored files no book uses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report what would be moved and saved')
+
+    def handle(self, *args, **options):
+        report = dedupe_existing(dry_run=options['dry_run'])
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(
+            f"{verb} {report['files']} file(s) used by {report['books']} book(s) "
+            f"into {report['stored']} stored file(s)"
+        )
+        if report['missing']:
+            self.stdout.write(self.style.WARNING(f"{report['missing']} file(s) are missing and were left as they are"))
+        saved = report['bytes_before'] - report['bytes_after']
+        self.stdout.write(self.style.SUCCESS(
+            f"{human_size(report['bytes_before'])} -> {human_size(report['bytes_after'])}, {human_size(saved)} saved"
+        ))
+        if report['books'] and not options['dry_run']:
+            self.stdout.write("Run generate_cover_variants to render the moved covers' thumbnails again")
+        if not options['dry_run']:
+            self.stdout.write(f"Deleted {len(purge_unused())} unused stored file(s)")
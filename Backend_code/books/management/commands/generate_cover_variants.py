@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.covers import generate_pending
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants of book covers (worker and backfill)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='covers resized in parallel (threads)')
+        parser.add_argument('--batch-size', type=int, default=100, help='books claimed per pass')
+        parser.add_argument('--force', action='store_true',
+                            help='regenerate every cover, e.g. after changing COVER_VARIANT_WIDTHS')
+        parser.add_argument('--loop', action='store_true',
+                            help='keep polling for new uploads instead of exiting once done')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--workers and --batch-size must be positive")
+        started = time.perf_counter()
+        total_rendered = total_failed = 0
+        after_id = 0
+        while True:
+            rendered, failed, last_id = generate_pending(
+                options['batch_size'], options['workers'], options['force'], after_id,
+            )
+            total_rendered += rendered
+            total_failed += failed
+            if last_id is not None:
+                self.stdout.write(f"Rendered {rendered}, failed {failed} (up to book {last_id})")
+                after_id = last_id
+                continue
+            if not options['loop']:
+                break
+            # Caught up: start over from the first book with the next poll
+            after_id = 0
+            options['force'] = False
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Covers done: {total_rendered} rendered, {total_failed} failed "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,47 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books import importer
+
+
+class Command(BaseCommand):
+    help = "Create or update books from a CSV or JSON Lines file, matched by ISBN"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSONL file')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='file format (default: from the extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='rows per upsert (default: BOOK_IMPORT_BATCH_SIZE)')
+        parser.add_argument('--report', help='write the full JSON report, errors included, to this file')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        file_format = options['format'] or importer.guess_format(options['path'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = importer.BookImporter(batch_size=options['batch_size']).run(
+                    importer.read_rows(stream, file_format)
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+        elapsed = time.perf_counter() - started
+
+        if options['report']:
+            with open(options['report'], 'w') as out:
+                json.dump(report, out, indent=2)
+        for error in report['errors'][:20]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report['failed'] > 20:
+            self.stderr.write(f"... {report['failed'] - 20} more row error(s)")
+        summary = (
+            f"{report['rows']} row(s) in {elapsed:.2f}s: {report['created']} created, "
+            f"{report['updated']} updated, {report['failed']} failed"
+        )
+        if report['error']:
+            raise CommandError(f"{report['error']} ({summary})")
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from books.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = "Delete chunked upload sessions that were abandoned, with their chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=settings.BOOK_UPLOAD_EXPIRY,
+                            help='seconds a session may stay idle before it is purged')
+
+    def handle(self, *args, **options):
+        if options['max_age'] < 0:
+            raise CommandError("--max-age cannot be negative")
+        sessions, directories = purge_stale(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {sessions} stale upload(s) and {directories} orphaned chunk folder(s)"
+        ))
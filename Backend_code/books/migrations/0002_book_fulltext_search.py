@@ -0,0 +1,47 @@
+from django.db import migrations, OperationalError
+
+FTS_TABLE = 'books_book_fts'
+PG_SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, '') "
+    "|| ' ' || coalesce(category, ''))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, author, category, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite compiled without FTS5, search falls back to icontains
+            return
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author, category) "
+            "SELECT id, title, author, category FROM books_book"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS books_book_search_gin ON books_book USING GIN ({PG_SEARCH_VECTOR})"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS books_book_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['created_at', 'id'], name='book_created_id_idx'),
+        ),
+    ]
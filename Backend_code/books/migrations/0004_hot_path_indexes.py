@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category'], name='book_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author'], name='book_author_idx'),
+        ),
+    ]
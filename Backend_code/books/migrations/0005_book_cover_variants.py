@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+import books.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(storage=books.storage.ContentAddressedStorage(), upload_to='covers/'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='pdf_file',
+            field=models.FileField(blank=True, null=True, storage=books.storage.ContentAddressedStorage(), upload_to='pdfs/'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['cover_image'], name='book_cover_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['pdf_file'], name='book_pdf_file_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations, OperationalError
+
+FTS_TABLE = 'books_book_fts'
+FTS_VOCAB_TABLE = 'books_book_fts_vocab'
+TRIGRAM_TABLE = 'books_word_trigram'
+PG_TRIGRAM_DOCUMENT = (
+    "lower(coalesce(title, '') || ' ' || coalesce(author, '') "
+    "|| ' ' || coalesce(category, ''))"
+)
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def create_trigram_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, row)"
+            )
+        except OperationalError:
+            # No FTS5 (see 0002), fuzzy search falls back to the plain one
+            return
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TRIGRAM_TABLE} ("
+            "trigram TEXT NOT NULL, size INTEGER NOT NULL, word TEXT NOT NULL, "
+            "PRIMARY KEY (trigram, size, word)) WITHOUT ROWID"
+        )
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"SELECT term FROM {FTS_VOCAB_TABLE}")
+            words = [row[0] for row in cursor.fetchall() if len(row[0]) >= 3]
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO {TRIGRAM_TABLE} (trigram, size, word) VALUES (%s, %s, %s)",
+                [[trigram, len(grams), word] for word in words for grams in [trigrams(word)] for trigram in grams],
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS books_book_trgm_gin ON books_book "
+            f"USING GIN (({PG_TRIGRAM_DOCUMENT}) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TRIGRAM_TABLE}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_VOCAB_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS books_book_trgm_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -1,4 +1,14 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .storage import content_storage
+
+# File columns kept in content_storage; a stored file is deleted once none
+# of them refers to it (books/dedup.py)
+FILE_FIELDS = ('cover_image', 'pdf_file')
 
 class Book(models.Model):
     title = models.CharField(max_length=255)
@@ -7,9 +17,66 @@ class Book(models.Model):
     category = models.CharField(max_length=50)
     quantity = models.IntegerField()
     available_quantity = models.IntegerField()
-    cover_image = models.ImageField(upload_to='covers/')
-    pdf_file = models.FileField(upload_to='pdfs/', null=True, blank=True)
+    cover_image = models.ImageField(upload_to='covers/', storage=content_storage)
+    # Resized copies of cover_image, written by generate_cover_variants (books/covers.py)
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
+    pdf_file = models.FileField(upload_to='pdfs/', storage=content_storage, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalog (newest first)
+            models.Index(fields=['created_at', 'id'], name='book_created_id_idx'),
+            # Category listings and author lookups. created_at alone needs no
+            # index of its own, it leads book_created_id_idx
+            models.Index(fields=['category'], name='book_category_idx'),
+            models.Index(fields=['author'], name='book_author_idx'),
+            # How many books still use a stored file, when one is replaced or deleted
+            models.Index(fields=['cover_image'], name='book_cover_image_idx'),
+            models.Index(fields=['pdf_file'], name='book_pdf_file_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        book = super().from_db(db, field_names, values)
+        # The stored files as loaded, so a save that replaces one can release it
+        book._loaded_files = {field: book.__dict__[field] for field in FILE_FIELDS if field in book.__dict__}
+        return book
+
     def __str__(self):
         return self.title
+
+
+class ChunkedUpload(models.Model):
+    """Resumable upload of a book PDF or cover, sent in numbered chunks (books/uploads.py)"""
+    PDF = 'pdf'
+    COVER = 'cover'
+    KIND_CHOICES = [(PDF, 'PDF'), (COVER, 'Cover image')]
+
+    # Random, so one admin cannot guess another's session
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Hex SHA-256 of the whole file, checked on assembly when the client sent it
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Moved forward by every chunk; purge_uploads drops sessions idle too long
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='upload_updated_idx'),
+        ]
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"{self.filename} ({self.kind}, {self.size} bytes)"
@@ -0,0 +1,6 @@
+from backend.pagination import KeysetPagination
+
+
+class BookCursorPagination(KeysetPagination):
+    """Newest books first, keyed on the (created_at, id) index"""
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,341 @@
+"""
+Full-text search over the book catalog.
+
+On SQLite the catalog is mirrored into an FTS5 virtual table that the Book
+signals keep in sync. On PostgreSQL a GIN index over a ``tsvector`` expression
+is used instead, which the database maintains by itself. Any other backend
+falls back to DRF's ``icontains`` SearchFilter.
+
+``?fuzzy=1`` makes the search typo-tolerant, using trigrams: the sets of
+three-letter runs of each word, compared like pg_trgm does. On SQLite every
+distinct catalog word is listed under its trigrams in a side table, so each
+misspelled search word is first corrected to the closest catalog words and
+the corrected words are then matched through the FTS table. On PostgreSQL
+pg_trgm's ``word_similarity`` is used over a GIN trigram index. Both match
+the same fields as the plain search: title, author and category.
+"""
+import math
+import re
+
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError, OperationalError
+from django.db.models import Case, When, Value, IntegerField
+from rest_framework.filters import SearchFilter
+
+from .autocomplete import normalize
+
+FTS_TABLE = 'books_book_fts'
+INDEXED_FIELDS = ('title', 'author', 'category')
+
+# Must match the expression of the GIN index created in migration 0002,
+# otherwise PostgreSQL will not use the index.
+PG_SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, '') "
+    "|| ' ' || coalesce(category, ''))"
+)
+
+# Distinct catalog words by trigram, and FTS5's live list of indexed
+# words with the number of books using each (migration 0008)
+TRIGRAM_TABLE = 'books_word_trigram'
+FTS_VOCAB_TABLE = 'books_book_fts_vocab'
+# Must match the expression of the trigram index created in migration 0008
+PG_TRIGRAM_DOCUMENT = (
+    "lower(coalesce(title, '') || ' ' || coalesce(author, '') "
+    "|| ' ' || coalesce(category, ''))"
+)
+
+# Shorter words are too short to correct and are matched as typed
+MIN_FUZZY_WORD = 3
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def max_results():
+    return settings.BOOK_SEARCH_MAX_RESULTS
+
+
+def tokenize(terms):
+    """Split search terms into lowercase word tokens"""
+    tokens = []
+    for term in terms:
+        tokens.extend(token.lower() for token in _TOKEN_RE.findall(term))
+    return tokens
+
+
+def index_book(book):
+    """Write one book into the SQLite FTS table (no-op on other backends)"""
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, category) VALUES (%s, %s, %s, %s)",
+                [book.pk, book.title, book.author, book.category],
+            )
+            _add_words(cursor, [book.title, book.author, book.category])
+    except OperationalError:
+        # SQLite built without FTS5, nothing to keep in sync
+        pass
+
+
+def index_books(books):
+    """index_book for many books at once, e.g. after a bulk upsert"""
+    if connection.vendor != 'sqlite' or not books:
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[book.pk] for book in books])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, category) VALUES (%s, %s, %s, %s)",
+                [[book.pk, book.title, book.author, book.category] for book in books],
+            )
+            _add_words(cursor, [text for book in books for text in (book.title, book.author, book.category)])
+    except OperationalError:
+        pass
+
+
+def unindex_book(book_id):
+    """Remove one book from the SQLite FTS table"""
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+    except OperationalError:
+        pass
+
+
+def rebuild_index():
+    """Repopulate the SQLite FTS table from books_book, e.g. after bulk_create"""
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, category) "
+                "SELECT id, title, author, category FROM books_book"
+            )
+            # Also drops the words no book uses any more
+            cursor.execute(f"DELETE FROM {TRIGRAM_TABLE}")
+            cursor.execute(f"SELECT term FROM {FTS_VOCAB_TABLE}")
+            _insert_trigrams(cursor, [row[0] for row in cursor.fetchall()])
+    except OperationalError:
+        pass
+
+
+def ranked_book_ids(terms, limit=None):
+    """
+    Return ids of matching books, best match first.
+
+    Every token is matched as a prefix and all tokens must match. Returns
+    None when no full-text index is available on this database.
+    """
+    tokens = tokenize(terms)
+    if not tokens:
+        return None
+    limit = limit or max_results()
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s"
+        params = [match, limit]
+    elif connection.vendor == 'postgresql':
+        match = ' & '.join(f'{token}:*' for token in tokens)
+        sql = (
+            f"SELECT id FROM books_book WHERE {PG_SEARCH_VECTOR} @@ to_tsquery('simple', %s) "
+            f"ORDER BY ts_rank({PG_SEARCH_VECTOR}, to_tsquery('simple', %s)) DESC, id LIMIT %s"
+        )
+        params = [match, match, limit]
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+    except OperationalError:
+        return None
+
+
+def trigrams(word):
+    """pg_trgm-style trigrams of one word: 'cat' -> {'  c', ' ca', 'cat', 'at '}"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(word, other):
+    """Shared trigrams over all trigrams of both words, from 0 to 1"""
+    first, second = trigrams(word), trigrams(other)
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def _insert_trigrams(cursor, words):
+    words = {word for word in words if len(word) >= MIN_FUZZY_WORD}
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO {TRIGRAM_TABLE} (trigram, size, word) VALUES (%s, %s, %s)",
+        [[trigram, len(grams), word] for word in words for grams in [trigrams(word)] for trigram in grams],
+    )
+
+
+def _add_words(cursor, texts):
+    # Words of deleted or renamed books stay until rebuild_index(); they
+    # are never suggested, as FTS5 no longer lists them
+    _insert_trigrams(cursor, [word for text in texts for word in normalize(text)])
+
+
+def _corrections(cursor, token):
+    """Catalog words close to token, best first: [(similarity, books using it, word)]"""
+    threshold = settings.BOOK_FUZZY_THRESHOLD
+    grams = sorted(trigrams(token))
+    # similarity = shared / (len(grams) + size - shared) can only reach the
+    # threshold for words of this many trigrams sharing this many with token
+    least = math.ceil(len(grams) * threshold)
+    most = math.floor(len(grams) / threshold)
+    placeholders = ', '.join(['%s'] * len(grams))
+    cursor.execute(
+        f"SELECT word, size, COUNT(*) FROM {TRIGRAM_TABLE} "
+        f"WHERE trigram IN ({placeholders}) AND size BETWEEN %s AND %s "
+        "GROUP BY word, size HAVING COUNT(*) >= %s",
+        [*grams, least, most, least],
+    )
+    scores = {}
+    for word, size, shared in cursor.fetchall():
+        score = shared / (len(grams) + size - shared)
+        if score >= threshold:
+            scores[word] = score
+    # A few spares, as some words may no longer be used by any book
+    best = sorted(scores, key=scores.get, reverse=True)[:settings.BOOK_FUZZY_CANDIDATES * 4]
+    if not best:
+        return []
+    cursor.execute(
+        f"SELECT term, doc FROM {FTS_VOCAB_TABLE} WHERE term IN ({', '.join(['%s'] * len(best))})", best
+    )
+    found = [(scores[word], books, word) for word, books in cursor.fetchall() if books]
+    found.sort(key=lambda item: (-item[0], -item[1], item[2]))
+    return found[:settings.BOOK_FUZZY_CANDIDATES]
+
+
+def _sqlite_fuzzy_rows(tokens, limit):
+    """(rows, words): FTS rows matching every token or a correction of it, and the best word for each token"""
+    with connection.cursor() as cursor:
+        options = [
+            [token] if len(token) < MIN_FUZZY_WORD else [word for _, _, word in _corrections(cursor, token)]
+            for token in tokens
+        ]
+        words = [choices[0] if choices else token for token, choices in zip(tokens, options)]
+        # A word nothing resembles does not rule out the others
+        options = [choices for choices in options if choices]
+        if not options:
+            return [], words
+        match = ' AND '.join('(' + ' OR '.join(f'"{word}"' for word in choices) + ')' for choices in options)
+        cursor.execute(
+            f"SELECT rowid, title, author, category FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [match, limit],
+        )
+        return cursor.fetchall(), words
+
+
+def _postgresql_fuzzy_rows(tokens, limit):
+    """(rows, words): books whose title, author or category contain something like the query, best first"""
+    query = ' '.join(tokens)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # <% compares against pg_trgm.word_similarity_threshold
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+            [str(settings.BOOK_FUZZY_THRESHOLD)],
+        )
+        cursor.execute(
+            f"SELECT id, title, author, category FROM books_book WHERE %s <%% {PG_TRIGRAM_DOCUMENT} "
+            f"ORDER BY word_similarity(%s, {PG_TRIGRAM_DOCUMENT}) DESC, id LIMIT %s",
+            [query, query, limit],
+        )
+        rows = cursor.fetchall()
+    catalog_words = {word for row in rows for text in row[1:] for word in normalize(text)}
+    words = []
+    for token in tokens:
+        close = [word for word in catalog_words if similarity(token, word) >= settings.BOOK_FUZZY_THRESHOLD]
+        words.append(max(close, key=lambda word: (similarity(token, word), word)) if close else token)
+    return rows, words
+
+
+def fuzzy_book_ids(terms, limit=None):
+    """
+    Return (ids, did_you_mean) for a typo-tolerant search: ids of books
+    whose words resemble every search word, most similar first, and the
+    search with each word replaced by its closest catalog word (None when
+    nothing was corrected). Returns None when no trigram index is
+    available on this database.
+    """
+    tokens = list(dict.fromkeys(normalize(' '.join(terms))))
+    if not tokens:
+        return None
+    limit = limit or max_results()
+    try:
+        if connection.vendor == 'sqlite':
+            rows, words = _sqlite_fuzzy_rows(tokens, limit)
+        elif connection.vendor == 'postgresql':
+            rows, words = _postgresql_fuzzy_rows(tokens, limit)
+        else:
+            return None
+    except DatabaseError:
+        # No FTS5 or pg_trgm on this database
+        return None
+
+    def score(row):
+        book_words = {word for text in row[1:] for word in normalize(text)}
+        if not book_words:
+            return 0
+        return sum(max(similarity(token, word) for word in book_words) for token in tokens)
+
+    # Stable, so equally similar books keep the database's order
+    ranked = sorted(rows, key=score, reverse=True)
+    did_you_mean = ' '.join(words) if words != tokens else None
+    return [row[0] for row in ranked], did_you_mean
+
+
+def rank_queryset(queryset, ids):
+    """Restrict queryset to ids and order it the way ids are ranked"""
+    if not ids:
+        return queryset.none()
+    rank = Case(
+        *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank', 'pk')
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter backed by the full-text index.
+
+    Results are ranked best match first and each word matches as a prefix,
+    so ``?search=pragm prog`` finds "The Pragmatic Programmer". When the
+    database has no index it behaves exactly like SearchFilter.
+
+    With ``?fuzzy=1`` words may be misspelled: ``?search=tolkein&fuzzy=1``
+    finds Tolkien's books, most similar first, and sets view.did_you_mean
+    to the corrected search.
+    """
+    fuzzy_param = 'fuzzy'
+
+    def is_fuzzy(self, request):
+        return request.query_params.get(self.fuzzy_param, '').lower() in ('1', 'true', 'yes')
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        if self.is_fuzzy(request):
+            view.did_you_mean = None
+            found = fuzzy_book_ids(terms)
+            if found is not None:
+                ids, view.did_you_mean = found
+                return rank_queryset(queryset, ids)
+        ids = ranked_book_ids(terms)
+        if ids is None:
+            return super().filter_queryset(request, queryset, view)
+        return rank_queryset(queryset, ids)
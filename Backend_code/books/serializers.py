@@ -1,7 +1,80 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Book
+from .models import Book, ChunkedUpload
+from .covers import variant_urls
+from . import uploads
 
 class BookSerializer(serializers.ModelSerializer):
+    # {"64": {"webp": url, "jpeg": url}, "200": ..., "600": ...}; empty until
+    # generate_cover_variants has processed the current cover
+    cover_variants = serializers.SerializerMethodField()
+    # The PDF is only readable through /api/books/{id}/pdf/, which checks the
+    # login, so its storage URL is never sent out; admins still upload it
+    has_pdf = serializers.SerializerMethodField()
+
     class Meta:
         model = Book
         fields = '__all__'
+        extra_kwargs = {'pdf_file': {'write_only': True}}
+
+    def get_has_pdf(self, book):
+        return bool(book.pdf_file)
+
+    def get_cover_variants(self, book):
+        request = self.context.get('request')
+        storage_url = Book._meta.get_field('cover_image').storage.url
+        url = (lambda name: request.build_absolute_uri(storage_url(name))) if request else storage_url
+        return variant_urls(book.cover_variants, book.cover_image, url)
+
+
+class BookSummarySerializer(serializers.ModelSerializer):
+    """Slim book representation for nesting inside transaction lists"""
+    class Meta:
+        model = Book
+        fields = ('id', 'title', 'author', 'isbn', 'category', 'cover_image')
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """An upload session, with the chunks received so far"""
+    chunk_count = serializers.IntegerField(read_only=True)
+    received = serializers.SerializerMethodField()
+    expires_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'kind', 'filename', 'size', 'sha256', 'chunk_size', 'chunk_count',
+                  'received', 'created_at', 'updated_at', 'expires_at')
+        read_only_fields = ('chunk_size', 'created_at', 'updated_at')
+
+    def get_received(self, upload):
+        return sorted(uploads.received_chunks(upload))
+
+    def get_expires_at(self, upload):
+        return upload.updated_at + timedelta(seconds=settings.BOOK_UPLOAD_EXPIRY)
+
+    def validate_filename(self, value):
+        # Only the name is kept; the storage decides the directory
+        name = os.path.basename(value.replace('\\', '/')).strip()
+        if not name:
+            raise serializers.ValidationError('Expected a file name.')
+        return name
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.BOOK_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Expected 1 to {settings.BOOK_UPLOAD_MAX_SIZE} bytes.'
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.strip().lower()
+        if value and not uploads.is_sha256(value):
+            raise serializers.ValidationError('Expected a hex SHA-256 digest (64 characters).')
+        return value
+
+    def create(self, validated_data):
+        validated_data['chunk_size'] = settings.BOOK_UPLOAD_CHUNK_SIZE
+        return super().create(validated_data)
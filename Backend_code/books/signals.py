@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import FILE_FIELDS, Book
+from . import autocomplete
+from . import dedup
+from . import search
+from . import cache as book_cache
+
+@receiver(post_save, sender=Book)
+def index_book_for_search(sender, instance, update_fields=None, **kwargs):
+    """
+    Keeps the full-text index in sync with the catalog.
+    Saves that only touch inventory columns are skipped.
+    """
+    if update_fields is not None and not set(update_fields) & set(search.INDEXED_FIELDS):
+        return
+    search.index_book(instance)
+
+@receiver(post_delete, sender=Book)
+def unindex_book_for_search(sender, instance, **kwargs):
+    search.unindex_book(instance.pk)
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_by_category_cache(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(book_cache.BY_CATEGORY_FIELDS):
+        return
+    book_cache.invalidate_by_category()
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_cache(sender, instance, **kwargs):
+    book_cache.invalidate_books([instance.pk])
+
+@receiver(post_save, sender=Book)
+def release_replaced_files(sender, instance, **kwargs):
+    """Stored files a save replaced are deleted once no other book uses them"""
+    loaded = getattr(instance, '_loaded_files', {})
+    # Deferred fields are left alone rather than loaded
+    current = {field: getattr(instance, field).name for field in FILE_FIELDS if field in instance.__dict__}
+    replaced = [name for field, name in loaded.items() if name and name != current.get(field, name)]
+    instance._loaded_files = current
+    if replaced:
+        transaction.on_commit(lambda: dedup.release(replaced))
+
+@receiver(post_delete, sender=Book)
+def release_deleted_files(sender, instance, **kwargs):
+    names = [getattr(instance, field).name for field in FILE_FIELDS if field in instance.__dict__]
+    if any(names):
+        transaction.on_commit(lambda: dedup.release(names))
+
+@receiver(post_save, sender=Book)
+def update_autocomplete_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'author'} & set(update_fields):
+        return
+    row = (instance.pk, instance.title, instance.author)
+    transaction.on_commit(lambda: autocomplete.index_books([row]))
+
+@receiver(post_delete, sender=Book)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.unindex_book(book_id))
@@ -0,0 +1,92 @@
+"""
+Content-addressed storage for book covers and PDFs.
+
+Files are stored under the SHA-256 of their bytes instead of the uploaded
+name: ``covers/x.jpg`` is saved as ``covers/3f/3fa9...c1.jpg``. The same
+file uploaded for several editions is stored once, names never clash, and
+a stored file never changes, so its URL can be cached for good.
+
+Which books use a file is read from the Book table itself (books/dedup.py);
+a file is deleted once no book refers to it. Files saved before this
+storage keep their names until ``manage.py dedupe_media`` moves them.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+from django.utils.deconstruct import deconstructible
+from django.views.static import serve
+
+_HASHED_NAME = re.compile(r'(?:.*/)?([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[a-z0-9]{1,8})?')
+_EXTENSION = re.compile(r'\.[a-z0-9]{1,8}')
+
+# Kept under MEDIA_ROOT but only served by /api/books/{id}/pdf/
+PRIVATE_MEDIA_DIRS = ('pdfs/',)
+# Public media that may be cached for good once content-addressed
+IMMUTABLE_MEDIA_DIRS = ('covers/',)
+
+
+def content_hash(content):
+    """Hex SHA-256 of a django File, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk.encode() if isinstance(chunk, str) else chunk)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(_HASHED_NAME.fullmatch(name or ''))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names every file after its content hash"""
+
+    def __init__(self, **kwargs):
+        # Same name, same bytes: a concurrent save of the same file may
+        # safely write over the other one
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def hashed_name(self, name, digest):
+        """covers/x.JPG -> covers/<2 hex>/<sha256>.jpg"""
+        extension = posixpath.splitext(name)[1].lower()
+        if not _EXTENSION.fullmatch(extension):
+            extension = ''
+        return posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Only the directory and extension of the uploaded name are kept
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content_hash(content))
+        if self.exists(name):
+            # Already stored for another book. Touched, so a release() that
+            # counted no references before this save leaves it alone
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+    def save_derived(self, name, content):
+        """Store a file computed from a stored one, e.g. a cover variant, under exactly name"""
+        return super()._save(name, content)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """django.views.static.serve, with far-future caching for content-addressed covers"""
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith(PRIVATE_MEDIA_DIRS):
+        raise Http404('PDFs are served by /api/books/{id}/pdf/')
+    response = serve(request, path, document_root, show_indexes)
+    if response.status_code == 200 and path.startswith(IMMUTABLE_MEDIA_DIRS) and is_content_addressed(path):
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_IMMUTABLE_MAX_AGE, immutable=True)
+    return response
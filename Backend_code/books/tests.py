@@ -1,16 +1,41 @@
+import csv
+import hashlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import uuid
+from importlib import import_module
+from unittest import mock, skipUnless
+
+from django.db import connection
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import Book
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from backend.testing import QueryBudgetMixin, QueryPlanMixin, query_budget
+from . import autocomplete, covers, dedup, search, uploads
+from .importer import isbn13_check_digit, normalize_isbn
+from .models import Book, ChunkedUpload
+from .storage import content_storage, is_content_addressed, serve_media
+from .views import BookViewSet
 
 User = get_user_model()
 
+GIF_1PX = b"GIF89a\x01\x00\x01\x00\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+
 
 class BookAPITest(APITestCase):
     """Comprehensive tests for Book API"""
 
     def setUp(self):
         """Set up test data"""
+        cache.clear()
         # Create admin user
         self.admin = User.objects.create_superuser(
             username="admin",
@@ -120,7 +145,7 @@ class BookAPITest(APITestCase):
         
         # Verify all books exist
         list_response = self.client.get("/api/books/")
-        self.assertEqual(len(list_response.data), 3)
+        self.assertEqual(len(list_response.data["results"]), 3)
     
     def test_member_cannot_create_book(self):
         """Test member cannot create a book"""
@@ -195,8 +220,8 @@ class BookAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
-        self.assertEqual(len(response.data), 2)
+        self.assertIsInstance(response.data["results"], list)
+        self.assertEqual(len(response.data["results"]), 2)
     
     def test_list_books_unauthenticated(self):
         """Test unauthenticated user cannot list books"""
@@ -208,7 +233,7 @@ class BookAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data["results"]), 0)
     
     def test_list_books_ordering(self):
         """Test books are listed in expected order"""
@@ -219,7 +244,7 @@ class BookAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/")
         # Assuming default ordering is by title
-        titles = [book["title"] for book in response.data]
+        titles = [book["title"] for book in response.data["results"]]
         self.assertEqual(titles, sorted(titles))
 
     # ==================== RETRIEVE BOOK TESTS ====================
@@ -424,7 +449,7 @@ class BookAPITest(APITestCase):
         response = self.client.get("/api/books/", {"search": "Clean"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should find "Clean Code"
-        titles = [book["title"] for book in response.data]
+        titles = [book["title"] for book in response.data["results"]]
         self.assertTrue(any("Clean" in title for title in titles))
     
     def test_books_search_by_author(self):
@@ -436,8 +461,8 @@ class BookAPITest(APITestCase):
         response = self.client.get("/api/books/", {"search": "Robert"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should find "Clean Code" by Robert C. Martin
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["author"], "Robert C. Martin")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["author"], "Robert C. Martin")
     
     def test_books_search_by_category(self):
         """Test book search by category"""
@@ -448,7 +473,7 @@ class BookAPITest(APITestCase):
         response = self.client.get("/api/books/", {"search": "Programming"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should find books in Programming category
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
     
     def test_books_search_no_results(self):
         """Test book search with no results"""
@@ -457,7 +482,7 @@ class BookAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/", {"search": "Nonexistent Book"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data["results"]), 0)
     
     def test_books_search_case_insensitive(self):
         """Test book search is case insensitive"""
@@ -466,7 +491,7 @@ class BookAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/", {"search": "clean code"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     # ==================== EDGE CASE TESTS ====================
     
@@ -527,11 +552,11 @@ class BookAPITest(APITestCase):
         response = self.client.get("/api/books/")
         
         # Should return a list
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data["results"], list)
         
         # Each book should have required fields
-        if len(response.data) > 0:
-            book = response.data[0]
+        if len(response.data["results"]) > 0:
+            book = response.data["results"][0]
             self.assertIn("id", book)
             self.assertIn("title", book)
             self.assertIn("author", book)
@@ -555,3 +580,1421 @@ class BookAPITest(APITestCase):
         self.assertIn("available_copies", response.data)
         self.assertIn("description", response.data)
 
+
+
+class BookFullTextSearchTest(APITestCase):
+    """Tests for the full-text search backend"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+        self.pragmatic = Book.objects.create(
+            title="The Pragmatic Programmer", author="Andrew Hunt", category="Programming",
+            isbn="9780201616224", quantity=3, available_quantity=3
+        )
+        self.clean_code = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=5, available_quantity=5
+        )
+        self.patterns = Book.objects.create(
+            title="Design Patterns", author="Erich Gamma", category="Software Engineering",
+            isbn="9780201633610", quantity=2, available_quantity=2
+        )
+
+    def search(self, query):
+        response = self.client.get("/api/books/", {"search": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["id"] for book in response.data["results"]]
+
+    def test_search_matches_word_prefixes(self):
+        """Test every search word matches as a prefix"""
+        self.assertEqual(self.search("pragm prog"), [self.pragmatic.id])
+
+    def test_search_requires_all_words(self):
+        """Test all words must match"""
+        self.assertEqual(self.search("clean martin"), [self.clean_code.id])
+        self.assertEqual(self.search("clean gamma"), [])
+
+    def test_search_is_case_and_punctuation_insensitive(self):
+        """Test search ignores case and punctuation"""
+        self.assertEqual(self.search("ROBERT c."), [self.clean_code.id])
+
+    def test_search_ranks_better_matches_first(self):
+        """Test books matching in more places rank higher"""
+        programming = Book.objects.create(
+            title="Programming Programming", author="Someone", category="Programming",
+            isbn="9780000000001", quantity=1, available_quantity=1
+        )
+        self.assertEqual(self.search("programming")[0], programming.id)
+
+    def test_index_follows_updates(self):
+        """Test renamed books are found by their new title only"""
+        self.patterns.title = "Refactoring"
+        self.patterns.save()
+        self.assertEqual(self.search("refactoring"), [self.patterns.id])
+        self.assertEqual(self.search("design"), [])
+
+    def test_index_follows_deletes(self):
+        """Test deleted books drop out of results"""
+        self.clean_code.delete()
+        self.assertEqual(self.search("clean"), [])
+
+
+@skipUnless(connection.vendor == "sqlite", "the trigram side table is SQLite's; PostgreSQL uses pg_trgm")
+class BookFuzzySearchTest(APITestCase):
+    """Tests for typo-tolerant search with ?fuzzy=1"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+        self.hobbit = self.add_book("The Hobbit", "J.R.R. Tolkien", "9780547928227")
+        self.rings = self.add_book("The Lord of the Rings", "J.R.R. Tolkien", "9780544003415")
+        self.crime = self.add_book("Crime and Punishment", "Fyodor Dostoyevsky", "9780143107637")
+
+    def add_book(self, title, author, isbn):
+        return Book.objects.create(
+            title=title, author=author, category="Fiction",
+            isbn=isbn, quantity=1, available_quantity=1
+        )
+
+    def search(self, query, **params):
+        response = self.client.get("/api/books/", {"search": query, "fuzzy": "1", **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["id"] for book in response.data["results"]], response.data["did_you_mean"]
+
+    def test_misspelled_words_match(self):
+        """Test misspelled authors are found and corrected"""
+        self.assertEqual(self.search("tolkein"), ([self.hobbit.id, self.rings.id], "tolkien"))
+        self.assertEqual(self.search("Dostoyevski"), ([self.crime.id], "dostoyevsky"))
+        self.assertEqual(self.search("hobit tolkein"), ([self.hobbit.id], "hobbit tolkien"))
+
+    def test_correct_words_have_no_suggestion(self):
+        """Test did_you_mean is null when nothing was misspelled"""
+        self.assertEqual(self.search("hobbit"), ([self.hobbit.id], None))
+        self.assertEqual(self.search("zzzzzz"), ([], None))
+
+    def test_closest_matches_rank_first(self):
+        """Test books with the exact word come before merely similar ones"""
+        exact = self.add_book("Tolkein Reconsidered", "A. Critic", "9780000000002")
+        ids, did_you_mean = self.search("tolkein")
+        self.assertEqual(ids[0], exact.id)
+        self.assertEqual(set(ids), {exact.id, self.hobbit.id, self.rings.id})
+        self.assertIsNone(did_you_mean)
+
+    def test_plain_search_is_not_fuzzy(self):
+        """Test misspellings only match with ?fuzzy=1"""
+        response = self.client.get("/api/books/", {"search": "tolkein"})
+        self.assertEqual(response.data["results"], [])
+        self.assertNotIn("did_you_mean", response.data)
+
+    def test_index_follows_saves_and_deletes(self):
+        """Test new words become matchable and deleted ones are no longer suggested"""
+        dune = self.add_book("Dune", "Frank Herbert", "9780441172719")
+        self.assertEqual(self.search("herbret"), ([dune.id], "herbert"))
+        self.crime.delete()
+        self.assertEqual(self.search("dostoyevski"), ([], None))
+        search.rebuild_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {search.TRIGRAM_TABLE} WHERE word = %s", ["dostoyevsky"])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_category_words_match(self):
+        """Test fuzzy search covers the same fields as the plain search"""
+        self.assertEqual(self.search("fiction")[0], self.search("fictoin")[0])
+        self.assertEqual(self.search("fictoin")[1], "fiction")
+        migration = import_module("books.migrations.0008_book_trigram_index")
+        self.assertEqual(search.PG_TRIGRAM_DOCUMENT, migration.PG_TRIGRAM_DOCUMENT)
+        for field in search.INDEXED_FIELDS:
+            self.assertIn(f"coalesce({field}, '')", search.PG_TRIGRAM_DOCUMENT)
+
+    def test_similarity(self):
+        """Test trigram similarity of single words"""
+        self.assertEqual(search.trigrams("cat"), {"  c", " ca", "cat", "at "})
+        self.assertEqual(search.similarity("tolkien", "tolkien"), 1)
+        self.assertAlmostEqual(search.similarity("tolkein", "tolkien"), 4 / 12)
+        self.assertEqual(search.similarity("abc", "xyz"), 0)
+
+
+class BookPaginationTest(APITestCase):
+    """Tests for cursor pagination of the book list"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+        self.books = [
+            Book.objects.create(
+                title=f"Book {i}", author="Author", category="Fiction",
+                isbn=f"978000000{i:04d}", quantity=1, available_quantity=1
+            )
+            for i in range(7)
+        ]
+
+    def collect_pages(self, params):
+        """Follow next links and return the ids of every page"""
+        pages = []
+        response = self.client.get("/api/books/", params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([book["id"] for book in response.data["results"]])
+            if not response.data["next"]:
+                return pages
+            response = self.client.get(response.data["next"])
+
+    def test_list_is_paginated_with_cursor_links(self):
+        """Test list returns a page with opaque next/previous links"""
+        response = self.client.get("/api/books/", {"page_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"next", "previous", "results"})
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIn("cursor=", response.data["next"])
+        self.assertIsNone(response.data["previous"])
+
+    def test_pages_cover_every_book_newest_first(self):
+        """Test walking the cursors returns each book exactly once"""
+        pages = self.collect_pages({"page_size": 3})
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [book_id for page in pages for book_id in page]
+        self.assertEqual(ids, [book.id for book in reversed(self.books)])
+
+    def test_books_added_at_the_same_time_are_paged_by_id(self):
+        """Test the cursor keys on (created_at, id), so rows tied on created_at are not skipped"""
+        Book.objects.update(created_at=self.books[0].created_at)
+        pages = self.collect_pages({"page_size": 2})
+        ids = [book_id for page in pages for book_id in page]
+        self.assertEqual(ids, [book.id for book in reversed(self.books)])
+
+        response = self.client.get("/api/books/", {"page_size": 2})
+        response = self.client.get(self.client.get(response.data["next"]).data["previous"])
+        self.assertEqual([book["id"] for book in response.data["results"]], pages[0])
+
+    def test_invalid_cursor_is_not_found(self):
+        """Test a tampered cursor is rejected instead of failing the query"""
+        from base64 import b64encode
+
+        for position in ("nonsense", '["1"]', '["not a date","1"]'):
+            cursor = b64encode(f"p={position}".encode()).decode()
+            response = self.client.get("/api/books/", {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_results_are_paged_in_rank_order(self):
+        """Test search results keep their ranking across pages"""
+        Book.objects.create(
+            title="Fiction Fiction", author="Author", category="Fiction",
+            isbn="9780000009999", quantity=1, available_quantity=1
+        )
+        pages = self.collect_pages({"search": "fiction", "page_size": 3})
+        ids = [book_id for page in pages for book_id in page]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+        self.assertEqual(ids[0], Book.objects.get(isbn="9780000009999").id)
+
+
+class BooksByCategoryTest(APITestCase):
+    """Tests for the cached by-category endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        for i in range(4):
+            Book.objects.create(
+                title=f"Novel {i}", author="Author", category="Fiction",
+                isbn=f"978000000{i:04d}", quantity=1, available_quantity=1
+            )
+        Book.objects.create(
+            title="Cosmos", author="Carl Sagan", category="Science",
+            isbn="9780000001000", quantity=1, available_quantity=1
+        )
+
+    def test_limit_caps_books_per_category(self):
+        """Test ?limit= caps each category independently"""
+        response = self.client.get("/api/books/by-category/", {"limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([b["title"] for b in response.data["Fiction"]], ["Novel 0", "Novel 1"])
+        self.assertEqual(len(response.data["Science"]), 1)
+        self.assertEqual(
+            set(response.data["Science"][0]), {"id", "title", "author", "cover_image", "cover_variants"}
+        )
+
+    def test_repeat_hits_are_served_from_cache(self):
+        """Test a cached payload is served without touching the database"""
+        self.client.get("/api/books/by-category/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/books/by-category/")
+        self.assertEqual(len(response.data["Fiction"]), 4)
+
+    def test_cache_invalidated_on_save_and_delete(self):
+        """Test book saves and deletes refresh the payload"""
+        self.client.get("/api/books/by-category/")
+        Book.objects.filter(title="Cosmos").get().delete()
+        response = self.client.get("/api/books/by-category/")
+        self.assertNotIn("Science", response.data)
+
+        book = Book.objects.get(title="Novel 0")
+        book.category = "Classics"
+        book.save()
+        response = self.client.get("/api/books/by-category/")
+        self.assertEqual(response.data["Classics"][0]["title"], "Novel 0")
+
+    def test_etag_and_cache_control(self):
+        """Test conditional requests get 304 Not Modified"""
+        response = self.client.get("/api/books/by-category/")
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=", response["Cache-Control"])
+        etag = response["ETag"]
+
+        response = self.client.get("/api/books/by-category/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Book.objects.create(
+            title="Dune", author="Frank Herbert", category="Fiction",
+            isbn="9780000002000", quantity=1, available_quantity=1
+        )
+        response = self.client.get("/api/books/by-category/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class BookReadCacheTest(APITestCase):
+    """Tests for cached book list, detail and count responses"""
+
+    def setUp(self):
+        cache.clear()
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=2, available_quantity=2
+        )
+        self.client.force_authenticate(user=self.member)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        """Test list, detail and count hit the database only once each"""
+        for url in ("/api/books/", f"/api/books/{self.book.id}/", "/api/books/count/"):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.data, second.data)
+
+    def test_query_params_are_cached_separately(self):
+        """Test different pages and searches do not share an entry"""
+        Book.objects.create(
+            title="Refactoring", author="Martin Fowler", category="Programming",
+            isbn="9780201485677", quantity=1, available_quantity=1
+        )
+        self.assertEqual(len(self.client.get("/api/books/", {"page_size": 1}).data["results"]), 1)
+        self.assertEqual(len(self.client.get("/api/books/").data["results"]), 2)
+
+    def test_save_and_delete_invalidate(self):
+        """Test Book signals bump the cached versions"""
+        self.client.get(f"/api/books/{self.book.id}/")
+        self.client.get("/api/books/count/")
+        self.book.title = "Clean Code (2nd ed.)"
+        self.book.save()
+        self.assertEqual(self.client.get(f"/api/books/{self.book.id}/").data["title"], "Clean Code (2nd ed.)")
+
+        self.book.delete()
+        self.assertEqual(self.client.get("/api/books/count/").data["count"], 0)
+
+    def test_issue_and_return_invalidate_availability(self):
+        """Test stock changes made with update() are not served stale"""
+        url = f"/api/books/{self.book.id}/"
+        self.client.get(url)
+        self.client.get("/api/books/")
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            issued = self.client.post("/api/transactions/issue/", {"book_id": self.book.id})
+        self.assertTrue(callbacks)
+        self.assertEqual(self.client.get(url).data["available_quantity"], 1)
+        self.assertEqual(self.client.get("/api/books/").data["results"][0]["available_quantity"], 1)
+
+        self.client.post("/api/transactions/return/", {"transaction_id": issued.data["id"]})
+        self.assertEqual(self.client.get(url).data["available_quantity"], 2)
+
+    def test_batch_issue_invalidates(self):
+        """Test the batch endpoint bumps every book it touched"""
+        url = f"/api/books/{self.book.id}/"
+        self.client.get(url)
+        self.client.post(
+            "/api/transactions/issue-batch/", {"book_ids": [self.book.id, self.book.id]}, format="json"
+        )
+        self.assertEqual(self.client.get(url).data["available_quantity"], 0)
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "query plans are checked on SQLite and PostgreSQL")
+class BookIndexUsageTest(QueryPlanMixin, APITestCase):
+    """Tests that the hot catalog queries are served by an index"""
+
+    def setUp(self):
+        for i in range(5):
+            Book.objects.create(
+                title=f"Book {i}", author=f"Author {i}", category="Programming",
+                isbn=f"978000000000{i}", quantity=1, available_quantity=1
+            )
+
+    def test_books_in_category(self):
+        """Test category listings use the category index"""
+        self.assertUsesIndex(Book.objects.filter(category="Programming"), "book_category_idx")
+
+    def test_books_by_author(self):
+        """Test author lookups use the author index"""
+        self.assertUsesIndex(Book.objects.filter(author="Author 1"), "book_author_idx")
+
+    def test_newest_books(self):
+        """Test the newest-first listing walks the created_at index"""
+        queryset = Book.objects.order_by("-created_at", "-id")[:20]
+        self.assertUsesIndex(queryset, "book_created_id_idx")
+
+
+class BookQueryBudgetTest(QueryBudgetMixin, APITestCase):
+    """Tests that every book endpoint runs a fixed number of queries"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def add_books(self, count, user=None):
+        """Add count books over a few categories and log in as user"""
+        self.client.force_authenticate(user=user or self.member)
+        return Book.objects.bulk_create([
+            Book(title=f"Book {i}", author=f"Author {i % 7}", category=f"Category {i % 3}",
+                 isbn=f"97811{i:08d}", quantity=2, available_quantity=2)
+            for i in range(count)
+        ])
+
+    def book_payload(self):
+        return {
+            "title": "Clean Code", "author": "Robert C. Martin", "category": "Programming",
+            "isbn": "9780132350884", "quantity": 2, "available_quantity": 2,
+            "cover_image": SimpleUploadedFile("cover.gif", GIF_1PX, content_type="image/gif"),
+        }
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_list(self, size):
+        self.add_books(size)
+        return lambda: self.client.get("/api/books/", {"page_size": 100})
+
+    def searching(self, size, params):
+        """A call that searches and checks every book was found, not an empty page"""
+        def call():
+            response = self.client.get("/api/books/", {**params, "page_size": 100})
+            self.assertEqual(len(response.data["results"]), size)
+            return response
+        return call
+
+    @query_budget(2, status=status.HTTP_200_OK)
+    def test_search(self, size):
+        # The FTS match and the page; bulk_create skips the index signals
+        self.add_books(size)
+        search.rebuild_index()
+        return self.searching(size, {"search": "Author"})
+
+    @query_budget(4, status=status.HTTP_200_OK)
+    def test_fuzzy_search(self, size):
+        # Close catalog words, which of them books still use, the FTS match, the page
+        self.add_books(size)
+        search.rebuild_index()
+        return self.searching(size, {"search": "Autor", "fuzzy": "1"})
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_retrieve(self, size):
+        book = self.add_books(size)[-1]
+        return lambda: self.client.get(f"/api/books/{book.id}/")
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_count(self, size):
+        self.add_books(size)
+        return lambda: self.client.get("/api/books/count/")
+
+    @query_budget(2, status=status.HTTP_200_OK)
+    def test_autocomplete(self, size):
+        # Loan counts and book rows, once per process; later calls run none
+        self.add_books(size)
+        return lambda: self.client.get("/api/books/autocomplete/", {"q": "book"})
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_by_category(self, size):
+        self.add_books(size)
+        return lambda: self.client.get("/api/books/by-category/")
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_pdf(self, size):
+        book = self.add_books(size)[-1]
+        book.pdf_file = SimpleUploadedFile("book.pdf", b"%PDF-1.4\n")
+        book.save()
+
+        def call():
+            response = self.client.get(f"/api/books/{book.id}/pdf/")
+            response.close()
+            return response
+        return call
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_export(self, size):
+        self.add_books(size, user=self.admin)
+
+        def call():
+            response = self.client.get("/api/books/export/")
+            self.assertEqual(len(response.getvalue().splitlines()), size + 1)
+            return response
+        return call
+
+    @query_budget(7, status=status.HTTP_200_OK)
+    def test_bulk_import(self, size):
+        self.add_books(size, user=self.admin)
+        isbns = [f"9782{i:08d}" + isbn13_check_digit(f"9782{i:08d}") for i in range(size)]
+        rows = "".join(f"Book {i},Author,{isbn},2\n" for i, isbn in enumerate(isbns))
+        upload = SimpleUploadedFile("books.csv", f"title,author,isbn,quantity\n{rows}".encode())
+        return lambda: self.client.post("/api/books/import/", {"file": upload}, format="multipart")
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_upload_chunk(self, size):
+        self.add_books(size, user=self.admin)
+        upload = ChunkedUpload.objects.create(
+            user=self.admin, kind=ChunkedUpload.PDF, filename="book.pdf", size=4, chunk_size=4
+        )
+        chunk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, chunk_dir, ignore_errors=True)
+        sha256 = hashlib.sha256(b"%PDF").hexdigest()
+
+        def call():
+            with override_settings(BOOK_UPLOAD_DIR=chunk_dir):
+                return self.client.put(
+                    f"/api/books/uploads/{upload.id}/chunks/0/", b"%PDF",
+                    content_type="application/octet-stream", headers={"X-Chunk-SHA256": sha256}
+                )
+        return call
+
+    # Writes include the three statements that keep the SQLite FTS index
+    # and the fuzzy search trigram table in step
+
+    @query_budget(5, status=status.HTTP_201_CREATED)
+    def test_create(self, size):
+        self.add_books(size, user=self.admin)
+        return lambda: self.client.post("/api/books/", self.book_payload(), format="multipart")
+
+    @query_budget(6, status=status.HTTP_200_OK)
+    def test_update(self, size):
+        book = self.add_books(size, user=self.admin)[-1]
+        payload = dict(self.book_payload(), isbn=book.isbn)
+        return lambda: self.client.put(f"/api/books/{book.id}/", payload, format="multipart")
+
+    @query_budget(5, status=status.HTTP_200_OK)
+    def test_partial_update(self, size):
+        book = self.add_books(size, user=self.admin)[-1]
+        return lambda: self.client.patch(f"/api/books/{book.id}/", {"quantity": 3}, format="json")
+
+    @query_budget(4, status=status.HTTP_204_NO_CONTENT)
+    def test_destroy(self, size):
+        book = self.add_books(size, user=self.admin)[-1]
+        return lambda: self.client.delete(f"/api/books/{book.id}/")
+
+
+class BookExportTest(APITestCase):
+    """Tests for the streaming catalog export"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        self.books = [
+            Book.objects.create(
+                title=f"Book {i}", author="Author", category="Programming",
+                isbn=f"978000000000{i}", quantity=1, available_quantity=i % 2
+            )
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.admin)
+
+    def rows(self, **params):
+        response = self.client.get("/api/books/export/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return list(csv.DictReader(io.StringIO(response.getvalue().decode())))
+
+    def test_member_cannot_export(self):
+        """Test the catalog export is admin only"""
+        member = User.objects.create_user(username="member", email="member@test.com", password="Member@123")
+        self.client.force_authenticate(user=member)
+        response = self.client.get("/api/books/export/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_exports_every_book(self):
+        """Test one CSV row per book in id order"""
+        rows = self.rows()
+        self.assertEqual([row["isbn"] for row in rows], [book.isbn for book in self.books])
+        self.assertEqual(set(rows[0]), set(BookViewSet.export_fields))
+
+    def test_status_filter(self):
+        """Test AVAILABLE and UNAVAILABLE split on copies on the shelf"""
+        self.assertEqual([row["title"] for row in self.rows(status="available")], ["Book 1"])
+        self.assertEqual([row["title"] for row in self.rows(status="UNAVAILABLE")], ["Book 0", "Book 2"])
+
+    def test_formulas_are_written_as_text(self):
+        """Test a cell a spreadsheet would evaluate gets a leading quote"""
+        Book.objects.filter(id=self.books[0].id).update(
+            title='=HYPERLINK("http://example.com","click")', author="@SUM(A1)"
+        )
+        Book.objects.filter(id=self.books[1].id).update(title="-2+3", author="\tTabbed")
+        rows = self.rows()
+        self.assertEqual(
+            [(row["title"], row["author"]) for row in rows],
+            [("'=HYPERLINK(\"http://example.com\",\"click\")", "'@SUM(A1)"),
+             ("'-2+3", "'\tTabbed"), ("Book 2", "Author")],
+        )
+        ndjson = self.client.get("/api/books/export/", {"format": "ndjson"}).getvalue().decode()
+        self.assertIn('"title":"=HYPERLINK(', ndjson.replace(" ", ""))
+
+    def test_date_range(self):
+        """Test ?from= filters on created_at"""
+        Book.objects.filter(id=self.books[0].id).update(created_at="2020-01-01T00:00:00Z")
+        self.assertEqual(len(self.rows(**{"from": "2021-01-01"})), 2)
+        self.assertEqual(len(self.rows(to="2020-01-01")), 1)
+
+
+class BookImportTest(APITestCase):
+    """Tests for the bulk CSV/JSONL catalog import"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def upload(self, name, content):
+        return self.client.post(
+            "/api/books/import/", {"file": SimpleUploadedFile(name, content.encode())}, format="multipart"
+        )
+
+    def test_normalize_isbn(self):
+        """Test ISBN-10s become ISBN-13s and check digits are verified"""
+        self.assertEqual(normalize_isbn("0-13-235088-2"), "9780132350884")
+        self.assertEqual(normalize_isbn("978 0 13 235088 4"), "9780132350884")
+        self.assertEqual(normalize_isbn("080442957x"), "9780804429573")
+        for bad in ("0132350883", "9780132350885", "12345", ""):
+            with self.assertRaises(ValueError):
+                normalize_isbn(bad)
+
+    def test_member_cannot_import(self):
+        """Test the import is admin only"""
+        member = User.objects.create_user(username="member", email="member@test.com", password="Member@123")
+        self.client.force_authenticate(user=member)
+        response = self.upload("books.csv", "title,author,isbn\nClean Code,Robert C. Martin,9780132350884\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Book.objects.exists())
+
+    def test_csv_creates_books_and_reports_bad_rows(self):
+        """Test valid rows are imported and invalid ones listed by line"""
+        response = self.upload("books.csv", (
+            "Title,Author,ISBN,Category,Quantity\n"
+            "Clean Code,Robert C. Martin,0-13-235088-2,Programming,3\n"
+            ",Nobody,9780132350885,Programming,x\n"
+            "Refactoring,Martin Fowler,9780201485677,,\n"
+        ))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {key: response.data[key] for key in ("rows", "created", "updated", "failed")},
+            {"rows": 3, "created": 2, "updated": 0, "failed": 1},
+        )
+        self.assertEqual(response.data["errors"][0]["line"], 3)
+        self.assertEqual(set(response.data["errors"][0]["errors"]), {"title", "isbn", "quantity"})
+        book = Book.objects.get(isbn="9780132350884")
+        self.assertEqual((book.quantity, book.available_quantity, book.category), (3, 3, "Programming"))
+        self.assertEqual(Book.objects.get(isbn="9780201485677").quantity, 1)
+
+    def test_upsert_keeps_loaned_copies_out(self):
+        """Test an existing book is updated and copies on loan stay out"""
+        book = Book.objects.create(
+            title="Clean Code", author="Robert Martin", category="Programming",
+            isbn="9780132350884", quantity=2, available_quantity=1
+        )
+        response = self.upload("books.jsonl", (
+            '{"title": "Clean Code", "author": "Robert C. Martin", "isbn": "9780132350884", "quantity": 5}\n'
+            "not json\n"
+            "\n"
+            '["a list"]\n'
+        ))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["created"], response.data["updated"], response.data["failed"]), (0, 1, 2))
+        self.assertEqual([error["line"] for error in response.data["errors"]], [2, 4])
+        book.refresh_from_db()
+        self.assertEqual((book.author, book.quantity, book.available_quantity), ("Robert C. Martin", 5, 4))
+        self.assertEqual(book.category, "")
+
+    @override_settings(BOOK_IMPORT_BATCH_SIZE=2)
+    def test_batches_and_repeated_isbns(self):
+        """Test rows are upserted across batches and the last row for an ISBN wins"""
+        rows = "".join(f"Book {i},Author,{isbn},1\n" for i, isbn in enumerate(
+            ["9780132350884", "9780201485677", "9780132350884", "9780596007126", "9780201485677"]
+        ))
+        response = self.upload("books.csv", "title,author,isbn,quantity\n" + rows)
+        self.assertEqual((response.data["rows"], response.data["failed"]), (5, 0))
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Book.objects.get(isbn="9780201485677").title, "Book 4")
+
+    def test_missing_columns_are_rejected(self):
+        """Test a CSV without the required columns imports nothing"""
+        response = self.upload("books.csv", "title,writer\nClean Code,Robert C. Martin\n")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("author, isbn", response.data["error"])
+        self.assertEqual(response.data["rows"], 0)
+
+    def test_missing_file(self):
+        """Test a request without a file gets a 400"""
+        response = self.client.post("/api/books/import/", {}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_imported_books_are_searchable_and_cached_counts_refresh(self):
+        """Test the import updates the search index and the catalog cache"""
+        self.assertEqual(self.client.get("/api/books/count/").data["count"], 0)
+        self.upload("books.csv", "title,author,isbn\nDomain-Driven Design,Eric Evans,9780321125217\n")
+        self.assertEqual(self.client.get("/api/books/count/").data["count"], 1)
+        if connection.vendor == "sqlite":
+            results = self.client.get("/api/books/", {"search": "domain"}).data["results"]
+            self.assertEqual([book["isbn"] for book in results], ["9780321125217"])
+
+    def test_command(self):
+        """Test import_books reads a file and prints a summary"""
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write("title,author,isbn\nClean Code,Robert C. Martin,9780132350884\nBad,Row,1\n")
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_books", handle.name, stdout=out, stderr=err)
+        self.assertIn("1 created, 0 updated, 1 failed", out.getvalue())
+        self.assertIn("line 3", err.getvalue())
+        self.assertTrue(Book.objects.filter(isbn="9780132350884").exists())
+
+
+class CoverVariantTest(APITestCase):
+    """Tests for the resized cover variants and generate_cover_variants"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, MEDIA_RELEASE_GRACE=0)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+        self.book = self.add_book("9780132350884", self.image((800, 1200), "PNG", "RGBA"))
+
+    def image(self, size, fmt="JPEG", mode="RGB", name=None):
+        buffer = io.BytesIO()
+        Image.new(mode, size, "red").save(buffer, fmt)
+        return SimpleUploadedFile(name or f"cover.{fmt.lower()}", buffer.getvalue())
+
+    def add_book(self, isbn, cover):
+        return Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn=isbn, quantity=1, available_quantity=1, cover_image=cover
+        )
+
+    def test_variants_are_resized_next_to_the_original(self):
+        """Test every width and format is written beside the upload"""
+        self.assertEqual(covers.generate_pending()[:2], (1, 0))
+        self.book.refresh_from_db()
+        record = self.book.cover_variants
+        self.assertEqual(record["source"], self.book.cover_image.name)
+        self.assertEqual(set(record["widths"]), {"64", "200", "600"})
+        storage = covers.cover_storage()
+        for width, formats in record["widths"].items():
+            self.assertEqual(set(formats), {"webp", "jpeg"})
+            for fmt, name in formats.items():
+                self.assertTrue(name.startswith("covers/"))
+                with storage.open(name) as handle, Image.open(handle) as variant:
+                    self.assertEqual(variant.format, fmt.upper())
+                    self.assertEqual(variant.size, (int(width), int(width) * 3 // 2))
+        self.assertFalse(covers.pending_books().exists())
+
+    def test_small_covers_are_not_upscaled(self):
+        """Test variants wider than the original keep its size"""
+        Book.objects.all().delete()
+        self.add_book("9780201485677", self.image((100, 150)))
+        covers.generate_pending()
+        record = Book.objects.get().cover_variants
+        with covers.cover_storage().open(record["widths"]["600"]["webp"]) as handle:
+            self.assertEqual(Image.open(handle).size, (100, 150))
+
+    def test_serializers_expose_variant_urls(self):
+        """Test detail and by-category hand out the variants once generated"""
+        url = f"/api/books/{self.book.id}/"
+        self.assertEqual(self.client.get(url).data["cover_variants"], {})
+        covers.generate_pending()
+        variants = self.client.get(url).data["cover_variants"]
+        self.assertTrue(variants["200"]["webp"].startswith("http://testserver/media/covers/"))
+        grouped = self.client.get("/api/books/by-category/").data["Programming"][0]
+        self.assertTrue(grouped["cover_variants"]["64"]["jpeg"].startswith("/media/covers/"))
+
+    def test_replaced_cover_is_queued_again(self):
+        """Test a new upload hides the old variants until they are regenerated"""
+        covers.generate_pending()
+        old_record = Book.objects.get().cover_variants
+        self.book.refresh_from_db()
+        self.book.cover_image = self.image((400, 600), name="new.jpg")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        self.assertEqual(self.client.get(f"/api/books/{self.book.id}/").data["cover_variants"], {})
+        self.assertTrue(covers.pending_books().filter(id=self.book.id).exists())
+
+        covers.generate_pending()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.cover_variants["source"], self.book.cover_image.name)
+        self.assertFalse(covers.cover_storage().exists(old_record["widths"]["200"]["webp"]))
+
+    def test_broken_images_are_recorded_not_retried(self):
+        """Test an unreadable cover counts as failed once"""
+        Book.objects.all().delete()
+        self.add_book("9780201485677", SimpleUploadedFile("broken.jpg", b"not an image"))
+        self.assertEqual(covers.generate_pending()[:2], (0, 1))
+        self.assertIn("error", Book.objects.get().cover_variants)
+        self.assertFalse(covers.pending_books().exists())
+
+    def test_command_backfills_in_parallel(self):
+        """Test the command renders every pending cover across batches"""
+        from django.core.management import call_command
+
+        for i in range(3):
+            self.add_book(f"978000000000{i}", self.image((300, 450)))
+        out = io.StringIO()
+        call_command("generate_cover_variants", "--workers", "2", "--batch-size", "2", stdout=out)
+        self.assertIn("4 rendered, 0 failed", out.getvalue())
+        self.assertFalse(covers.pending_books().exists())
+
+        out = io.StringIO()
+        call_command("generate_cover_variants", "--force", stdout=out)
+        self.assertIn("4 rendered", out.getvalue())
+
+
+class BookPDFTest(APITestCase):
+    """Tests for the /api/books/{id}/pdf/ download"""
+
+    PDF = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+        self.book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=1, available_quantity=1,
+            pdf_file=SimpleUploadedFile("clean-code.pdf", self.PDF)
+        )
+        self.url = f"/api/books/{self.book.id}/pdf/"
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_streams_the_whole_file(self):
+        """Test a plain GET streams the PDF inline with validators"""
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), self.PDF)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Content-Length"], str(len(self.PDF)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Disposition"], 'inline; filename="clean-code.pdf"')
+        self.assertIn("private", response["Cache-Control"])
+        self.assertTrue(response["ETag"].startswith('"'))
+
+    def test_requires_authentication(self):
+        """Test anonymous readers are turned away"""
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_storage_url_is_not_exposed(self):
+        """Test book responses only say whether there is a PDF, and media does not serve it"""
+        from django.http import Http404
+        from django.test import RequestFactory
+
+        data = self.client.get(f"/api/books/{self.book.id}/").data
+        self.assertNotIn("pdf_file", data)
+        self.assertTrue(data["has_pdf"])
+        request = RequestFactory().get("/media/")
+        for path in (self.book.pdf_file.name, f"covers/../{self.book.pdf_file.name}"):
+            with self.assertRaises(Http404):
+                serve_media(request, path, document_root=settings.MEDIA_ROOT)
+
+    def test_book_without_pdf(self):
+        """Test a book without a PDF, or with a missing file, is a 404"""
+        self.book.pdf_file.delete()
+        self.assertEqual(self.get().status_code, status.HTTP_404_NOT_FOUND)
+        Book.objects.filter(id=self.book.id).update(pdf_file="pdfs/gone.pdf")
+        self.assertEqual(self.get().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_byte_ranges(self):
+        """Test single ranges, open-ended and suffix ranges get 206"""
+        size = len(self.PDF)
+        for header, start, end in [
+            ("bytes=0-99", 0, 99),
+            ("bytes=100-", 100, size - 1),
+            ("bytes=-50", size - 50, size - 1),
+            ("bytes=9000-99999", 9000, size - 1),
+        ]:
+            with self.subTest(header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+                self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{size}")
+                self.assertEqual(response["Content-Length"], str(end - start + 1))
+                self.assertEqual(b"".join(response.streaming_content), self.PDF[start:end + 1])
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        """Test ranges past the end get 416 and unsupported ones the whole file"""
+        response = self.get(Range=f"bytes={len(self.PDF)}-")
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.PDF)}")
+        for header in ("bytes=0-1,5-6", "bytes=10-5", "items=0-1"):
+            with self.subTest(header):
+                self.assertEqual(self.get(Range=header).status_code, status.HTTP_200_OK)
+
+    def test_conditional_requests(self):
+        """Test If-None-Match and If-Modified-Since answer 304, and If-Range guards ranges"""
+        first = self.get()
+        etag, modified = first["ETag"], first["Last-Modified"]
+        not_modified = self.get(If_None_Match=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], etag)
+        self.assertEqual(self.get(If_Modified_Since=modified).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.get(If_None_Match='"other"').status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get(Range="bytes=0-9", If_Range=etag).status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(self.get(Range="bytes=0-9", If_Range='"other"').status_code, status.HTTP_200_OK)
+
+    def test_head(self):
+        """Test HEAD reports the size without a body"""
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Length"], str(len(self.PDF)))
+        self.assertEqual(response.content, b"")
+
+    def test_proxy_handoff(self):
+        """Test the transfer can be handed to nginx or mod_xsendfile"""
+        name = self.book.pdf_file.name
+        with override_settings(BOOK_PDF_SENDFILE="x-accel-redirect"):
+            response = self.get()
+            self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{name}")
+            self.assertEqual(response.content, b"")
+        with override_settings(BOOK_PDF_SENDFILE="x-sendfile"):
+            self.assertEqual(self.get()["X-Sendfile"], self.book.pdf_file.path)
+        # Freshness is still checked before handing off
+        with override_settings(BOOK_PDF_SENDFILE="x-accel-redirect"):
+            etag = self.get()["ETag"]
+            self.assertEqual(self.get(If_None_Match=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ChunkedUploadTest(APITestCase):
+    """Tests for resumable chunked uploads of PDFs and covers"""
+
+    CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * 10
+
+    def setUp(self):
+        for setting in ("MEDIA_ROOT", "BOOK_UPLOAD_DIR"):
+            directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+            override = override_settings(**{setting: directory})
+            override.enable()
+            self.addCleanup(override.disable)
+        chunk_size = override_settings(BOOK_UPLOAD_CHUNK_SIZE=1000)
+        chunk_size.enable()
+        self.addCleanup(chunk_size.disable)
+        self.admin = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123",
+            role="ADMIN",
+            is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=1, available_quantity=1,
+            cover_image=SimpleUploadedFile("cover.gif", GIF_1PX)
+        )
+
+    def start(self, content=None, kind="pdf", filename="clean-code.pdf", sha256=True):
+        content = self.CONTENT if content is None else content
+        payload = {"kind": kind, "filename": filename, "size": len(content)}
+        if sha256:
+            payload["sha256"] = hashlib.sha256(content).hexdigest()
+        response = self.client.post("/api/books/uploads/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def put_chunk(self, upload, index, data, sha256=None):
+        return self.client.put(
+            f"/api/books/uploads/{upload['id']}/chunks/{index}/", data,
+            content_type="application/octet-stream",
+            headers={"X-Chunk-SHA256": sha256 or hashlib.sha256(data).hexdigest()}
+        )
+
+    def put_all(self, upload, content):
+        size = upload["chunk_size"]
+        for index in reversed(range(upload["chunk_count"])):
+            response = self.put_chunk(upload, index, content[index * size:(index + 1) * size])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def complete(self, upload, book=None):
+        return self.client.post(
+            f"/api/books/uploads/{upload['id']}/complete/", {"book": (book or self.book).id}, format="json"
+        )
+
+    def test_pdf_round_trip(self):
+        """Test chunks sent out of order are joined into the book's PDF"""
+        upload = self.start()
+        self.assertEqual((upload["chunk_size"], upload["chunk_count"]), (1000, 3))
+        self.put_all(upload, self.CONTENT)
+        status_response = self.client.get(f"/api/books/uploads/{upload['id']}/")
+        self.assertEqual(status_response.data["received"], [0, 1, 2])
+
+        response = self.complete(upload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.book.refresh_from_db()
+        digest = hashlib.sha256(self.CONTENT).hexdigest()
+        self.assertEqual(self.book.pdf_file.name, f"pdfs/{digest[:2]}/{digest}.pdf")
+        with self.book.pdf_file.open("rb") as handle:
+            self.assertEqual(handle.read(), self.CONTENT)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(settings.BOOK_UPLOAD_DIR), [])
+
+    def test_bad_chunks_are_rejected(self):
+        """Test chunks with the wrong checksum, size or number are not kept"""
+        upload = self.start()
+        chunk = self.CONTENT[:1000]
+        self.assertEqual(self.put_chunk(upload, 0, chunk, sha256="0" * 64).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(upload, 0, chunk[:-1]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(upload, 0, chunk + b"x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(upload, 3, chunk).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put_chunk(upload, 0, chunk, sha256="nope").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(f"/api/books/uploads/{upload['id']}/").data["received"], [])
+
+    def test_resent_chunk_replaces_the_first(self):
+        """Test a chunk can be sent again, e.g. after a timeout"""
+        upload = self.start(sha256=False)
+        self.put_chunk(upload, 0, b"x" * 1000)
+        self.put_all(upload, self.CONTENT)
+        self.assertEqual(len(os.listdir(uploads.upload_dir(upload["id"]))), 3)
+        self.assertEqual(self.complete(upload).status_code, status.HTTP_200_OK)
+        with Book.objects.get().pdf_file.open("rb") as handle:
+            self.assertEqual(handle.read(), self.CONTENT)
+
+    def test_assembly_is_verified(self):
+        """Test completing reports missing chunks and a whole-file checksum mismatch"""
+        upload = self.start()
+        self.put_chunk(upload, 1, self.CONTENT[1000:2000])
+        response = self.complete(upload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["missing"], [0, 2])
+
+        other = b"y" * len(self.CONTENT)
+        self.put_all(upload, other)
+        response = self.complete(upload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("sha256", response.data)
+        self.assertFalse(Book.objects.get().pdf_file)
+        self.assertTrue(ChunkedUpload.objects.exists())
+
+    def test_cover_upload(self):
+        """Test covers are checked to be images before replacing the current one"""
+        upload = self.start(b"not an image", kind="cover", filename="cover.png")
+        self.put_all(upload, b"not an image")
+        self.assertEqual(self.complete(upload).status_code, status.HTTP_400_BAD_REQUEST)
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (300, 450), "red").save(buffer, "PNG")
+        image = buffer.getvalue()
+        upload = self.start(image, kind="cover", filename="cover.png")
+        self.put_all(upload, image)
+        self.assertEqual(self.complete(upload).status_code, status.HTTP_200_OK)
+        self.book.refresh_from_db()
+        self.assertTrue(self.book.cover_image.name.endswith(hashlib.sha256(image).hexdigest() + ".png"))
+        self.assertTrue(covers.pending_books().filter(id=self.book.id).exists())
+
+    def test_sessions_are_private_to_admins(self):
+        """Test members cannot upload and admins only see their own sessions"""
+        upload = self.start()
+        other = User.objects.create_user(
+            username="admin2", email="admin2@test.com", password="Admin@123", role="ADMIN", is_staff=True
+        )
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(f"/api/books/uploads/{upload['id']}/").status_code,
+                         status.HTTP_404_NOT_FOUND)
+        member = User.objects.create_user(username="member", email="member@test.com", password="Member@123")
+        self.client.force_authenticate(user=member)
+        response = self.client.post("/api/books/uploads/", {"kind": "pdf", "filename": "a.pdf", "size": 1})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_sessions_are_refused(self):
+        """Test the declared size, kind and checksum are validated"""
+        for payload in (
+            {"kind": "pdf", "filename": "a.pdf", "size": 0},
+            {"kind": "epub", "filename": "a.epub", "size": 10},
+            {"kind": "pdf", "filename": "a.pdf", "size": 10, "sha256": "abc"},
+            {"kind": "pdf", "filename": "/", "size": 10},
+        ):
+            with self.subTest(payload):
+                response = self.client.post("/api/books/uploads/", payload, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunks_refresh_the_session_at_most_once_a_minute(self):
+        """Test a chunk keeps an idle session alive without writing the row for every chunk"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        upload = self.start()
+        idle = timezone.now() - timedelta(minutes=5)
+        ChunkedUpload.objects.filter(id=upload["id"]).update(updated_at=idle)
+        self.put_chunk(upload, 0, self.CONTENT[:1000])
+        touched = ChunkedUpload.objects.get(id=upload["id"]).updated_at
+        self.assertGreater(touched, idle)
+        with self.assertNumQueries(1):
+            response = self.put_chunk(upload, 0, self.CONTENT[:1000])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ChunkedUpload.objects.get(id=upload["id"]).updated_at, touched)
+
+    def test_abandoned_uploads_are_purged(self):
+        """Test purge_uploads removes idle sessions and orphaned chunk folders"""
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        stale = self.start()
+        self.put_chunk(stale, 0, self.CONTENT[:1000])
+        fresh = self.start()
+        ChunkedUpload.objects.filter(id=stale["id"]).update(updated_at=timezone.now() - timedelta(days=2))
+        orphan = os.path.join(settings.BOOK_UPLOAD_DIR, "orphan")
+        os.makedirs(orphan)
+        os.utime(orphan, (0, 0))
+        self.assertEqual(self.client.get(f"/api/books/uploads/{stale['id']}/").status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+        out = io.StringIO()
+        call_command("purge_uploads", stdout=out)
+        self.assertIn("Purged 1 stale upload(s) and 1 orphaned", out.getvalue())
+        self.assertEqual(list(ChunkedUpload.objects.values_list("id", flat=True)), [uuid.UUID(fresh["id"])])
+        self.assertEqual(os.listdir(settings.BOOK_UPLOAD_DIR), [])
+
+
+class ContentAddressedStorageTest(APITestCase):
+    """Tests for hashed cover/PDF storage, reference counting and dedupe_media"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        # No grace period, so files saved by the test itself can be released
+        media = override_settings(MEDIA_ROOT=self.media_root, MEDIA_RELEASE_GRACE=0)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def add_book(self, isbn, cover=GIF_1PX, pdf=None, name="cover.gif"):
+        return Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn=isbn, quantity=1, available_quantity=1,
+            cover_image=SimpleUploadedFile(name, cover),
+            pdf_file=SimpleUploadedFile("book.pdf", pdf) if pdf else None
+        )
+
+    def test_same_file_is_stored_once(self):
+        """Test identical uploads share one hash-named file"""
+        first = self.add_book("9780132350884", name="a.GIF")
+        second = self.add_book("9780201485677", name="b.gif")
+        digest = hashlib.sha256(GIF_1PX).hexdigest()
+        self.assertEqual(first.cover_image.name, f"covers/{digest[:2]}/{digest}.gif")
+        self.assertEqual(second.cover_image.name, first.cover_image.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "covers", digest[:2])), [f"{digest}.gif"])
+        self.assertEqual(dedup.references(first.cover_image.name), 2)
+
+    def test_files_are_deleted_with_their_last_book(self):
+        """Test a shared file survives until no book refers to it"""
+        first = self.add_book("9780132350884", pdf=b"%PDF-1")
+        second = self.add_book("9780201485677")
+        name = first.cover_image.name
+        covers.generate_pending()
+        variants = Book.objects.get(id=first.id).cover_variants["widths"]["64"]
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(content_storage.exists(name))
+        self.assertFalse(content_storage.exists(first.pdf_file.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(any(content_storage.exists(variant) for variant in variants.values()))
+
+    def test_replaced_file_is_released(self):
+        """Test saving a new PDF deletes the old one once it is unused"""
+        book = self.add_book("9780132350884", pdf=b"%PDF-1")
+        old = book.pdf_file.name
+        book = Book.objects.get()
+        book.pdf_file = SimpleUploadedFile("book.pdf", b"%PDF-2")
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        self.assertNotEqual(book.pdf_file.name, old)
+        self.assertFalse(content_storage.exists(old))
+        self.assertTrue(content_storage.exists(book.pdf_file.name))
+
+    @override_settings(MEDIA_RELEASE_GRACE=60)
+    def test_recently_reused_file_is_kept(self):
+        """Test a file re-used by a save that may not have committed yet is not released"""
+        first = self.add_book("9780132350884", pdf=b"%PDF-1")
+        name = first.pdf_file.name
+        path = content_storage.path(name)
+        os.utime(path, (0, 0))
+        Book.objects.filter(id=first.id).update(pdf_file=None)
+        # Another book saves the same bytes between the count and the delete
+        self.add_book("9780201485677", pdf=b"%PDF-1")
+        Book.objects.filter(pdf_file=name).update(pdf_file=None)
+        self.assertEqual(dedup.release([name]), [])
+        self.assertTrue(content_storage.exists(name))
+        os.utime(path, (0, 0))
+        self.assertEqual(dedup.purge_unused(), [name])
+
+    def test_hashed_urls_are_cached_for_good(self):
+        """Test only content-addressed covers get far-future immutable caching"""
+        from django.test import RequestFactory
+
+        book = self.add_book("9780132350884")
+        os.makedirs(os.path.join(self.media_root, "covers"), exist_ok=True)
+        with open(os.path.join(self.media_root, "covers", "legacy.gif"), "wb") as handle:
+            handle.write(GIF_1PX)
+        request = RequestFactory().get("/media/")
+        hashed = serve_media(request, book.cover_image.name, document_root=self.media_root)
+        self.assertIn("immutable", hashed["Cache-Control"])
+        self.assertIn("max-age=31536000", hashed["Cache-Control"])
+        legacy = serve_media(request, "covers/legacy.gif", document_root=self.media_root)
+        self.assertFalse(legacy.has_header("Cache-Control"))
+        self.assertFalse(is_content_addressed("covers/legacy.gif"))
+        derived = "uploads/ab/" + "ab" * 32 + ".gif"
+        content_storage.save_derived(derived, SimpleUploadedFile("x.gif", GIF_1PX))
+        other = serve_media(request, derived, document_root=self.media_root)
+        self.assertFalse(other.has_header("Cache-Control"))
+
+    def test_dedupe_media_moves_legacy_files(self):
+        """Test the command moves upload-named files and reports the space saved"""
+        from django.core.management import call_command
+
+        os.makedirs(os.path.join(self.media_root, "covers"))
+        for name in ("one.gif", "two.gif"):
+            with open(os.path.join(self.media_root, "covers", name), "wb") as handle:
+                handle.write(GIF_1PX)
+        first = self.add_book("9780132350884")
+        second = self.add_book("9780201485677")
+        Book.objects.filter(id=first.id).update(cover_image="covers/one.gif")
+        Book.objects.filter(id=second.id).update(cover_image="covers/two.gif")
+
+        out = io.StringIO()
+        call_command("dedupe_media", "--dry-run", stdout=out)
+        self.assertIn("Would move 2 file(s) used by 2 book(s) into 1 stored file(s)", out.getvalue())
+        self.assertEqual(Book.objects.get(id=first.id).cover_image.name, "covers/one.gif")
+
+        out = io.StringIO()
+        call_command("dedupe_media", stdout=out)
+        self.assertIn("Moved 2 file(s) used by 2 book(s) into 1 stored file(s)", out.getvalue())
+        self.assertIn(f"{2 * len(GIF_1PX)} B -> {len(GIF_1PX)} B, {len(GIF_1PX)} B saved", out.getvalue())
+        names = set(Book.objects.values_list("cover_image", flat=True))
+        self.assertEqual(names, {content_storage.hashed_name("covers/x.gif", hashlib.sha256(GIF_1PX).hexdigest())})
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "covers", "one.gif")))
+        self.assertEqual(dedup.dedupe_existing()["files"], 0)
+
+
+class BookAutocompleteTest(APITestCase):
+    """Tests for /api/books/autocomplete/ and its in-memory prefix index"""
+
+    def setUp(self):
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.client.force_authenticate(user=self.member)
+        self.pragmatic = self.add_book("The Pragmatic Programmer", "Andrew Hunt", "9780201616224")
+        self.pearls = self.add_book("Programming Pearls", "Jon Bentley", "9780201657883")
+        self.geb = self.add_book("Gödel, Escher, Bach", "Douglas Hofstadter", "9780465026562")
+        self.taocp = self.add_book("The Art of Computer Programming", "Donald Knuth", "9780201896831")
+        from transactions.models import Transaction
+
+        # Popularity is the number of loans
+        for book, loans in ((self.pearls, 3), (self.taocp, 1)):
+            for _ in range(loans):
+                Transaction.objects.create(user=self.member, book=book)
+
+    def add_book(self, title, author, isbn):
+        return Book.objects.create(
+            title=title, author=author, category="Programming",
+            isbn=isbn, quantity=1, available_quantity=1
+        )
+
+    def suggest(self, q, **params):
+        response = self.client.get("/api/books/autocomplete/", {"q": q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["title"] for item in response.data["results"]]
+
+    def test_prefixes_ranked_by_popularity(self):
+        """Test word prefixes match and the most borrowed books come first"""
+        self.assertEqual(self.suggest("prog"), [
+            "Programming Pearls", "The Art of Computer Programming", "The Pragmatic Programmer",
+        ])
+        self.assertEqual(self.suggest("prog", limit=1), ["Programming Pearls"])
+        self.assertEqual(self.suggest("knu"), ["The Art of Computer Programming"])
+
+    def test_every_word_must_match(self):
+        """Test each word of the query is a prefix of some title or author word"""
+        self.assertEqual(self.suggest("pragm prog"), ["The Pragmatic Programmer"])
+        self.assertEqual(self.suggest("hunt prog"), ["The Pragmatic Programmer"])
+        self.assertEqual(self.suggest("pragm pearls"), [])
+
+    def test_normalized_matching(self):
+        """Test matching ignores case, accents and punctuation"""
+        self.assertEqual(self.suggest("GODEL esch"), ["Gödel, Escher, Bach"])
+        self.assertEqual(self.suggest("gödel,"), ["Gödel, Escher, Bach"])
+        self.assertEqual(self.suggest(""), [])
+        self.assertEqual(self.suggest("  ,  "), [])
+
+    def test_served_from_memory(self):
+        """Test only the first request reads the database"""
+        self.suggest("prog")
+        with self.assertNumQueries(0):
+            self.suggest("the art")
+
+    def test_follows_book_saves_and_deletes(self):
+        """Test committed saves and deletes update a built index"""
+        self.suggest("prog")
+        with self.captureOnCommitCallbacks(execute=True):
+            book = self.add_book("Refactoring", "Martin Fowler", "9780201485677")
+        self.assertEqual(self.suggest("refac"), ["Refactoring"])
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = "Clean Architecture"
+            book.save()
+        self.assertEqual(self.suggest("refac"), [])
+        self.assertEqual(self.suggest("clean"), ["Clean Architecture"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pearls.delete()
+        self.assertEqual(self.suggest("prog", limit=5), [
+            "The Art of Computer Programming", "The Pragmatic Programmer",
+        ])
+
+    def test_saves_during_the_first_build_are_kept(self):
+        """Test a save committed while the first build reads the books reaches the index"""
+        build_index = autocomplete.build_index
+
+        def build_while_saving():
+            index = build_index()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.add_book("Refactoring", "Martin Fowler", "9780201485677")
+            return index
+
+        with mock.patch.object(autocomplete, "build_index", side_effect=build_while_saving):
+            self.assertEqual(self.suggest("refac"), ["Refactoring"])
+        self.assertEqual(self.suggest("refac"), ["Refactoring"])
+
+    def test_index_stays_consistent(self):
+        """Test the sorted word list matches the postings after updates"""
+        index = autocomplete.PrefixIndex()
+        index.load([(1, "Alpha Beta", "Gamma", 0), (2, "Beta", "Delta", 5)])
+        index.add(3, "Alphabet", "Epsilon")
+        index.add(1, "Zeta", "Gamma")
+        index.remove(2)
+        self.assertEqual(index.words, sorted(index.postings))
+        self.assertEqual(set(index.words), {"zeta", "gamma", "alphabet", "epsilon"})
+        self.assertEqual([item["id"] for item in index.search("alp", 5)], [3])
+
+    def test_short_prefixes_are_ranked_in_advance(self):
+        """Test the best books of short prefixes stay right through adds, updates and removes"""
+        rng = random.Random(7)
+        words = ["ab", "abc", "abd", "b", "bca", "cab", "cd"]
+        rows = [(i, " ".join(rng.sample(words, 2)), rng.choice(words), rng.randrange(5)) for i in range(60)]
+        index = autocomplete.PrefixIndex()
+        index.load(rows)
+        popularity = {book_id: loans for book_id, _, _, loans in rows}
+        for step in range(200):
+            book_id = rng.randrange(80)
+            if rng.random() < 0.3:
+                index.remove(book_id)
+            else:
+                index.add(book_id, " ".join(rng.sample(words, 2)), rng.choice(words), popularity.get(book_id))
+            for prefix in ("a", "ab", "abc", "b", "c", "ca"):
+                expected = [item["id"] for item in index.rank(*index.candidates((prefix,)), 20)]
+                self.assertEqual([item["id"] for item in index.search(prefix, 20)], expected)
+                self.assertEqual([item["id"] for item in index.search(prefix, 3)], expected[:3])
+            self.assertIn("ab", index.top)
+
+    def test_saves_keep_unrelated_results(self):
+        """Test a change only forgets the remembered results a changed book could be part of"""
+        index = autocomplete.PrefixIndex()
+        index.load([(1, "Programming Pearls", "Jon Bentley", 3), (2, "Refactoring", "Martin Fowler", 0)])
+        index.search("prog", 5)
+        index.search("refac", 5)
+        index.add(3, "Progress", "Somebody")
+        self.assertEqual(set(index.results), {(("refac",), 5)})
+        self.assertEqual([item["id"] for item in index.search("prog", 5)], [1, 3])
+        index.remove(2)
+        self.assertEqual(set(index.results), {(("prog",), 5)})
+
+    def test_ranking_does_not_hold_the_lock(self):
+        """Test suggestions are ranked outside the index lock, so saves are not held up"""
+        self.suggest("prog")
+        rank = autocomplete.PrefixIndex.rank
+        held = []
+
+        def ranking(index, *args, **kwargs):
+            held.append(autocomplete._lock.locked())
+            return rank(index, *args, **kwargs)
+
+        with mock.patch.object(autocomplete.PrefixIndex, "rank", ranking):
+            self.assertEqual(self.suggest("programmi"), ["Programming Pearls", "The Art of Computer Programming"])
+        self.assertEqual(held, [False])
+
+    def test_requires_authentication(self):
+        """Test anonymous users get no suggestions"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get("/api/books/autocomplete/", {"q": "prog"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,234 @@
+"""
+Resumable chunked uploads of book PDFs and covers.
+
+A large file is sent as a session of numbered chunks instead of one
+multipart request, so a dropped connection costs one chunk, not the file:
+
+1. ``POST /api/books/uploads/`` with ``kind`` (``pdf`` or ``cover``),
+   ``filename``, ``size`` and optionally the file's ``sha256``. The reply
+   carries the session ``id``, the ``chunk_size`` and the chunk count.
+2. ``PUT /api/books/uploads/{id}/chunks/{n}/`` for n = 0, 1, ... with the
+   raw bytes as body and their hex SHA-256 in ``X-Chunk-SHA256``. Every
+   chunk is chunk_size bytes except the last. Chunks may arrive in any
+   order and in parallel, and a chunk can be sent again.
+3. ``GET /api/books/uploads/{id}/`` lists the chunks received so far, to
+   resume after an interruption.
+4. ``POST /api/books/uploads/{id}/complete/`` with ``book`` joins the
+   chunks, verifies them, and moves the result into the book's
+   ``pdf_file`` or ``cover_image``.
+
+Chunk bodies are read from the request stream in small blocks straight
+into a file under BOOK_UPLOAD_DIR, never into memory. A chunk is only
+kept once its size and checksum match; its file name records the
+checksum (``000003.<sha256>``), so received chunks are listed from disk
+and checked again when the file is assembled. Sessions idle for
+BOOK_UPLOAD_EXPIRY seconds are removed by ``manage.py purge_uploads``; a
+chunk marks its session active by moving ``updated_at``, but at most once
+every TOUCH_INTERVAL seconds, so most chunks write nothing to the database.
+"""
+import contextlib
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .models import ChunkedUpload
+
+BLOCK_SIZE = 64 * 1024
+# Sessions expire after hours, so their activity time only needs minute precision
+TOUCH_INTERVAL = 60
+FIELDS = {ChunkedUpload.PDF: 'pdf_file', ChunkedUpload.COVER: 'cover_image'}
+
+_CHUNK_NAME = re.compile(r'(\d{6})\.([0-9a-f]{64})')
+_SHA256 = re.compile(r'[0-9a-f]{64}')
+
+
+class MissingChunks(Exception):
+    """Chunks that must be (re)sent before the upload can be completed"""
+
+    def __init__(self, chunks):
+        super().__init__(chunks)
+        self.chunks = chunks
+
+
+class AssembledFile(File):
+    """An assembled upload on disk; FileSystemStorage moves it instead of copying"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def is_sha256(value):
+    """True for a lowercase hex SHA-256 digest"""
+    return bool(_SHA256.fullmatch(value))
+
+
+def live_uploads():
+    """Sessions that have not been idle for longer than BOOK_UPLOAD_EXPIRY"""
+    cutoff = timezone.now() - timedelta(seconds=settings.BOOK_UPLOAD_EXPIRY)
+    return ChunkedUpload.objects.filter(updated_at__gte=cutoff)
+
+
+def touch(upload):
+    """Mark the session active, unless that was done in the last TOUCH_INTERVAL seconds"""
+    now = timezone.now()
+    if now - upload.updated_at >= timedelta(seconds=TOUCH_INTERVAL):
+        ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=now)
+        upload.updated_at = now
+
+
+def upload_dir(upload_id):
+    return os.path.join(settings.BOOK_UPLOAD_DIR, str(upload_id))
+
+
+def received_chunks(upload):
+    """{index: (path, sha256)} for every verified chunk on disk"""
+    directory = upload_dir(upload.pk)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return {}
+    chunks = {}
+    for name in names:
+        match = _CHUNK_NAME.fullmatch(name)
+        if match:
+            chunks[int(match.group(1))] = (os.path.join(directory, name), match.group(2))
+    return chunks
+
+
+def write_chunk(upload, index, stream, sha256):
+    """Copy chunk `index` from stream to disk, keeping it only if size and checksum match"""
+    if not 0 <= index < upload.chunk_count:
+        raise ValidationError({'chunk': f'Expected a chunk number from 0 to {upload.chunk_count - 1}.'})
+    expected = upload.chunk_length(index)
+    directory = upload_dir(upload.pk)
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+    fd, part = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while stream is not None and written <= expected:
+                # One byte past the expected length is enough to reject it
+                block = stream.read(min(BLOCK_SIZE, expected - written + 1))
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+                written += len(block)
+        if written != expected:
+            raise ValidationError({'chunk': f'Chunk {index} must be {expected} bytes, got {written}.'})
+        if digest.hexdigest() != sha256:
+            raise ValidationError({'chunk': f'Chunk {index} does not match its SHA-256; send it again.'})
+        final = os.path.join(directory, f'{index:06d}.{sha256}')
+        os.replace(part, final)
+    except BaseException:
+        os.unlink(part)
+        raise
+    # A resent chunk with other bytes replaces the earlier copy
+    for name in os.listdir(directory):
+        if name.startswith(f'{index:06d}.') and name != os.path.basename(final):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(directory, name))
+
+
+def assemble(upload):
+    """Path of one file holding every chunk in order, checked chunk by chunk and as a whole"""
+    chunks = received_chunks(upload)
+    missing = [index for index in range(upload.chunk_count) if index not in chunks]
+    if missing:
+        raise MissingChunks(missing)
+    whole = hashlib.sha256()
+    fd, path = tempfile.mkstemp(dir=upload_dir(upload.pk), suffix='.assembled')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for index in range(upload.chunk_count):
+                chunk_path, sha256 = chunks[index]
+                digest = hashlib.sha256()
+                with open(chunk_path, 'rb') as chunk:
+                    for block in iter(lambda: chunk.read(BLOCK_SIZE), b''):
+                        digest.update(block)
+                        whole.update(block)
+                        out.write(block)
+                if digest.hexdigest() != sha256:
+                    # Damaged on disk since it was received; the client resends it
+                    os.unlink(chunk_path)
+                    raise MissingChunks([index])
+        if upload.sha256 and whole.hexdigest() != upload.sha256:
+            raise ValidationError({'sha256': 'The assembled file does not match the SHA-256 given for it.'})
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _check_cover(path):
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError({'file': 'The uploaded cover is not a valid image.'})
+
+
+def attach(upload, book):
+    """Assemble the upload into the book's file field and end the session"""
+    path = assemble(upload)
+    field = FIELDS[upload.kind]
+    try:
+        if upload.kind == ChunkedUpload.COVER:
+            _check_cover(path)
+        # Assembly ran outside the transaction, so it never holds a lock
+        with transaction.atomic():
+            # Deleting the session claims it: a second /complete/ finds nothing
+            claimed, _ = ChunkedUpload.objects.filter(pk=upload.pk).delete()
+            if not claimed:
+                raise NotFound('This upload was already completed or has expired.')
+            with open(path, 'rb') as handle:
+                getattr(book, field).save(upload.filename, AssembledFile(handle), save=False)
+            book.save(update_fields=[field])
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+    shutil.rmtree(upload_dir(upload.pk), ignore_errors=True)
+    return book
+
+
+def discard(upload):
+    shutil.rmtree(upload_dir(upload.pk), ignore_errors=True)
+    upload.delete()
+
+
+def purge_stale(max_age=None):
+    """
+    Remove sessions idle for more than max_age seconds (BOOK_UPLOAD_EXPIRY
+    by default) and chunk directories left without a session.
+    Returns (sessions, directories) removed.
+    """
+    max_age = settings.BOOK_UPLOAD_EXPIRY if max_age is None else max_age
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    sessions = 0
+    for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff).iterator():
+        discard(upload)
+        sessions += 1
+
+    directories = 0
+    try:
+        entries = list(os.scandir(settings.BOOK_UPLOAD_DIR))
+    except FileNotFoundError:
+        return sessions, directories
+    known = {str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+    for entry in entries:
+        # Old enough that no session can be about to claim it
+        if entry.is_dir() and entry.name not in known and entry.stat().st_mtime < cutoff.timestamp():
+            shutil.rmtree(entry.path, ignore_errors=True)
+            directories += 1
+    return sessions, directories
@@ -1,7 +1,17 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import BookViewSet
+from .views import (
+    BookViewSet, ChunkedUploadCreateView, ChunkedUploadDetailView,
+    ChunkedUploadChunkView, ChunkedUploadCompleteView,
+)
 
 router = DefaultRouter()
 router.register('', BookViewSet, basename='books')
 
-urlpatterns = router.urls
+# Before the router, whose book detail route would also match "uploads/"
+urlpatterns = [
+    path('uploads/', ChunkedUploadCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:upload_id>/', ChunkedUploadDetailView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', ChunkedUploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:upload_id>/complete/', ChunkedUploadCompleteView.as_view(), name='upload-complete'),
+] + router.urls
@@ -1,21 +1,44 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.shortcuts import get_object_or_404
+from django.utils.text import slugify
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from rest_framework.filters import SearchFilter
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Book
-from .serializers import BookSerializer
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from backend.export import EXPORT_RENDERERS, export_response, filter_date_range, parse_choices
+from .models import Book, ChunkedUpload
+from .serializers import BookSerializer, ChunkedUploadSerializer
+from .search import FullTextSearchFilter
+from .pagination import BookCursorPagination
+from . import cache as book_cache
+from . import autocomplete as book_autocomplete
+from . import importer
+from . import uploads
+from .covers import variant_urls
+from .downloads import PDFRenderer, pdf_response
 
 class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
+    pagination_class = BookCursorPagination
     search_fields = ['title', 'author', 'category']
+    export_fields = ('id', 'title', 'author', 'isbn', 'category', 'quantity', 'available_quantity', 'created_at')
 
     def get_permissions(self):
         """Define permissions based on action"""
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
-            # Admin only for write operations
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_import', 'export']:
+            # Admin only for write operations and the full export
             permission_classes = [IsAdminUser]
         elif self.action == 'by_category':
             # Public access for by-category
@@ -28,26 +51,194 @@ class BookViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def _cached(self, key, build):
+        """Response data from the cache, or from build() and then cached"""
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, settings.BOOKS_CACHE_TIMEOUT)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        key = book_cache.list_key(request.build_absolute_uri())
+        return self._cached(key, lambda: self._list_data(request, *args, **kwargs))
+
+    def _list_data(self, request, *args, **kwargs):
+        data = super().list(request, *args, **kwargs).data
+        if hasattr(self, 'did_you_mean'):
+            # Set by FullTextSearchFilter for ?fuzzy=1
+            data['did_you_mean'] = self.did_you_mean
+        return data
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            book_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        key = book_cache.detail_key(book_id, request.build_absolute_uri())
+        return self._cached(key, lambda: super(BookViewSet, self).retrieve(request, *args, **kwargs).data)
+
     @action(detail=False, methods=['get'], url_path='by-category', permission_classes=[AllowAny])
     def by_category(self, request):
         """Group books by category - public access"""
-        books = self.get_queryset()
+        limit = self._by_category_limit(request)
+        key = book_cache.by_category_key(limit)
+        cached = cache.get(key)
+        if cached is None:
+            categories = self._group_by_category(limit)
+            body = json.dumps(categories, sort_keys=True).encode()
+            cached = (categories, '"%s"' % hashlib.md5(body).hexdigest())
+            cache.set(key, cached, settings.BOOKS_BY_CATEGORY_CACHE_TIMEOUT)
+        categories, etag = cached
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(categories)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.BOOKS_BY_CATEGORY_MAX_AGE)
+        return response
+
+    def _by_category_limit(self, request):
+        """Books per category, from ?limit= (clamped) or the default"""
+        default = settings.BOOKS_BY_CATEGORY_LIMIT
+        try:
+            limit = int(request.query_params.get('limit', default))
+        except ValueError:
+            limit = default
+        return max(1, min(limit, 100))
+
+    def _group_by_category(self, limit):
+        """First `limit` books of each category, reading only the shown columns"""
+        rows = (
+            self.get_queryset()
+            .annotate(position=Window(RowNumber(), partition_by=[F('category')], order_by=F('id').asc()))
+            .filter(position__lte=limit)
+            .order_by('category', 'id')
+            .values_list('id', 'title', 'author', 'category', 'cover_image', 'cover_variants')
+        )
+        storage = Book._meta.get_field('cover_image').storage
         categories = {}
-        for book in books:
-            cat = book.category or 'Uncategorized'
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append({
-                'id': book.id,
-                'title': book.title,
-                'author': book.author,
-                'cover_image': book.cover_image.url if book.cover_image else None,
+        for book_id, title, author, category, cover_image, cover_variants in rows:
+            categories.setdefault(category or 'Uncategorized', []).append({
+                'id': book_id,
+                'title': title,
+                'author': author,
+                'cover_image': storage.url(cover_image) if cover_image else None,
+                'cover_variants': variant_urls(cover_variants, cover_image, storage.url),
             })
-        return Response(categories)
+        return categories
+
+    @action(detail=False, methods=['get'], url_path='autocomplete')
+    def autocomplete(self, request):
+        """Typeahead suggestions for ?q=, from this process's in-memory prefix index"""
+        try:
+            limit = int(request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = settings.AUTOCOMPLETE_LIMIT
+        query = request.query_params.get('q', '')[:100]
+        limit = max(1, min(limit, book_autocomplete.MAX_LIMIT))
+        return Response({'results': book_autocomplete.suggest(query, limit)})
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Create or update books from an uploaded CSV or JSONL file, by ISBN - admin only"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV or JSONL file as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = importer.guess_format(upload.name, upload.content_type)
+        report = importer.BookImporter().run(importer.read_rows(upload, file_format))
+        return Response(report, status=status.HTTP_400_BAD_REQUEST if report['error'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Stream the catalog as CSV or NDJSON - admin only"""
+        queryset = filter_date_range(request, Book.objects.order_by('id'), 'created_at')
+        # AVAILABLE: at least one copy on the shelf; both values: no filter
+        statuses = parse_choices(request, 'status', ['AVAILABLE', 'UNAVAILABLE'])
+        if statuses and len(set(statuses)) == 1:
+            if statuses[0] == 'AVAILABLE':
+                queryset = queryset.filter(available_quantity__gt=0)
+            else:
+                queryset = queryset.filter(available_quantity=0)
+        columns = {field: field for field in self.export_fields}
+        return export_response(request, queryset, columns, 'books')
+
+    @action(detail=True, methods=['get', 'head'], url_path='pdf',
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, PDFRenderer])
+    def pdf(self, request, pk=None):
+        """Stream the book's PDF, with Range and If-None-Match support - authenticated users"""
+        book = self.get_object()
+        if not book.pdf_file:
+            return Response({'error': 'This book has no PDF'}, status=status.HTTP_404_NOT_FOUND)
+        # Stored under its content hash; offered under the book's title
+        return pdf_response(request, book.pdf_file.name, filename=f"{slugify(book.title) or 'book'}.pdf")
 
     @action(detail=False, methods=['get'], url_path='count', permission_classes=[IsAuthenticated])
     def count(self, request):
         """Get total book count"""
-        count = self.get_queryset().count()
-        return Response({'count': count})
+        return self._cached(book_cache.count_key(), lambda: {'count': self.get_queryset().count()})
+
+
+# Chunked uploads of large PDFs and covers (books/uploads.py) - admin only
+class ChunkedUploadCreateView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = ChunkedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user_id=request.user.id)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadMixin:
+    permission_classes = [IsAdminUser]
+
+    def get_upload(self, request, upload_id):
+        """The caller's own session, unless it has expired"""
+        return get_object_or_404(uploads.live_uploads(), pk=upload_id, user_id=request.user.id)
+
+
+class ChunkedUploadDetailView(ChunkedUploadMixin, APIView):
+    def get(self, request, upload_id):
+        """Session status, with the chunks received so far"""
+        return Response(ChunkedUploadSerializer(self.get_upload(request, upload_id)).data)
+
+    def delete(self, request, upload_id):
+        """Abandon the upload and delete its chunks"""
+        uploads.discard(self.get_upload(request, upload_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChunkedUploadChunkView(ChunkedUploadMixin, APIView):
+    def put(self, request, upload_id, index):
+        """Store chunk `index`, sent as the raw request body"""
+        sha256 = request.headers.get('X-Chunk-SHA256', '').strip().lower()
+        if not uploads.is_sha256(sha256):
+            return Response({'error': "X-Chunk-SHA256 must be the chunk's hex SHA-256"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        upload = self.get_upload(request, upload_id)
+        # Keeps the session alive while chunks are arriving
+        uploads.touch(upload)
+        # request.stream, not request.data: the body is copied to disk as it is read
+        uploads.write_chunk(upload, index, request.stream, sha256)
+        return Response({'chunk': index, 'sha256': sha256})
+
 
+class ChunkedUploadCompleteView(ChunkedUploadMixin, APIView):
+    def post(self, request, upload_id):
+        """Assemble the chunks into the given book's PDF or cover"""
+        try:
+            book_id = int(request.data.get('book'))
+        except (TypeError, ValueError):
+            return Response({'error': 'book is required'}, status=status.HTTP_400_BAD_REQUEST)
+        upload = self.get_upload(request, upload_id)
+        book = Book.objects.filter(id=book_id).first()
+        if book is None:
+            return Response({'error': 'Book not found'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            uploads.attach(upload, book)
+        except uploads.MissingChunks as exc:
+            return Response({'error': 'Some chunks are missing', 'missing': exc.chunks},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(BookSerializer(book, context={'request': request}).data)
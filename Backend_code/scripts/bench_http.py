@@ -0,0 +1,352 @@
+"""
+End-to-end HTTP benchmark for the library API.
+
+Logs in as members created by ``manage.py generate_dataset`` and drives a
+weighted mix of login, catalog search, by-category, issue, return,
+pay-fine and history calls from concurrent clients against a running server. Prints
+requests/sec and p50/p95/p99 latency per endpoint and saves them as JSON.
+
+Usage (from Backend_code/, with the server running):
+    python manage.py generate_dataset --books 20000 --users 1000 --transactions 100000 --seed 42
+    python scripts/bench_http.py run --seed 42 --concurrency 16 --duration 30 --label sqlite
+    python scripts/bench_http.py compare bench-results/a.json bench-results/b.json
+
+Only the standard library is used, so it also runs from a separate load
+generator machine. Issued books are returned at the end of each client.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MIX = 'login=5,search=30,by_category=15,issue=15,return=15,pay_fine=5,history=15'
+MEMBER_PASSWORD = 'member123'
+
+
+class Client:
+    """One keep-alive connection, JSON in and out"""
+
+    def __init__(self, base_url, recorder):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+        self.token = None
+        self.conn = None
+
+    def request(self, endpoint, method, path, payload=None):
+        headers = {'Accept': 'application/json'}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            self.recorder.record(endpoint, 'error', time.perf_counter() - started)
+            return None, None
+        self.recorder.record(endpoint, status, time.perf_counter() - started)
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def login(self, email, endpoint='login'):
+        status, data = self.request(endpoint, 'POST', '/api/auth/login/', {'email': email, 'password': MEMBER_PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Login failed for {email} ({status}); run generate_dataset with the same --seed first")
+        self.token = data['access']
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, status, seconds):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][str(status)] += 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ACTIONS:
+            raise SystemExit(f"Unknown action {name!r}, choose from {', '.join(ACTIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def load_catalog(client, size):
+    """Book ids and title words to search for, read through the API"""
+    ids, words = [], set()
+    path = f"/api/books/?{urlencode({'page_size': 100})}"
+    while path and len(ids) < size:
+        status, data = client.request('catalog', 'GET', path)
+        if status != 200:
+            raise SystemExit(f"Could not list books ({status})")
+        for book in data['results']:
+            ids.append(book['id'])
+            words.update(word.lower() for word in book['title'].split() if len(word) > 3)
+        following = urlsplit(data['next']) if data['next'] else None
+        path = f'{following.path}?{following.query}' if following else None
+    if not ids:
+        raise SystemExit("The catalog is empty; run generate_dataset first")
+    return ids, sorted(words)
+
+
+# Each action takes (client, state, rng) and returns nothing; state holds the
+# client's email, open loans and the returned loans that still owe a fine
+def do_login(client, state, rng):
+    # A member opening the app again: password check and a fresh token
+    status, data = client.request(
+        'login', 'POST', '/api/auth/login/', {'email': state['email'], 'password': MEMBER_PASSWORD}
+    )
+    if status == 200:
+        client.token = data['access']
+
+
+def do_search(client, state, rng):
+    client.request('search', 'GET', '/api/books/?' + urlencode({'search': rng.choice(state['words'])}))
+
+
+def do_by_category(client, state, rng):
+    client.request('by_category', 'GET', '/api/books/by-category/')
+
+
+def do_issue(client, state, rng):
+    status, data = client.request('issue', 'POST', '/api/transactions/issue/', {'book_id': rng.choice(state['book_ids'])})
+    if status == 201:
+        state['open'].append(data['id'])
+
+
+def do_return(client, state, rng):
+    if not state['open']:
+        return do_issue(client, state, rng)
+    loan_id = state['open'].pop(rng.randrange(len(state['open'])))
+    status, data = client.request('return', 'POST', '/api/transactions/return/', {'transaction_id': loan_id})
+    if status == 200 and float(data.get('fine_amount') or 0) > 0:
+        state['fined'].append((loan_id, data['fine_amount']))
+
+
+def do_pay_fine(client, state, rng):
+    if not state['fined']:
+        return do_history(client, state, rng)
+    loan_id, amount = state['fined'].pop()
+    client.request('pay_fine', 'POST', '/api/transactions/pay-fine/', {'transaction_id': loan_id, 'amount': amount})
+
+
+def do_history(client, state, rng):
+    client.request('history', 'GET', '/api/transactions/my-history/')
+
+
+ACTIONS = {
+    'login': do_login,
+    'search': do_search,
+    'by_category': do_by_category,
+    'issue': do_issue,
+    'return': do_return,
+    'pay_fine': do_pay_fine,
+    'history': do_history,
+}
+
+
+def run_client(index, args, book_ids, words, mix, recorder, deadline):
+    rng = random.Random(args.seed * 1000 + index)
+    client = Client(args.url, recorder)
+    email = f'gen{args.seed}_{index % args.users}@example.com'
+    # Setup calls are recorded apart, so only the mix counts towards each endpoint
+    client.login(email, endpoint='setup')
+    state = {'email': email, 'book_ids': book_ids, 'words': words, 'open': [], 'fined': []}
+    # Fines owed from the generated history give pay_fine something to pay
+    status, data = client.request('setup', 'GET', '/api/transactions/my-history/')
+    if status == 200:
+        state['fined'] = [
+            (loan['id'], loan['fine_amount']) for loan in data['results']
+            if loan['status'] == 'RETURNED' and float(loan['fine_amount']) > 0
+        ]
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        ACTIONS[rng.choices(names, weights)[0]](client, state, rng)
+    # Put the copies back so repeated runs see the same stock
+    for loan_id in state['open']:
+        client.request('cleanup', 'POST', '/api/transactions/return/', {'transaction_id': loan_id})
+    client.close()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        statuses = dict(recorder.statuses[endpoint])
+        endpoints[endpoint] = {
+            'count': len(latencies),
+            'rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2),
+            'errors': sum(count for status, count in statuses.items() if status == 'error' or status.startswith('5')),
+            'statuses': statuses,
+        }
+    return endpoints
+
+
+def print_table(endpoints):
+    print(f"{'endpoint':<12} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  statuses")
+    for name, row in endpoints.items():
+        print(f"{name:<12} {row['count']:>7} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['errors']:>7}  {row['statuses']}")
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    setup = Client(args.url, Recorder())
+    setup.login(f'gen{args.seed}_0@example.com')
+    book_ids, words = load_catalog(setup, args.catalog_size)
+    setup.close()
+
+    print(f"Benchmarking {args.url} with {args.concurrency} clients for {args.duration}s "
+          f"({len(book_ids)} books, mix {args.mix})...")
+    started = time.perf_counter()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_client, index, args, book_ids, words, mix, recorder, deadline)
+            for index in range(args.concurrency)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    endpoints = summarize(recorder, elapsed)
+    print_table(endpoints)
+    total = sum(row['count'] for name, row in endpoints.items() if name not in ('setup', 'cleanup'))
+    print(f"Total: {total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s")
+
+    result = {
+        'meta': {
+            'label': args.label,
+            'url': args.url,
+            'commit': git_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'duration_s': round(elapsed, 2),
+            'concurrency': args.concurrency,
+            'mix': mix,
+            'seed': args.seed,
+        },
+        'total_rps': round(total / elapsed, 2),
+        'endpoints': endpoints,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump(result, handle, indent=2)
+    print(f"Saved {args.output}")
+
+
+def compare(args):
+    with open(args.base) as handle:
+        base = json.load(handle)
+    with open(args.new) as handle:
+        new = json.load(handle)
+
+    def label(result):
+        meta = result['meta']
+        return meta.get('label') or meta.get('commit') or meta['started_at']
+
+    print(f"{label(base)} -> {label(new)}")
+    print(f"{'endpoint':<12} {'req/s':>26} {'p50 ms':>26} {'p99 ms':>26}")
+    for name in sorted(set(base['endpoints']) | set(new['endpoints'])):
+        old_row, new_row = base['endpoints'].get(name), new['endpoints'].get(name)
+        if not old_row or not new_row:
+            continue
+        cells = []
+        for key in ('rps', 'p50_ms', 'p99_ms'):
+            before, after = old_row[key], new_row[key]
+            change = (after - before) / before * 100 if before else 0.0
+            cells.append(f"{before:.1f} -> {after:.1f} ({change:+.0f}%)")
+        print(f"{name:<12} " + ' '.join(f"{cell:>26}" for cell in cells))
+    print(f"{'total':<12} {base['total_rps']:.1f} -> {new['total_rps']:.1f} req/s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='benchmark a running server')
+    run_parser.add_argument('--url', default='http://127.0.0.1:8000', help='server base URL')
+    run_parser.add_argument('--seed', type=int, default=42, help='seed the dataset was generated with')
+    run_parser.add_argument('--users', type=int, default=100, help='generated members to log in as')
+    run_parser.add_argument('--concurrency', type=int, default=16, help='parallel clients')
+    run_parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    run_parser.add_argument('--mix', default=DEFAULT_MIX, help=f'action weights (default {DEFAULT_MIX})')
+    run_parser.add_argument('--catalog-size', type=int, default=2000, help='book ids to pick from')
+    run_parser.add_argument('--label', default='', help='name for this run, e.g. sqlite or postgres')
+    run_parser.add_argument('--output', help='JSON file (default bench-results/<time>-<label>.json)')
+
+    compare_parser = commands.add_parser('compare', help='compare two saved runs')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+
+    args = parser.parse_args()
+    if args.command == 'run' and not args.output:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        args.output = os.path.join('bench-results', f"{stamp}{'-' + args.label if args.label else ''}.json")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
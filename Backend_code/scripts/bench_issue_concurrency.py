@@ -0,0 +1,125 @@
+"""
+Concurrency benchmark for the issue-book endpoint.
+
+Fires many parallel POST /api/transactions/issue/ requests at a single book
+with fewer copies than requests, then checks that exactly `copies` loans were
+created, the stock ended at zero and nothing was oversold.
+
+Usage (from Backend_code/):
+    python scripts/bench_issue_concurrency.py --requests 300 --copies 50 --threads 32
+
+Runs against the database configured in settings; every row it creates is
+deleted again at the end.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+# 1. SETUP DJANGO ENVIRONMENT
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+
+from books.models import Book
+from transactions.models import Transaction
+from users.models import User
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300, help='issue requests to fire')
+    parser.add_argument('--copies', type=int, default=50, help='available copies of the book')
+    parser.add_argument('--threads', type=int, default=32, help='parallel clients')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Allows the 'testserver' host and swaps in the in-memory email backend,
+    # so hundreds of issue notifications are not printed or sent
+    setup_test_environment()
+    # The expected "Book not available" 400s would otherwise be logged one by one
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    run_id = int(time.time())
+    book = Book.objects.create(
+        title=f'Benchmark Book {run_id}',
+        author='Benchmark',
+        category='Benchmark',
+        isbn=f'B{run_id}'[:13],
+        quantity=args.copies,
+        available_quantity=args.copies,
+    )
+    User.objects.bulk_create([
+        User(username=f'bench{run_id}_{i}', email=f'bench{run_id}_{i}@example.com')
+        for i in range(args.requests)
+    ])
+    users = list(User.objects.filter(username__startswith=f'bench{run_id}_'))
+
+    results = []
+    lock = threading.Lock()
+
+    def issue(user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        started = time.perf_counter()
+        try:
+            response = client.post('/api/transactions/issue/', {'book_id': book.id})
+            code = response.status_code
+        except Exception as exc:  # database lock timeouts and the like
+            code = type(exc).__name__
+        finally:
+            connection.close()
+        with lock:
+            results.append((code, time.perf_counter() - started))
+
+    print(f"Firing {args.requests} issue requests at one book with {args.copies} copies "
+          f"over {args.threads} threads ({connection.vendor})...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(issue, users))
+    elapsed = time.perf_counter() - started
+
+    book.refresh_from_db()
+    loans = Transaction.objects.filter(book=book).count()
+    codes = {}
+    for code, _ in results:
+        codes[code] = codes.get(code, 0) + 1
+    latencies = sorted(duration for _, duration in results)
+
+    print(f"Status codes:       {codes}")
+    print(f"Loans created:      {loans} (expected {min(args.copies, args.requests)})")
+    print(f"Stock remaining:    {book.available_quantity} (expected {max(args.copies - args.requests, 0)})")
+    print(f"Throughput:         {len(results) / elapsed:.1f} req/s over {elapsed:.2f}s")
+    print(f"Latency p50 / p99:  {latencies[len(latencies) // 2] * 1000:.1f} ms / "
+          f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+
+    oversold = loans > args.copies or book.available_quantity < 0
+    consistent = loans + book.available_quantity == args.copies
+
+    # Clean up everything this run created
+    book.delete()
+    User.objects.filter(username__startswith=f'bench{run_id}_').delete()
+
+    if oversold or not consistent:
+        print("FAIL: inventory and loans disagree")
+        sys.exit(1)
+    print("OK: no overselling")
+
+
+if __name__ == '__main__':
+    main()
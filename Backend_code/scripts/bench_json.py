@@ -0,0 +1,110 @@
+"""
+Microbenchmark: stock DRF JSON renderer/parser against backend.fastjson.
+
+Serializes an in-memory list of loans with TransactionSerializer (the
+payload shape of /api/transactions/all/ without pagination), then times
+rendering it to bytes and parsing those bytes back with each pair.
+Nothing touches the database.
+
+Usage (from Backend_code/):
+    python scripts/bench_json.py --rows 100 1000 10000 --repeat 5
+
+The fast pair only differs from the stock one when orjson is installed
+(pip install orjson); without it both rows show the stdlib.
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+
+# 1. SETUP DJANGO ENVIRONMENT
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+django.setup()
+
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from backend import fastjson
+from books.models import Book
+from transactions.models import Transaction
+from transactions.serializers import TransactionSerializer
+
+
+def make_payload(rows, seed=1):
+    """TransactionSerializer output for `rows` unsaved loans"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    books = [
+        Book(id=i, title=f'Book {i}', author=f'Author {i % 50}', isbn=f'978{i:010d}',
+             category=f'Category {i % 10}', quantity=3, available_quantity=1)
+        for i in range(1, 501)
+    ]
+    loans = []
+    for i in range(1, rows + 1):
+        issued = now - timedelta(seconds=rng.randrange(365 * 86400))
+        returned = rng.random() < 0.7
+        loans.append(Transaction(
+            id=i, user_id=rng.randint(1, 1000), book=rng.choice(books),
+            issue_date=issued, due_date=issued + timedelta(days=15),
+            return_date=issued + timedelta(days=rng.randint(1, 30)) if returned else None,
+            fine_amount=Decimal(rng.choice((0, 0, 0, 10, 25, 40))),
+            status='RETURNED' if returned else 'ISSUED',
+        ))
+    return TransactionSerializer(loans, many=True).data
+
+
+def best_of(repeat, func):
+    """Fastest and median wall time of func() over repeat runs, in ms"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times), statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='payload sizes, in serialized loans')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement, the best is reported')
+    args = parser.parse_args()
+
+    engine = f"orjson {fastjson.orjson.__version__}" if fastjson.orjson else "stdlib (orjson not installed)"
+    print(f"fast pair uses {engine}")
+    print(f"{'rows':>7} {'step':<7} {'stock ms':>10} {'fast ms':>10} {'speedup':>8}")
+
+    pairs = {
+        'stock': (JSONRenderer(), JSONParser()),
+        'fast': (fastjson.FastJSONRenderer(), fastjson.FastJSONParser()),
+    }
+    for rows in args.rows:
+        data = make_payload(rows)
+        body = JSONRenderer().render(data)
+        if pairs['fast'][0].render(data) != body:
+            sys.exit("fast renderer output differs from the stock renderer")
+        results = {}
+        for name, (renderer, json_parser) in pairs.items():
+            results[name, 'render'] = best_of(args.repeat, lambda: renderer.render(data))
+            results[name, 'parse'] = best_of(args.repeat, lambda: json_parser.parse(io.BytesIO(body)))
+        for step in ('render', 'parse'):
+            stock, fast = results['stock', step][0], results['fast', step][0]
+            print(f"{rows:>7} {step:<7} {stock:>10.2f} {fast:>10.2f} {stock / fast:>7.1f}x")
+        print(f"{'':>7} {len(body) / 1024:.0f} KiB payload")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Microbenchmark: plain full-text search against ?fuzzy=1 trigram search.
+
+Picks words from the titles and authors of random books in the current
+database, misspells each one (a dropped, doubled, swapped or replaced
+letter) and times books.search on them: the plain search for the word as
+written, the plain search for the misspelling (which usually finds
+nothing) and the fuzzy search for the misspelling. Prints p50/p95/p99
+latency per mode and how often the fuzzy search suggested the original
+word back.
+
+Usage (from Backend_code/):
+    python manage.py generate_dataset --books 1000000 --users 10 --transactions 0 --seed 42
+    python scripts/bench_search.py --queries 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+# 1. SETUP DJANGO ENVIRONMENT
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+django.setup()
+
+from django.db import connection
+from django.db.models import Max, Min
+
+from books import search
+from books.autocomplete import normalize
+from books.models import Book
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def misspell(word, rng):
+    """word with one typo, never word itself"""
+    while True:
+        i = rng.randrange(1, len(word) - 1)
+        edit = rng.choice(('drop', 'double', 'swap', 'replace'))
+        if edit == 'drop':
+            typo = word[:i] + word[i + 1:]
+        elif edit == 'double':
+            typo = word[:i] + word[i] + word[i:]
+        elif edit == 'swap':
+            typo = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        else:
+            typo = word[:i] + rng.choice(LETTERS) + word[i + 1:]
+        if typo != word:
+            return typo
+
+
+def sample_words(count, rng, min_length=5):
+    """Up to count catalog words of at least min_length letters, from random books"""
+    bounds = Book.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        sys.exit("No books; run manage.py generate_dataset first.")
+    words = []
+    for _ in range(count * 20):
+        if len(words) == count:
+            break
+        book = Book.objects.filter(id__gte=rng.randint(bounds['first'], bounds['last'])).order_by('id').first()
+        choices = [word for word in normalize(f'{book.title} {book.author}') if len(word) >= min_length]
+        if choices:
+            words.append(rng.choice(choices))
+    return words
+
+
+def timed(call):
+    start = time.perf_counter()
+    result = call()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--queries', type=int, default=200, help='misspelled words to search for')
+    parser.add_argument('--limit', type=int, default=None, help='results per search (BOOK_SEARCH_MAX_RESULTS)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = sample_words(args.queries, rng)
+    print(f"{Book.objects.count()} books on {connection.vendor}, {len(words)} queries")
+
+    latencies = {'plain': [], 'plain (typo)': [], 'fuzzy (typo)': []}
+    corrected = 0
+    for word in words:
+        typo = misspell(word, rng)
+        latencies['plain'].append(timed(lambda: search.ranked_book_ids([word], args.limit))[0])
+        latencies['plain (typo)'].append(timed(lambda: search.ranked_book_ids([typo], args.limit))[0])
+        elapsed, found = timed(lambda: search.fuzzy_book_ids([typo], args.limit))
+        if found is None:
+            sys.exit("No trigram index on this database; run manage.py migrate.")
+        latencies['fuzzy (typo)'].append(elapsed)
+        corrected += found[1] == word
+
+    print(f"{'mode':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for mode, values in latencies.items():
+        values.sort()
+        print(f"{mode:<14}" + ''.join(f"{percentile(values, pct) * 1000:>10.2f}" for pct in (50, 95, 99)))
+    print(f"did_you_mean gave the original word back for {corrected}/{len(words)} typos")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaction, Payment
+from .models import Transaction, Payment, EmailOutbox
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -14,3 +14,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ('status',)
     search_fields = ('transaction__user__username', 'transaction__book__title', 'transaction_id')
     ordering = ('-payment_date',)
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject', 'dedup_key')
+    ordering = ('-created_at',)
@@ -0,0 +1,259 @@
+"""
+Synthetic catalog, members and loan history for load tests and benchmarks.
+
+Rows are generated from a seeded RNG and written in batches, with an
+``executemany`` INSERT or, on PostgreSQL, ``COPY``. Both write the values
+as generated, auto_now_add dates included. Neither sends model signals,
+so no emails are queued and the search index and caches are refreshed
+once at the end instead of per row.
+
+Generated rows are tagged by the seed (``gen<seed>_`` usernames, ISBNs
+starting with ``9<seed>``), so datasets for different seeds can coexist.
+Dates count back from an anchor day, so a seed and an anchor always give
+the same rows.
+"""
+import csv
+import io
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from books import cache as book_cache
+from books import search
+from books.models import Book
+from users.models import User
+from .fines import fine_for
+from .models import Transaction
+
+MAX_SEED = 99999
+MAX_BOOKS = 10 ** 7
+LOAN_DAYS = 15
+HISTORY_DAYS = 365
+# Share of loans already returned: most recent loans are still out, a few
+# older ones are long overdue
+RECENT_DAYS = 30
+RETURNED_SHARE_RECENT = 0.4
+RETURNED_SHARE_OLDER = 0.98
+MEMBER_PASSWORD = 'member123'
+# Day the generated history ends on, unless another one is given
+DEFAULT_ANCHOR = date(2025, 1, 1)
+
+CATEGORIES = (
+    'Technology', 'Science Fiction', 'Fantasy', 'Classics', 'Mystery & Thriller',
+    'History & Biography', 'Finance', 'Science', 'Poetry', 'Children',
+)
+TITLE_ADJECTIVES = (
+    'Silent', 'Hidden', 'Last', 'Broken', 'Golden', 'Distant', 'Forgotten', 'Crimson',
+    'Endless', 'Practical', 'Quiet', 'Wandering', 'Modern', 'Secret', 'Burning', 'Little',
+)
+TITLE_NOUNS = (
+    'River', 'Kingdom', 'Algorithm', 'Garden', 'Empire', 'Machine', 'Letters', 'Ocean',
+    'Mountain', 'Code', 'Voyage', 'Archive', 'Theory', 'City', 'Winter', 'Signal',
+)
+TITLE_PATTERNS = (
+    'The {adjective} {noun}', '{adjective} {noun}', 'A History of the {noun}',
+    'The {noun} of {place}', '{noun} and {noun2}', 'Notes on the {adjective} {noun}',
+)
+PLACES = ('Avalon', 'Bombay', 'Carthage', 'Dublin', 'Eldoria', 'Kyoto', 'Lisbon', 'Samarkand')
+FIRST_NAMES = (
+    'Aarav', 'Ada', 'Chen', 'Diego', 'Elena', 'Fatima', 'Grace', 'Hiro', 'Ines', 'James',
+    'Kavya', 'Liam', 'Maya', 'Noah', 'Olga', 'Priya', 'Rahul', 'Sofia', 'Tomas', 'Zara',
+)
+LAST_NAMES = (
+    'Anand', 'Brown', 'Costa', 'Dubois', 'Evans', 'Fischer', 'Gupta', 'Hughes', 'Ivanova',
+    'Jones', 'Khan', 'Lopez', 'Mehta', 'Nakamura', 'Okafor', 'Patel', 'Rossi', 'Singh',
+)
+
+
+def isbn_prefix(seed):
+    return f'9{seed:05d}'
+
+
+def username_prefix(seed):
+    return f'gen{seed}_'
+
+
+def dataset_exists(seed):
+    return (
+        Book.objects.filter(isbn__startswith=isbn_prefix(seed)).exists()
+        or User.objects.filter(username__startswith=username_prefix(seed)).exists()
+    )
+
+
+def _copy_value(value):
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _columns(model):
+    """Every column but the primary key, as (fields, quoted table, quoted column list)"""
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    return fields, connection.ops.quote_name(model._meta.db_table), columns
+
+
+def _values(fields, obj):
+    # The attribute values as they are; unlike bulk_create, no pre_save()
+    # stamps the auto_now_add fields with the current time
+    return [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields]
+
+
+def insert_objects(model, objs):
+    """Insert objs with one executemany INSERT; the ids come from the database"""
+    fields, table, columns = _columns(model)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+            [_values(fields, obj) for obj in objs],
+        )
+
+
+def copy_objects(model, objs):
+    """Insert objs with one PostgreSQL COPY; the ids come from the sequence"""
+    fields, table, columns = _columns(model)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        writer.writerow([_copy_value(value) for value in _values(fields, obj)])
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+class DatasetGenerator:
+    """
+    Writes `books`, `users` and `transactions` rows in batches of batch_size.
+
+    use_copy switches the inserts to COPY and needs PostgreSQL with psycopg2.
+    Loans and books date back from midnight at the start of anchor.
+    """
+
+    def __init__(self, seed, batch_size=5000, use_copy=False, log=None, anchor=DEFAULT_ANCHOR):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.log = log or (lambda message: None)
+        self.anchor = timezone.make_aware(datetime.combine(anchor, time.min))
+
+    def insert(self, model, objs):
+        if self.use_copy:
+            copy_objects(model, objs)
+        else:
+            insert_objects(model, objs)
+
+    def in_batches(self, model, total, make):
+        for start in range(0, total, self.batch_size):
+            self.insert(model, [make(i) for i in range(start, min(start + self.batch_size, total))])
+            self.log(f"  {model.__name__}: {min(start + self.batch_size, total)}/{total}")
+
+    def title(self):
+        rng = self.rng
+        return rng.choice(TITLE_PATTERNS).format(
+            adjective=rng.choice(TITLE_ADJECTIVES),
+            noun=rng.choice(TITLE_NOUNS),
+            noun2=rng.choice(TITLE_NOUNS),
+            place=rng.choice(PLACES),
+        )
+
+    def generate_books(self, total):
+        prefix = isbn_prefix(self.seed)
+
+        def make(i):
+            quantity = self.rng.randint(1, 10)
+            return Book(
+                title=self.title(),
+                author=f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                isbn=f'{prefix}{i:07d}',
+                category=self.rng.choice(CATEGORIES),
+                quantity=quantity,
+                available_quantity=quantity,
+                created_at=self.anchor - timedelta(seconds=self.rng.randrange(HISTORY_DAYS * 86400)),
+            )
+
+        self.in_batches(Book, total, make)
+
+    def generate_users(self, total):
+        prefix = username_prefix(self.seed)
+        # Hashing once keeps millions of members cheap; they all share one password
+        password = make_password(MEMBER_PASSWORD)
+
+        def make(i):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            return User(
+                username=f'{prefix}{i}',
+                email=f'{prefix}{i}@example.com',
+                password=password,
+                first_name=first,
+                last_name=last,
+                role='MEMBER',
+                phone=f'+91{self.rng.randint(7000000000, 9999999999)}',
+                address=f'{self.rng.randint(1, 999)} {self.rng.choice(PLACES)} Street',
+                date_joined=self.anchor - timedelta(days=self.rng.randrange(HISTORY_DAYS)),
+            )
+
+        self.in_batches(User, total, make)
+
+    def generate_transactions(self, total):
+        books = list(
+            Book.objects.filter(isbn__startswith=isbn_prefix(self.seed))
+            .order_by('id').values_list('id', 'quantity')
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=username_prefix(self.seed))
+            .order_by('id').values_list('id', flat=True)
+        )
+        if not books or not user_ids:
+            return
+        open_loans = [0] * len(books)
+
+        def make(i):
+            index = self.rng.randrange(len(books))
+            book_id, quantity = books[index]
+            issue_date = self.anchor - timedelta(seconds=self.rng.randrange(HISTORY_DAYS * 86400))
+            due_date = issue_date + timedelta(days=LOAN_DAYS)
+            loan = Transaction(
+                user_id=self.rng.choice(user_ids),
+                book_id=book_id,
+                issue_date=issue_date,
+                due_date=due_date,
+            )
+            recent = issue_date > self.anchor - timedelta(days=RECENT_DAYS)
+            share = RETURNED_SHARE_RECENT if recent else RETURNED_SHARE_OLDER
+            # Never lend more copies than the book has
+            returned = self.rng.random() < share or open_loans[index] >= quantity
+            if returned:
+                loan.return_date = min(issue_date + timedelta(days=self.rng.uniform(1, 30)), self.anchor)
+                loan.status = 'RETURNED'
+                loan.fine_amount = fine_for(due_date, loan.return_date)
+            else:
+                open_loans[index] += 1
+                loan.status = 'ISSUED'
+                loan.fine_amount = fine_for(due_date, self.anchor)
+            return loan
+
+        self.in_batches(Transaction, total, make)
+
+    def finish(self):
+        """Set stock from the open loans, then refresh the search index and caches"""
+        open_loans = (
+            Transaction.objects.filter(book=OuterRef('pk'), status='ISSUED')
+            .values('book').annotate(total=Count('id')).values('total')
+        )
+        Book.objects.filter(isbn__startswith=isbn_prefix(self.seed)).update(
+            available_quantity=F('quantity') - Coalesce(Subquery(open_loans), Value(0))
+        )
+        search.rebuild_index()
+        book_cache.invalidate_books([])
+        book_cache.invalidate_by_category()
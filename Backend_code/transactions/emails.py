@@ -0,0 +1,72 @@
+"""
+Notification emails for issued and returned books.
+
+Messages are only queued here; see outbox.py for delivery.
+"""
+from users import cache as user_cache
+
+from .models import Transaction
+from .outbox import enqueue_email, batch_key
+
+
+def member(loan):
+    """The loan's user; a loan saved with only user_id reads it through users.cache"""
+    if Transaction.user.is_cached(loan):
+        return loan.user
+    return user_cache.get_user(loan.user_id)
+
+
+def queue_issued_email(loan):
+    user = member(loan)
+    message = (
+        f"Hello {user.username},\n\n"
+        f"You have successfully issued the book: '{loan.book.title}'.\n"
+        f"Issue Date: {loan.issue_date.strftime('%d-%m-%Y')}\n"
+        f"Due Date: {loan.due_date.strftime('%d-%m-%Y')}\n\n"
+        "Please make sure to return it on time to avoid fines.\n\n"
+        "Library Management System"
+    )
+    enqueue_email(f'transaction:{loan.pk}:issued', "Book Issued Successfully", message, user.email)
+
+
+def queue_returned_email(loan):
+    user = member(loan)
+    fine_msg = f"Your fine is Rs {loan.fine_amount}" if loan.fine_amount > 0 else "No fine."
+    message = (
+        f"Hello {user.username},\n\n"
+        f"You have returned the book: '{loan.book.title}'.\n"
+        f"Return Date: {loan.return_date.strftime('%d-%m-%Y')}\n"
+        f"{fine_msg}\n\n"
+        "Thank you for using our Library Management System."
+    )
+    enqueue_email(f'transaction:{loan.pk}:returned', "Book Returned Successfully", message, user.email)
+
+
+def queue_batch_issued_email(user, loans):
+    lines = "\n".join(
+        f"  - {loan.book.title} (Due Date: {loan.due_date.strftime('%d-%m-%Y')})" for loan in loans
+    )
+    message = (
+        f"Hello {user.username},\n\n"
+        f"You have successfully issued {len(loans)} book(s):\n"
+        f"{lines}\n\n"
+        "Please make sure to return them on time to avoid fines.\n\n"
+        "Library Management System"
+    )
+    key = batch_key('issue-batch', [loan.pk for loan in loans])
+    enqueue_email(key, "Books Issued Successfully", message, user.email)
+
+
+def queue_batch_returned_email(user, loans):
+    lines = "\n".join(
+        f"  - {loan.book.title}" + (f" (Fine: Rs {loan.fine_amount})" if loan.fine_amount > 0 else "")
+        for loan in loans
+    )
+    message = (
+        f"Hello {user.username},\n\n"
+        f"You have returned {len(loans)} book(s):\n"
+        f"{lines}\n\n"
+        "Thank you for using our Library Management System."
+    )
+    key = batch_key('return-batch', [loan.pk for loan in loans])
+    enqueue_email(key, "Books Returned Successfully", message, user.email)
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transactions.fines import compute_overdue_fines
+
+
+class Command(BaseCommand):
+    help = "Update accrued fines on every issued loan that is past its due date"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=0,
+                            help='update at most this many loans per statement (default: one UPDATE)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 0:
+            raise CommandError("--chunk-size must be positive")
+        started = time.perf_counter()
+        changed = compute_overdue_fines(timezone.now(), chunk_size=chunk_size or None)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Updated fines on {changed} loan(s) in {elapsed:.2f}s"))
@@ -0,0 +1,60 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from transactions import dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset of books, members and loans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000, help='books to create')
+        parser.add_argument('--users', type=int, default=100, help='members to create')
+        parser.add_argument('--transactions', type=int, default=5000, help='loans to create')
+        parser.add_argument('--seed', type=int, default=42,
+                            help=f'RNG seed, 0-{dataset.MAX_SEED}; also tags the generated rows')
+        parser.add_argument('--anchor', type=date.fromisoformat, default=dataset.DEFAULT_ANCHOR,
+                            help=f'YYYY-MM-DD the loan history ends on (default {dataset.DEFAULT_ANCHOR}); '
+                                 'pass today for loans that are current')
+        parser.add_argument('--batch-size', type=int, default=5000, help='rows per INSERT or COPY')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='use INSERT on PostgreSQL too instead of COPY')
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        if not 0 <= seed <= dataset.MAX_SEED:
+            raise CommandError(f"--seed must be between 0 and {dataset.MAX_SEED}")
+        if options['books'] >= dataset.MAX_BOOKS:
+            raise CommandError(f"--books must be below {dataset.MAX_BOOKS}")
+        if min(options['books'], options['users'], options['transactions']) < 0:
+            raise CommandError("Row counts must not be negative")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        if dataset.dataset_exists(seed):
+            raise CommandError(f"A dataset for seed {seed} already exists, pick another --seed")
+
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        generator = dataset.DatasetGenerator(
+            seed, batch_size=options['batch_size'], use_copy=use_copy, log=self.stdout.write,
+            anchor=options['anchor'],
+        )
+        started = time.perf_counter()
+        # One transaction: a failed run leaves nothing behind, and SQLite
+        # commits once instead of once per batch
+        with transaction.atomic():
+            for label, generate, total in (
+                ('books', generator.generate_books, options['books']),
+                ('members', generator.generate_users, options['users']),
+                ('loans', generator.generate_transactions, options['transactions']),
+            ):
+                step = time.perf_counter()
+                generate(total)
+                self.stdout.write(f"Created {total} {label} in {time.perf_counter() - step:.2f}s")
+            generator.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f"Dataset for seed {seed} ready in {time.perf_counter() - started:.2f}s "
+            f"({'COPY' if use_copy else 'INSERT'})"
+        ))
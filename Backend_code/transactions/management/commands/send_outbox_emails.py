@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from transactions.outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued transaction emails from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+                            help='emails sent per SMTP connection')
+        parser.add_argument('--max-attempts', type=int, default=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+                            help='give up on an email after this many failed sends')
+        parser.add_argument('--loop', action='store_true',
+                            help='keep polling for new emails instead of exiting once drained')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_batch(batch_size, options['max_attempts'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            if sent + failed == batch_size:
+                # Full batch, there may be more waiting
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Outbox drained: {total_sent} sent, {total_failed} failed"))
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_alter_transaction_due_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['issue_date', 'id'], name='txn_issue_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'issue_date', 'id'], name='txn_user_issue_date_idx'),
+        ),
+    ]
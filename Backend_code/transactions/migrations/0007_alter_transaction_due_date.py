@@ -0,0 +1,17 @@
+from django.db import migrations, models
+import transactions.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='due_date',
+            field=models.DateTimeField(default=transactions.models.default_due_date),
+        ),
+    ]
@@ -4,16 +4,36 @@ from datetime import timedelta
 from users.models import User
 from books.models import Book
 
+def default_due_date():
+    return timezone.now() + timedelta(days=15)
+
 class Transaction(models.Model):
     STATUS_CHOICES = [('ISSUED', 'Issued'), ('RETURNED', 'Returned')]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     issue_date = models.DateTimeField(auto_now_add=True)
-    due_date = models.DateTimeField(default=timezone.now() + timedelta(days=15))
+    due_date = models.DateTimeField(default=default_due_date)
     return_date = models.DateTimeField(null=True, blank=True)
     fine_amount = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ISSUED')
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of all transactions and of one user's history
+            models.Index(fields=['issue_date', 'id'], name='txn_issue_date_id_idx'),
+            models.Index(fields=['user', 'issue_date', 'id'], name='txn_user_issue_date_idx'),
+            # A user's open loans, and the overdue scan done by compute_fines
+            models.Index(fields=['user', 'status'], name='txn_user_status_idx'),
+            models.Index(fields=['status', 'due_date'], name='txn_status_due_idx'),
+            # Only open loans can go overdue, and they are a small slice of the
+            # table. Backends without partial indexes (MySQL) skip this one.
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(status='ISSUED'),
+                name='txn_issued_due_idx',
+            ),
+        ]
+
 # class Payment(models.Model):
 #     STATUS_CHOICES = [('SUCCESS', 'Success'), ('FAILED', 'Failed')]
 #     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE)
@@ -43,3 +63,31 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"{self.payment_reference} - {self.amount}"
+
+
+class EmailOutbox(models.Model):
+    """Email waiting to be delivered by the send_outbox_emails worker"""
+    PENDING = 'PENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    # One row per notified event, so a repeated save never emails twice
+    dedup_key = models.CharField(max_length=100, unique=True)
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
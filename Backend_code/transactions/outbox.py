@@ -0,0 +1,106 @@
+"""
+Transactional email outbox.
+
+Notifications are inserted into EmailOutbox inside the same DB transaction
+as the loan they describe, so a rolled-back issue never emails and SMTP
+latency or outages never reach the request path. ``manage.py
+send_outbox_emails`` delivers them in batches over one SMTP connection,
+retrying failures with exponential backoff.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+def enqueue_email(dedup_key, subject, body, recipient):
+    """Queue one email; queuing the same dedup_key again is a no-op"""
+    EmailOutbox.objects.bulk_create(
+        [EmailOutbox(dedup_key=dedup_key, subject=subject, body=body, recipient=recipient)],
+        ignore_conflicts=True,
+    )
+
+
+def batch_key(prefix, ids):
+    """Stable dedup key for an event covering several rows"""
+    digest = hashlib.sha1(','.join(str(pk) for pk in sorted(ids)).encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to batch_size due emails to this worker.
+
+    Claimed rows get their next_attempt_at pushed out by the lease, so other
+    workers skip them while they are being sent; a worker that dies mid-batch
+    simply lets the lease expire.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=ids).update(
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        )
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def _schedule_retry(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts:
+        email.status = EmailOutbox.FAILED
+    else:
+        delay = settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+
+def deliver_batch(batch_size=None, max_attempts=None):
+    """Send one batch of due emails over a single connection. Returns (sent, failed)"""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        # Mail server unreachable: every email in the batch uses up an attempt
+        for email in emails:
+            _schedule_retry(email, exc, max_attempts)
+        failed = len(emails)
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(
+                    email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.recipient],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as exc:
+                    _schedule_retry(email, exc, max_attempts)
+                    failed += 1
+                else:
+                    email.attempts += 1
+                    email.status = EmailOutbox.SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+
+    EmailOutbox.objects.bulk_update(emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
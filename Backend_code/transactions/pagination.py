@@ -0,0 +1,6 @@
+from backend.pagination import KeysetPagination
+
+
+class TransactionCursorPagination(KeysetPagination):
+    """Latest issues first, keyed on the (issue_date, id) indexes"""
+    ordering = ('-issue_date', '-id')
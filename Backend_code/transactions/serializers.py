@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from .models import Transaction, Payment
-from books.serializers import BookSerializer
+from books.serializers import BookSummarySerializer
 
 class TransactionSerializer(serializers.ModelSerializer):
-    book = BookSerializer(read_only=True)
+    book = BookSummarySerializer(read_only=True)
 
     class Meta:
         model = Transaction
@@ -13,3 +13,11 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+
+class TransactionStatsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    issued = serializers.IntegerField()
+    returned = serializers.IntegerField()
+    overdue = serializers.IntegerField()
+    fined = serializers.IntegerField()
+    fines = serializers.DecimalField(max_digits=12, decimal_places=2)
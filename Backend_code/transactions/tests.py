@@ -1,9 +1,23 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection, connections, transaction as db_transaction
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from datetime import timedelta
-from .models import Transaction, Payment
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from backend.testing import QueryBudgetMixin, QueryPlanMixin, query_budget
+from .models import Transaction, Payment, EmailOutbox
 from books.models import Book
 
 User = get_user_model()
@@ -456,15 +470,15 @@ class TransactionAPITest(APITestCase):
         # Get history
         response = self.client.get("/api/transactions/my-history/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertIsInstance(response.data["results"], list)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
     
     def test_my_history_empty(self):
         """Test getting empty transaction history"""
         self.authenticate_member()
         response = self.client.get("/api/transactions/my-history/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data["results"]), 0)
     
     def test_my_history_unauthenticated_fails(self):
         """Test unauthenticated user cannot access history"""
@@ -492,8 +506,8 @@ class TransactionAPITest(APITestCase):
         # Check Member1's history - should only show 1 transaction
         self.authenticate_member(self.member)
         response = self.client.get("/api/transactions/my-history/")
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["book"], book1["id"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["book"], book1["id"])
     
     def test_my_history_shows_issued_and_returned(self):
         """Test history shows both issued and returned books"""
@@ -507,8 +521,8 @@ class TransactionAPITest(APITestCase):
         
         # Get history (book still issued)
         response = self.client.get("/api/transactions/my-history/")
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["status"], "ISSUED")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["status"], "ISSUED")
         
         # Return the book
         self.client.post("/api/transactions/return/", {
@@ -517,8 +531,8 @@ class TransactionAPITest(APITestCase):
         
         # Get history (book now returned)
         response = self.client.get("/api/transactions/my-history/")
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["status"], "RETURNED")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["status"], "RETURNED")
 
     # ==================== ALL TRANSACTIONS (ADMIN) TESTS ====================
     
@@ -534,7 +548,7 @@ class TransactionAPITest(APITestCase):
         self.authenticate_admin()
         response = self.client.get("/api/transactions/all/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data["results"], list)
     
     def test_librarian_can_view_all_transactions(self):
         """Test librarian can view all transactions"""
@@ -577,7 +591,7 @@ class TransactionAPITest(APITestCase):
         
         self.authenticate_admin()
         response = self.client.get("/api/transactions/all/")
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     # ==================== EDGE CASE TESTS ====================
     
@@ -643,7 +657,7 @@ class TransactionAPITest(APITestCase):
         # Try to access Member1's transaction by ID
         # First get Member2's history (should be empty)
         response = self.client.get("/api/transactions/my-history/")
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data["results"]), 0)
     
     def test_concurrent_book_issues(self):
         """Test handling of concurrent book issues for limited copies"""
@@ -738,9 +752,9 @@ class TransactionAPITest(APITestCase):
         
         response = self.client.get("/api/transactions/my-history/")
         
-        self.assertIsInstance(response.data, list)
-        if len(response.data) > 0:
-            transaction = response.data[0]
+        self.assertIsInstance(response.data["results"], list)
+        if len(response.data["results"]) > 0:
+            transaction = response.data["results"][0]
             self.assertIn("id", transaction)
             self.assertIn("book", transaction)
             self.assertIn("user", transaction)
@@ -759,9 +773,9 @@ class TransactionAPITest(APITestCase):
         self.authenticate_admin()
         response = self.client.get("/api/transactions/all/")
         
-        self.assertIsInstance(response.data, list)
-        if len(response.data) > 0:
-            transaction = response.data[0]
+        self.assertIsInstance(response.data["results"], list)
+        if len(response.data["results"]) > 0:
+            transaction = response.data["results"][0]
             self.assertIn("id", transaction)
             self.assertIn("book", transaction)
             self.assertIn("user", transaction)
@@ -809,3 +823,823 @@ class TransactionAPITest(APITestCase):
         self.assertEqual(transaction.status, "RETURNED")
         self.assertIsNotNone(transaction.return_date)
 
+
+
+class TransactionPaginationTest(APITestCase):
+    """Tests for cursor pagination of transaction lists"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.other = User.objects.create_user(
+            username="other",
+            email="other@test.com",
+            password="Other@123"
+        )
+        self.book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=10, available_quantity=10
+        )
+        self.transactions = [
+            Transaction.objects.create(user=self.member, book=self.book) for _ in range(5)
+        ]
+        Transaction.objects.create(user=self.other, book=self.book)
+
+    def test_my_history_pages_latest_first(self):
+        """Test history pages through own transactions latest first"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get("/api/transactions/my-history/", {"page_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [t["id"] for t in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        ids += [t["id"] for t in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(ids, [t.id for t in reversed(self.transactions)])
+
+    def test_all_transactions_is_paginated(self):
+        """Test admin list is paginated"""
+        admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        self.client.force_authenticate(user=admin)
+        response = self.client.get("/api/transactions/all/", {"page_size": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertIsNotNone(response.data["next"])
+
+
+class IssueInventoryTest(APITestCase):
+    """Tests for the conditional inventory updates on issue and return"""
+
+    def setUp(self):
+        self.members = [
+            User.objects.create_user(
+                username=f"member{i}",
+                email=f"member{i}@test.com",
+                password="Member@123"
+            )
+            for i in range(3)
+        ]
+        self.book = Book.objects.create(
+            title="Limited Book", author="Test Author", category="Testing",
+            isbn="9780132350885", quantity=2, available_quantity=2
+        )
+
+    def issue(self, member):
+        self.client.force_authenticate(user=member)
+        return self.client.post("/api/transactions/issue/", {"book_id": self.book.id})
+
+    def test_issue_never_oversells(self):
+        """Test issues stop exactly when copies run out"""
+        codes = [self.issue(member).status_code for member in self.members]
+        self.assertEqual(codes, [201, 201, 400])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_quantity, 0)
+        self.assertEqual(Transaction.objects.filter(book=self.book).count(), 2)
+
+    def test_issue_updates_only_available_quantity(self):
+        """Test issuing runs one conditional UPDATE on the inventory column"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.issue(self.members[0])
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "books_book"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"available_quantity" > 0', updates[0])
+        self.assertNotIn('"title"', updates[0])
+
+    def test_issue_invalid_book_id_fails(self):
+        """Test a missing or malformed book_id is rejected"""
+        self.client.force_authenticate(user=self.members[0])
+        response = self.client.post("/api/transactions/issue/", {"book_id": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/api/transactions/issue/", {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_return_increments_current_stock(self):
+        """Test returning adds to the stored count, not a stale copy of it"""
+        issued = self.issue(self.members[0]).data
+        # Another copy goes out behind this request's back
+        Book.objects.filter(id=self.book.id).update(available_quantity=0)
+        response = self.client.post("/api/transactions/return/", {"transaction_id": issued["id"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_quantity, 1)
+
+
+@skipUnless(connection.vendor == "sqlite", "transaction_mode is a SQLite option")
+class SQLiteWriteLockTest(SimpleTestCase):
+    """Tests that SQLite transactions start with the write lock"""
+
+    def test_transactions_take_the_write_lock_when_they_start(self):
+        """Test a second writer is held at BEGIN, before anything is read or written"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "db.sqlite3")
+        alias = "write-lock"
+        # The configured options on a throwaway file database
+        connections[alias] = type(connections["default"])({
+            **connections["default"].settings_dict, "NAME": path, "OPTIONS": settings.DATABASES["default"]["OPTIONS"],
+        }, alias)
+        self.addCleanup(connections.__delitem__, alias)
+        self.addCleanup(connections[alias].close)
+
+        with db_transaction.atomic(using=alias):
+            other = sqlite3.connect(path, timeout=0)
+            self.addCleanup(other.close)
+            with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+                other.execute("BEGIN IMMEDIATE")
+
+
+class BatchTransactionTest(APITestCase):
+    """Tests for the batch issue and return endpoints"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.other = User.objects.create_user(
+            username="other",
+            email="other@test.com",
+            password="Other@123"
+        )
+        self.books = [
+            Book.objects.create(
+                title=f"Book {i}", author="Author", category="Fiction",
+                isbn=f"978000000{i:04d}", quantity=2, available_quantity=2
+            )
+            for i in range(3)
+        ]
+        self.empty = Book.objects.create(
+            title="Empty", author="Author", category="Fiction",
+            isbn="9780000009999", quantity=1, available_quantity=0
+        )
+        self.client.force_authenticate(user=self.member)
+
+    def issue_batch(self, book_ids):
+        return self.client.post("/api/transactions/issue-batch/", {"book_ids": book_ids}, format="json")
+
+    def return_batch(self, transaction_ids):
+        return self.client.post("/api/transactions/return-batch/", {"transaction_ids": transaction_ids}, format="json")
+
+    def test_issue_batch_reports_each_item(self):
+        """Test batch issue succeeds per book and reports failures"""
+        ids = [self.books[0].id, self.empty.id, 99999, self.books[1].id]
+        response = self.issue_batch(ids)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data["results"]
+        self.assertEqual([r["status"] for r in results], ["issued", "failed", "failed", "issued"])
+        self.assertEqual(results[1]["error"], "Book not available")
+        self.assertEqual(results[2]["error"], "Book not found")
+        self.assertEqual(results[0]["transaction"]["book"]["id"], self.books[0].id)
+        self.assertEqual(Transaction.objects.filter(user=self.member).count(), 2)
+        self.books[0].refresh_from_db()
+        self.assertEqual(self.books[0].available_quantity, 1)
+        # One notification for the whole batch
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_issue_batch_counts_duplicates_against_stock(self):
+        """Test the same book twice takes two copies, a third fails"""
+        book = self.books[0]
+        response = self.issue_batch([book.id, book.id, book.id])
+        self.assertEqual([r["status"] for r in response.data["results"]], ["issued", "issued", "failed"])
+        book.refresh_from_db()
+        self.assertEqual(book.available_quantity, 0)
+
+    def test_issue_batch_query_count_is_constant(self):
+        """Test batch size does not change the number of queries"""
+        with self.assertNumQueries(7):
+            self.issue_batch([self.books[0].id])
+        with self.assertNumQueries(7):
+            self.issue_batch([book.id for book in self.books] * 2)
+
+    def test_issue_batch_rejects_bad_payload(self):
+        """Test invalid batches are rejected"""
+        self.assertEqual(self.issue_batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.issue_batch(["x"]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.issue_batch([self.empty.id]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_return_batch_reports_each_item(self):
+        """Test batch return closes own open loans only"""
+        issued = self.issue_batch([self.books[0].id, self.books[1].id]).data["results"]
+        loan_ids = [r["transaction"]["id"] for r in issued]
+        foreign = Transaction.objects.create(user=self.other, book=self.books[2])
+        queued = EmailOutbox.objects.count()
+
+        response = self.return_batch(loan_ids + [foreign.id])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([r["status"] for r in results], ["returned", "returned", "failed"])
+        self.assertEqual(results[2]["error"], "Transaction not found")
+        self.assertEqual(results[0]["transaction"]["status"], "RETURNED")
+        self.books[0].refresh_from_db()
+        self.assertEqual(self.books[0].available_quantity, 2)
+        self.assertEqual(EmailOutbox.objects.count(), queued + 1)
+
+        response = self.return_batch(loan_ids)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["results"][0]["error"], "Already returned")
+
+    def test_return_batch_sets_fines(self):
+        """Test overdue loans get their fine"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        loan = Transaction.objects.create(user=self.member, book=self.books[0])
+        Transaction.objects.filter(id=loan.id).update(due_date=timezone.now() - timedelta(days=3, hours=1))
+        response = self.return_batch([loan.id])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        loan.refresh_from_db()
+        self.assertEqual(loan.fine_amount, 15)
+        self.assertEqual(loan.status, "RETURNED")
+
+
+class EmailOutboxTest(APITestCase):
+    """Tests for the email outbox and its delivery worker"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=5, available_quantity=5
+        )
+        self.client.force_authenticate(user=self.member)
+
+    def drain(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command("send_outbox_emails", stdout=StringIO(), **options)
+
+    def test_issue_and_return_queue_instead_of_sending(self):
+        """Test the request path only writes outbox rows"""
+        from django.core import mail
+
+        issued = self.client.post("/api/transactions/issue/", {"book_id": self.book.id})
+        self.client.post("/api/transactions/return/", {"transaction_id": issued.data["id"]})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            list(EmailOutbox.objects.order_by("id").values_list("subject", "status")),
+            [("Book Issued Successfully", "PENDING"), ("Book Returned Successfully", "PENDING")],
+        )
+
+    def test_failed_issue_queues_nothing(self):
+        """Test no email is queued when the issue is rolled back"""
+        self.book.available_quantity = 0
+        self.book.save()
+        self.client.post("/api/transactions/issue/", {"book_id": self.book.id})
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_notifications_are_deduplicated(self):
+        """Test saving a returned loan again does not queue a second email"""
+        loan = Transaction.objects.create(user=self.member, book=self.book)
+        loan.status = "RETURNED"
+        loan.return_date = loan.issue_date
+        loan.save()
+        loan.save()
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_worker_sends_and_marks_rows(self):
+        """Test the worker delivers every pending email"""
+        from django.core import mail
+
+        for _ in range(3):
+            Transaction.objects.create(user=self.member, book=self.book)
+        self.drain(batch_size=2)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ["member@test.com"])
+        self.assertEqual(EmailOutbox.objects.filter(status="SENT").count(), 3)
+
+        # Nothing left to send on the next run
+        self.drain()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_worker_retries_with_backoff_then_gives_up(self):
+        """Test failed sends are retried later and eventually marked failed"""
+        from unittest import mock
+        from django.core import mail
+        from django.utils import timezone
+
+        Transaction.objects.create(user=self.member, book=self.book)
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("SMTP down")):
+            self.drain(max_attempts=2)
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.attempts), ("PENDING", 1))
+        self.assertIn("SMTP down", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet, so the next run leaves it alone
+        self.drain()
+        self.assertEqual(len(mail.outbox), 0)
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("SMTP down")):
+            self.drain(max_attempts=2)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("FAILED", 2))
+
+
+class TransactionListQueryCountTest(APITestCase):
+    """Tests that transaction lists run a fixed number of queries"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+
+    def add_loans(self, count):
+        books = Book.objects.bulk_create([
+            Book(title=f"Book {i}", author="Author", category="Fiction",
+                 isbn=f"97800{Book.objects.count() + i:08d}", quantity=1, available_quantity=1)
+            for i in range(count)
+        ])
+        Transaction.objects.bulk_create([Transaction(user=self.member, book=book) for book in books])
+
+    def assert_constant_queries(self, url, user):
+        self.client.force_authenticate(user=user)
+        for size in (1, 10, 50):
+            self.add_loans(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {"page_size": 100})
+            self.assertEqual(len(queries), 1)
+            # The serializer only needs user_id, so users_user is not joined
+            self.assertNotIn('"users_user"', queries[0]["sql"])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertGreaterEqual(len(response.data["results"]), size)
+
+    def test_my_history_query_count(self):
+        """Test history uses one query whatever the number of loans"""
+        self.assert_constant_queries("/api/transactions/my-history/", self.member)
+
+    def test_all_transactions_query_count(self):
+        """Test admin list uses one query whatever the number of loans"""
+        self.assert_constant_queries("/api/transactions/all/", self.admin)
+
+    def test_nested_book_is_slim(self):
+        """Test transactions nest a summary of the book"""
+        self.add_loans(1)
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get("/api/transactions/my-history/")
+        book = response.data["results"][0]["book"]
+        self.assertEqual(set(book), {"id", "title", "author", "isbn", "category", "cover_image"})
+
+
+class TransactionStatsTest(APITestCase):
+    """Tests for the dashboard counts and fine totals"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.other = User.objects.create_user(
+            username="other",
+            email="other@test.com",
+            password="Other@123"
+        )
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        books = Book.objects.bulk_create([
+            Book(title=f"Book {i}", author="Author", category="Fiction",
+                 isbn=f"97833{i:08d}", quantity=1, available_quantity=0)
+            for i in range(4)
+        ])
+        now = timezone.now()
+        self.loans = Transaction.objects.bulk_create([
+            Transaction(user=self.member, book=books[0], due_date=now + timedelta(days=3)),
+            Transaction(user=self.member, book=books[1], due_date=now - timedelta(days=2), fine_amount="20.00"),
+            Transaction(user=self.member, book=books[2], status="RETURNED", return_date=now, fine_amount="12.50"),
+            Transaction(user=self.other, book=books[3], status="RETURNED", return_date=now, fine_amount="5.00"),
+        ])
+
+    def stats(self, url, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_my_stats(self):
+        """Test members get the counts and fines of their own loans"""
+        self.assertEqual(self.stats("/api/transactions/my-stats/", self.member), {
+            "total": 3, "issued": 2, "returned": 1, "overdue": 1, "fined": 2, "fines": "32.50",
+        })
+
+    def test_stats(self):
+        """Test admins get the counts and fines of every loan"""
+        self.assertEqual(self.stats("/api/transactions/stats/", self.admin), {
+            "total": 4, "issued": 2, "returned": 2, "overdue": 1, "fined": 3, "fines": "37.50",
+        })
+
+    def test_no_loans(self):
+        """Test a member without loans gets zeros, not nulls"""
+        Transaction.objects.all().delete()
+        self.assertEqual(self.stats("/api/transactions/my-stats/", self.member), {
+            "total": 0, "issued": 0, "returned": 0, "overdue": 0, "fined": 0, "fines": "0.00",
+        })
+
+    def test_library_stats_are_admin_only(self):
+        """Test members cannot read the library-wide stats"""
+        self.client.force_authenticate(user=self.member)
+        self.assertEqual(self.client.get("/api/transactions/stats/").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_history_of_fined_loans(self):
+        """Test ?fined=1 lists only the member's loans with a fine"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get("/api/transactions/my-history/", {"fined": "1"})
+        self.assertEqual({loan["id"] for loan in response.data["results"]}, {self.loans[1].id, self.loans[2].id})
+
+
+class ComputeFinesCommandTest(APITestCase):
+    """Tests for the compute_fines management command"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=10, available_quantity=10
+        )
+
+    def loan(self, overdue_days, status="ISSUED"):
+        loan = Transaction.objects.create(user=self.member, book=self.book)
+        Transaction.objects.filter(id=loan.id).update(
+            status=status, due_date=timezone.now() - timedelta(days=overdue_days, hours=1)
+        )
+        return loan
+
+    def compute_fines(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("compute_fines", *args, stdout=out)
+        return out.getvalue()
+
+    def fines(self, loans):
+        return [Transaction.objects.get(id=loan.id).fine_amount for loan in loans]
+
+    def test_new_loans_are_due_in_fifteen_days(self):
+        """Test every loan gets its own due date"""
+        loan = Transaction.objects.create(user=self.member, book=self.book)
+        self.assertAlmostEqual(
+            (loan.due_date - timezone.now()).total_seconds(), timedelta(days=15).total_seconds(), delta=60
+        )
+
+    def test_fines_accrue_on_overdue_issued_loans_only(self):
+        """Test fines are set per overdue day, leaving other loans alone"""
+        overdue = [self.loan(1), self.loan(10)]
+        on_time = Transaction.objects.create(user=self.member, book=self.book)
+        returned = self.loan(7, status="RETURNED")
+
+        output = self.compute_fines()
+        self.assertIn("Updated fines on 2 loan(s)", output)
+        self.assertEqual(self.fines(overdue), [5, 50])
+        self.assertEqual(self.fines([on_time, returned]), [0, 0])
+
+    def test_is_idempotent(self):
+        """Test a second run changes nothing"""
+        self.loan(3)
+        self.compute_fines()
+        self.assertIn("Updated fines on 0 loan(s)", self.compute_fines())
+
+    def test_chunked_run_matches_single_update(self):
+        """Test --chunk-size gives the same fines"""
+        loans = [self.loan(days) for days in range(1, 8)]
+        output = self.compute_fines("--chunk-size", "3")
+        self.assertIn("Updated fines on 7 loan(s)", output)
+        self.assertEqual(self.fines(loans), [days * 5 for days in range(1, 8)])
+
+    def test_single_update_statement(self):
+        """Test the default run is one set-based UPDATE"""
+        for days in range(1, 6):
+            self.loan(days)
+        with self.assertNumQueries(1):
+            self.compute_fines()
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "query plans are checked on SQLite and PostgreSQL")
+class TransactionIndexUsageTest(QueryPlanMixin, APITestCase):
+    """Tests that the hot transaction queries are served by an index"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=10, available_quantity=10
+        )
+        for _ in range(5):
+            Transaction.objects.create(user=self.member, book=book)
+
+    def test_open_loans_of_a_user(self):
+        """Test a user's ISSUED loans use the (user, status) index"""
+        queryset = Transaction.objects.filter(user=self.member, status="ISSUED")
+        self.assertUsesIndex(queryset, "txn_user_status_idx")
+
+    def test_overdue_loans(self):
+        """Test the overdue scan uses the partial or (status, due_date) index"""
+        queryset = Transaction.objects.filter(status="ISSUED", due_date__lt=timezone.now())
+        self.assertUsesIndex(queryset, "txn_issued_due_idx", "txn_status_due_idx")
+
+
+class GenerateDatasetCommandTest(APITestCase):
+    """Tests for the generate_dataset management command"""
+
+    def generate(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command("generate_dataset", *args, stdout=StringIO())
+
+    def snapshot(self):
+        return (
+            list(Book.objects.order_by("isbn").values_list(
+                "isbn", "title", "author", "quantity", "available_quantity", "created_at"
+            )),
+            list(User.objects.order_by("username").values_list("username", "email", "phone", "date_joined")),
+            list(Transaction.objects.order_by("issue_date", "book__isbn").values_list(
+                "book__isbn", "issue_date", "due_date", "return_date", "status", "fine_amount"
+            )),
+        )
+
+    def test_creates_consistent_rows(self):
+        """Test counts, stock and that no per-row signals ran"""
+        self.generate("--books", "20", "--users", "5", "--transactions", "200", "--batch-size", "7", "--seed", "3")
+        self.assertEqual(Book.objects.count(), 20)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Transaction.objects.count(), 200)
+        self.assertFalse(EmailOutbox.objects.exists())
+        for book in Book.objects.all():
+            open_loans = Transaction.objects.filter(book=book, status="ISSUED").count()
+            self.assertEqual(book.available_quantity, book.quantity - open_loans)
+            self.assertGreaterEqual(book.available_quantity, 0)
+        self.assertFalse(Transaction.objects.filter(status="RETURNED", return_date__isnull=True).exists())
+
+    def test_same_seed_gives_same_rows(self):
+        """Test the dataset is deterministic from the seed"""
+        self.generate("--books", "10", "--users", "3", "--transactions", "50", "--seed", "5")
+        first = self.snapshot()
+        Transaction.objects.all().delete()
+        Book.objects.all().delete()
+        User.objects.all().delete()
+        self.generate("--books", "10", "--users", "3", "--transactions", "50", "--seed", "5")
+        self.assertEqual(self.snapshot(), first)
+
+    def test_dates_end_on_the_anchor(self):
+        """Test generated dates count back from --anchor, not from the time of the run"""
+        self.generate("--books", "10", "--users", "3", "--transactions", "50", "--anchor", "2024-03-01")
+        anchor = timezone.make_aware(datetime(2024, 3, 1))
+        self.assertLessEqual(Book.objects.latest("created_at").created_at, anchor)
+        self.assertLessEqual(Transaction.objects.latest("issue_date").issue_date, anchor)
+        self.assertGreater(
+            Transaction.objects.earliest("issue_date").issue_date, anchor - timedelta(days=366)
+        )
+
+    def test_other_inserts_still_stamp_the_time(self):
+        """Test keeping the generated dates leaves auto_now_add alone for everything else"""
+        self.generate("--books", "3", "--users", "1", "--transactions", "5")
+        before = timezone.now()
+        book = Book.objects.create(
+            title="New", author="Author", isbn="9781111111111", quantity=1, available_quantity=1
+        )
+        self.assertGreaterEqual(book.created_at, before)
+
+    def test_generated_books_are_searchable(self):
+        """Test the search index is rebuilt after the bulk insert"""
+        from books.search import ranked_book_ids
+
+        self.generate("--books", "10", "--users", "0", "--transactions", "0")
+        title = Book.objects.order_by("id").first().title
+        ids = ranked_book_ids([title])
+        if ids is not None:
+            self.assertIn(Book.objects.order_by("id").first().id, ids)
+
+    def test_refuses_to_reuse_a_seed(self):
+        """Test a second run with the same seed is rejected"""
+        from django.core.management.base import CommandError
+
+        self.generate("--books", "1", "--users", "1", "--transactions", "0", "--seed", "9")
+        with self.assertRaises(CommandError):
+            self.generate("--books", "1", "--users", "1", "--transactions", "0", "--seed", "9")
+
+
+class TransactionQueryBudgetTest(QueryBudgetMixin, APITestCase):
+    """Tests that every transaction endpoint runs a fixed number of queries"""
+
+    def setUp(self):
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+
+    def add_books(self, count):
+        return Book.objects.bulk_create([
+            Book(title=f"Book {i}", author="Author", category="Fiction",
+                 isbn=f"97822{i:08d}", quantity=2, available_quantity=1)
+            for i in range(count)
+        ])
+
+    def add_loans(self, count, user=None, **fields):
+        """Add count open loans, one per new book, and log in as user"""
+        user = user or self.member
+        self.client.force_authenticate(user=user)
+        return Transaction.objects.bulk_create([
+            Transaction(user=user, book=book, **fields) for book in self.add_books(count)
+        ])
+
+    # Writes run in a transaction (the SAVEPOINT and RELEASE lines inside a
+    # test) and queue their email in the outbox
+
+    @query_budget(6, status=status.HTTP_201_CREATED)
+    def test_issue(self, size):
+        book = self.add_loans(size)[-1].book
+        return lambda: self.client.post("/api/transactions/issue/", {"book_id": book.id})
+
+    @query_budget(6, status=status.HTTP_200_OK)
+    def test_return(self, size):
+        loan = self.add_loans(size)[-1]
+        return lambda: self.client.post("/api/transactions/return/", {"transaction_id": loan.id})
+
+    @query_budget(7, status=status.HTTP_201_CREATED)
+    def test_issue_batch(self, size):
+        self.client.force_authenticate(user=self.member)
+        book_ids = [book.id for book in self.add_books(size)]
+        return lambda: self.client.post(
+            "/api/transactions/issue-batch/", {"book_ids": book_ids}, format="json"
+        )
+
+    @query_budget(7, status=status.HTTP_200_OK)
+    def test_return_batch(self, size):
+        loan_ids = [loan.id for loan in self.add_loans(size)]
+        return lambda: self.client.post(
+            "/api/transactions/return-batch/", {"transaction_ids": loan_ids}, format="json"
+        )
+
+    @query_budget(2, status=status.HTTP_200_OK)
+    def test_pay_fine(self, size):
+        loan = self.add_loans(size, status="RETURNED", return_date=timezone.now(), fine_amount=10)[-1]
+        return lambda: self.client.post("/api/transactions/pay-fine/", {"transaction_id": loan.id, "amount": 10})
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_my_history(self, size):
+        self.add_loans(size)
+        return lambda: self.client.get("/api/transactions/my-history/", {"page_size": 100})
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_export(self, size):
+        self.add_loans(size)
+        self.client.force_authenticate(user=self.admin)
+
+        def call():
+            response = self.client.get("/api/transactions/export/", {"format": "ndjson"})
+            self.assertEqual(len(response.getvalue().splitlines()), size)
+            return response
+        return call
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_all_transactions(self, size):
+        self.add_loans(size)
+        self.client.force_authenticate(user=self.admin)
+        return lambda: self.client.get("/api/transactions/all/", {"page_size": 100})
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_my_stats(self, size):
+        self.add_loans(size)
+        return lambda: self.client.get("/api/transactions/my-stats/")
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_stats(self, size):
+        self.add_loans(size)
+        self.client.force_authenticate(user=self.admin)
+        return lambda: self.client.get("/api/transactions/stats/")
+
+
+class TransactionExportTest(APITestCase):
+    """Tests for the streaming CSV/NDJSON transaction export"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+        books = Book.objects.bulk_create([
+            Book(title=f"Book {i}", author="Author", category="Fiction",
+                 isbn=f"97833{i:08d}", quantity=1, available_quantity=1)
+            for i in range(3)
+        ])
+        day = timezone.make_aware(timezone.datetime(2024, 5, 1, 12, 0))
+        self.loans = Transaction.objects.bulk_create([
+            Transaction(user=self.member, book=books[0], issue_date=day, due_date=day + timedelta(days=15)),
+            Transaction(user=self.member, book=books[1], issue_date=day + timedelta(days=1),
+                        due_date=day + timedelta(days=16), status="RETURNED",
+                        return_date=day + timedelta(days=20), fine_amount=20),
+            Transaction(user=self.member, book=books[2], issue_date=day + timedelta(days=9),
+                        due_date=day + timedelta(days=24)),
+        ])
+        # issue_date is auto_now_add, so bulk_create ignored the dates above
+        for loan, offset in zip(self.loans, (0, 1, 9)):
+            Transaction.objects.filter(id=loan.id).update(issue_date=day + timedelta(days=offset))
+        self.client.force_authenticate(user=self.admin)
+
+    def export(self, **params):
+        response = self.client.get("/api/transactions/export/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response
+
+    def csv_rows(self, **params):
+        return list(csv.DictReader(io.StringIO(self.export(**params).getvalue().decode())))
+
+    def test_member_cannot_export(self):
+        """Test the export is admin only"""
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get("/api/transactions/export/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_csv_is_the_default(self):
+        """Test CSV rows carry the loan, member and book columns"""
+        response = self.export()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="transactions-', response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(response.getvalue().decode())))
+        self.assertEqual([int(row["id"]) for row in rows], [loan.id for loan in self.loans])
+        self.assertEqual(rows[1]["username"], "member")
+        self.assertEqual(rows[1]["isbn"], "9783300000001")
+        self.assertEqual(rows[1]["fine_amount"], "20.00")
+        self.assertEqual(rows[0]["return_date"], "")
+
+    def test_ndjson(self):
+        """Test NDJSON writes one object per line"""
+        response = self.export(format="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in response.getvalue().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1]["status"], "RETURNED")
+        self.assertEqual(rows[1]["fine_amount"], "20.00")
+        self.assertIsNone(rows[0]["return_date"])
+
+    def test_status_filter(self):
+        """Test ?status= accepts one or more statuses"""
+        self.assertEqual([row["status"] for row in self.csv_rows(status="returned")], ["RETURNED"])
+        self.assertEqual(len(self.csv_rows(status="ISSUED,RETURNED")), 3)
+
+    def test_date_range_includes_whole_end_day(self):
+        """Test ?from= and a date ?to= are both inclusive"""
+        rows = self.csv_rows(**{"from": "2024-05-02", "to": "2024-05-10"})
+        self.assertEqual([int(row["id"]) for row in rows], [self.loans[1].id, self.loans[2].id])
+        rows = self.csv_rows(to="2024-05-02T11:00:00Z")
+        self.assertEqual([int(row["id"]) for row in rows], [self.loans[0].id])
+
+    def test_invalid_filters_are_rejected(self):
+        """Test bad dates and statuses get a 400 before streaming"""
+        for params in ({"from": "yesterday"}, {"status": "LOST"}):
+            response = self.client.get("/api/transactions/export/", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(response.streaming)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_rows_are_streamed_in_chunks(self):
+        """Test the body is written a chunk of rows at a time"""
+        chunks = list(self.export(format="ndjson").streaming_content)
+        self.assertEqual([len(chunk.splitlines()) for chunk in chunks], [2, 1])
@@ -1,10 +1,19 @@
 from django.urls import path
-from .views import IssueBookView, ReturnBookView, PayFineView, MyHistoryView, AllTransactionsView
+from .views import (
+    IssueBookView, ReturnBookView, IssueBatchView, ReturnBatchView,
+    PayFineView, MyHistoryView, MyStatsView, AllTransactionsView, TransactionStatsView,
+    TransactionExportView,
+)
 
 urlpatterns = [
     path('issue/', IssueBookView.as_view(), name='issue-book'),
     path('return/', ReturnBookView.as_view(), name='return-book'),
+    path('issue-batch/', IssueBatchView.as_view(), name='issue-batch'),
+    path('return-batch/', ReturnBatchView.as_view(), name='return-batch'),
     path('pay-fine/', PayFineView.as_view(), name='pay-fine'),
     path('my-history/', MyHistoryView.as_view(), name='my-history'),
+    path('my-stats/', MyStatsView.as_view(), name='my-stats'),
     path('all/', AllTransactionsView.as_view(), name='all-transactions'),  # Admin only
+    path('stats/', TransactionStatsView.as_view(), name='transaction-stats'),  # Admin only
+    path('export/', TransactionExportView.as_view(), name='export-transactions'),  # Admin only
 ]
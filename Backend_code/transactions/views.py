@@ -67,28 +67,93 @@
 
 
 
+import uuid
+
+from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework_simplejwt.models import TokenUser
+from backend import export
 from .models import Transaction, Payment
-from .serializers import TransactionSerializer, PaymentSerializer
+from .serializers import TransactionSerializer, PaymentSerializer, TransactionStatsSerializer
+from .pagination import TransactionCursorPagination
+from . import emails
+from .fines import fine_for
 from books.models import Book
+from books import cache as book_cache
+from users.authentication import full_user
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Case, When, Value, IntegerField, Count, Sum, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+
+class InventoryConflict(Exception):
+    """Stock changed between reading and updating a batch"""
+
+
+def parse_id_list(value):
+    """Return a list of ints, or None if value is not a non-empty list of ids"""
+    if not isinstance(value, list) or not value:
+        return None
+    try:
+        return [int(item) for item in value]
+    except (TypeError, ValueError):
+        return None
+
+
+def transaction_stats(queryset):
+    """Loan counts and the fine total of queryset, in one aggregate query"""
+    stats = queryset.aggregate(
+        total=Count('id'),
+        issued=Count('id', filter=Q(status='ISSUED')),
+        returned=Count('id', filter=Q(status='RETURNED')),
+        overdue=Count('id', filter=Q(status='ISSUED', due_date__lt=timezone.now())),
+        fined=Count('id', filter=Q(fine_amount__gt=0)),
+        fines=Coalesce(Sum('fine_amount'), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+    return TransactionStatsSerializer(stats).data
+
+
+def per_book(counts):
+    """CASE expression mapping each book id to its count, for one set-based UPDATE"""
+    return Case(
+        *[When(id=book_id, then=Value(count)) for book_id, count in counts.items()],
+        output_field=IntegerField(),
+    )
+
 # Issue Book
 class IssueBookView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        book_id = request.data.get('book_id')
-        book = Book.objects.get(id=book_id)
-        if book.available_quantity <= 0:
-            return Response({'error': 'Book not available'}, status=400)
-        transaction = Transaction.objects.create(user=request.user, book=book)
-        book.available_quantity -= 1
-        book.save()
+        try:
+            book_id = int(request.data.get('book_id'))
+        except (TypeError, ValueError):
+            return Response({'error': 'book_id is required'}, status=400)
+
+        with db_transaction.atomic():
+            # Conditional decrement: the row lock is held only for this one
+            # UPDATE, and concurrent issues can never push the count below 0
+            reserved = Book.objects.filter(id=book_id, available_quantity__gt=0).update(
+                available_quantity=F('available_quantity') - 1
+            )
+            if not reserved:
+                if not Book.objects.filter(id=book_id).exists():
+                    return Response({'error': 'Book not found'}, status=400)
+                return Response({'error': 'Book not available'}, status=400)
+            book_cache.invalidate_books([book_id])
+            transaction = Transaction(user_id=request.user.id, book_id=book_id)
+            if not isinstance(request.user, TokenUser):
+                # Already loaded by authentication, so the email can use it;
+                # a token user is only looked up by the email (users.cache)
+                transaction.user = request.user
+            transaction.save()
+
         serializer = TransactionSerializer(transaction)
-        return Response(serializer.data)
+        return Response(serializer.data, status=201)
 
 # Return Book
 class ReturnBookView(APIView):
@@ -96,20 +161,149 @@ class ReturnBookView(APIView):
 
     def post(self, request):
         transaction_id = request.data.get('transaction_id')
-        transaction = Transaction.objects.get(id=transaction_id, user=request.user)
-        if transaction.status == 'RETURNED':
-            return Response({"detail": "Already returned."}, status=400)
-        today = timezone.now()
-        overdue_days = (today - transaction.due_date).days
-        transaction.fine_amount = max(0, overdue_days * 5)
-        transaction.status = 'RETURNED'
-        transaction.return_date = today
-        transaction.book.available_quantity += 1
-        transaction.book.save()
-        transaction.save()
+        with db_transaction.atomic():
+            # Row lock so two concurrent returns cannot both put the copy back
+            transaction = (
+                Transaction.objects.select_for_update(of=('self',))
+                .select_related('user', 'book')
+                .filter(id=transaction_id, user_id=request.user.id)
+                .first()
+            )
+            if transaction is None:
+                return Response({"detail": "Transaction not found."}, status=400)
+            if transaction.status == 'RETURNED':
+                return Response({"detail": "Already returned."}, status=400)
+            today = timezone.now()
+            transaction.fine_amount = fine_for(transaction.due_date, today)
+            transaction.status = 'RETURNED'
+            transaction.return_date = today
+            transaction.save(update_fields=['fine_amount', 'status', 'return_date'])
+            # Relative increment, so it cannot overwrite a concurrent issue
+            Book.objects.filter(id=transaction.book_id).update(
+                available_quantity=F('available_quantity') + 1
+            )
+            book_cache.invalidate_books([transaction.book_id])
         serializer = TransactionSerializer(transaction)
         return Response(serializer.data)
 
+# Issue several books in one request
+class IssueBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        book_ids = parse_id_list(request.data.get('book_ids'))
+        if book_ids is None:
+            return Response({'error': 'book_ids must be a non-empty list of ids'}, status=400)
+        if len(book_ids) > settings.TRANSACTION_BATCH_MAX_SIZE:
+            return Response({'error': f'At most {settings.TRANSACTION_BATCH_MAX_SIZE} books per batch'}, status=400)
+
+        results = [None] * len(book_ids)
+        loans = []
+        try:
+            with db_transaction.atomic():
+                stock = dict(
+                    Book.objects.select_for_update()
+                    .filter(id__in=set(book_ids))
+                    .values_list('id', 'available_quantity')
+                )
+                wanted = {}
+                for index, book_id in enumerate(book_ids):
+                    if book_id not in stock:
+                        results[index] = {'book_id': book_id, 'status': 'failed', 'error': 'Book not found'}
+                    elif stock[book_id] - wanted.get(book_id, 0) <= 0:
+                        results[index] = {'book_id': book_id, 'status': 'failed', 'error': 'Book not available'}
+                    else:
+                        wanted[book_id] = wanted.get(book_id, 0) + 1
+
+                if wanted:
+                    # One UPDATE for every book; the guard makes it safe even on
+                    # backends where select_for_update() does not lock
+                    amount = per_book(wanted)
+                    updated = Book.objects.filter(id__in=wanted, available_quantity__gte=amount).update(
+                        available_quantity=F('available_quantity') - amount
+                    )
+                    if updated != len(wanted):
+                        raise InventoryConflict
+                    book_cache.invalidate_books(wanted)
+                    loans = Transaction.objects.bulk_create([
+                        Transaction(user_id=request.user.id, book_id=book_ids[index])
+                        for index, result in enumerate(results) if result is None
+                    ])
+                    books = Book.objects.in_bulk(wanted)
+                    for loan in loans:
+                        loan.book = books[loan.book_id]
+                    emails.queue_batch_issued_email(full_user(request), loans)
+        except InventoryConflict:
+            return Response({'error': 'Inventory changed during the batch, please retry'}, status=409)
+
+        issued = iter(loans)
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = {
+                    'book_id': book_ids[index],
+                    'status': 'issued',
+                    'transaction': TransactionSerializer(next(issued)).data,
+                }
+        return Response({'results': results}, status=201 if loans else 400)
+
+# Return several books in one request
+class ReturnBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        transaction_ids = parse_id_list(request.data.get('transaction_ids'))
+        if transaction_ids is None:
+            return Response({'error': 'transaction_ids must be a non-empty list of ids'}, status=400)
+        if len(transaction_ids) > settings.TRANSACTION_BATCH_MAX_SIZE:
+            return Response({'error': f'At most {settings.TRANSACTION_BATCH_MAX_SIZE} books per batch'}, status=400)
+
+        results = {}
+        returned = []
+        try:
+            with db_transaction.atomic():
+                loans = Transaction.objects.select_for_update().select_related('book').in_bulk(
+                    set(transaction_ids)
+                )
+                today = timezone.now()
+                for transaction_id in dict.fromkeys(transaction_ids):
+                    loan = loans.get(transaction_id)
+                    if loan is None or loan.user_id != request.user.id:
+                        results[transaction_id] = {'transaction_id': transaction_id, 'status': 'failed', 'error': 'Transaction not found'}
+                    elif loan.status == 'RETURNED':
+                        results[transaction_id] = {'transaction_id': transaction_id, 'status': 'failed', 'error': 'Already returned'}
+                    else:
+                        loan.fine_amount = fine_for(loan.due_date, today)
+                        loan.status = 'RETURNED'
+                        loan.return_date = today
+                        returned.append(loan)
+                        results[transaction_id] = None
+
+                if returned:
+                    # Flip only loans still ISSUED, so a concurrent return is detected
+                    flipped = Transaction.objects.filter(
+                        id__in=[loan.id for loan in returned], status='ISSUED'
+                    ).update(status='RETURNED', return_date=today)
+                    if flipped != len(returned):
+                        raise InventoryConflict
+                    Transaction.objects.bulk_update(returned, ['fine_amount'])
+                    counts = {}
+                    for loan in returned:
+                        counts[loan.book_id] = counts.get(loan.book_id, 0) + 1
+                    amount = per_book(counts)
+                    Book.objects.filter(id__in=counts).update(available_quantity=F('available_quantity') + amount)
+                    book_cache.invalidate_books(counts)
+                    emails.queue_batch_returned_email(full_user(request), returned)
+        except InventoryConflict:
+            return Response({'error': 'Some books were returned concurrently, please retry'}, status=409)
+
+        for loan in returned:
+            results[loan.id] = {
+                'transaction_id': loan.id,
+                'status': 'returned',
+                'transaction': TransactionSerializer(loan).data,
+            }
+        return Response({'results': list(results.values())}, status=200 if returned else 400)
+
 # Pay Fine
 class PayFineView(APIView):
     permission_classes = [IsAuthenticated]
@@ -117,30 +311,74 @@ class PayFineView(APIView):
     def post(self, request):
         transaction_id = request.data.get('transaction_id')
         amount = request.data.get('amount')
-        transaction = Transaction.objects.get(id=transaction_id, user=request.user)
+        transaction = Transaction.objects.get(id=transaction_id, user_id=request.user.id)
         payment = Payment.objects.create(
             transaction=transaction,
             amount=amount,
-            transaction_id="DUMMY123",
+            # transaction_id= here used to overwrite the loan's foreign key
+            payment_reference=f'PAY-{uuid.uuid4().hex[:12].upper()}',
             status='SUCCESS'
         )
         serializer = PaymentSerializer(payment)
         return Response(serializer.data)
 
 # Member History
-class MyHistoryView(APIView):
+class MyHistoryView(generics.ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+
+    def get_queryset(self):
+        queryset = Transaction.objects.filter(user_id=self.request.user.id).select_related('book')
+        # ?fined=1: only the loans with a fine, for the payment page
+        if self.request.query_params.get('fined') == '1':
+            queryset = queryset.filter(fine_amount__gt=0)
+        return queryset
+
+# Member: counts and fines of their own loans, for the dashboard
+class MyStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        transactions = Transaction.objects.filter(user=request.user)
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        return Response(transaction_stats(Transaction.objects.filter(user_id=request.user.id)))
 
 # Admin: All Transactions
-class AllTransactionsView(APIView):
+class AllTransactionsView(generics.ListAPIView):
+    permission_classes = [IsAdminUser]
+    serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+    queryset = Transaction.objects.select_related('book')
+
+# Admin: counts and fines of every loan, for the dashboard
+class TransactionStatsView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        transactions = Transaction.objects.all()
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        return Response(transaction_stats(Transaction.objects.all()))
+
+
+# Admin: stream every matching transaction as CSV or NDJSON
+class TransactionExportView(APIView):
+    permission_classes = [IsAdminUser]
+    renderer_classes = export.EXPORT_RENDERERS
+    columns = {
+        'id': 'id',
+        'user_id': 'user_id',
+        'username': 'user__username',
+        'email': 'user__email',
+        'book_id': 'book_id',
+        'book_title': 'book__title',
+        'isbn': 'book__isbn',
+        'issue_date': 'issue_date',
+        'due_date': 'due_date',
+        'return_date': 'return_date',
+        'fine_amount': 'fine_amount',
+        'status': 'status',
+    }
+
+    def get(self, request):
+        queryset = export.filter_date_range(request, Transaction.objects.order_by('id'), 'issue_date')
+        statuses = export.parse_choices(request, 'status', [value for value, _ in Transaction.STATUS_CHOICES])
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        return export.export_response(request, queryset, self.columns, 'transactions')
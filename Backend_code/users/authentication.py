@@ -0,0 +1,91 @@
+"""
+JWT authentication for the library API.
+
+Tokens carry the user's username, role and staff flags as claims. With
+AUTH_STATELESS_TOKENS on, request.user is a TokenUser built from those
+claims and no users_user row is read per request; views that need the
+full row call full_user(request), which goes through users.cache.
+
+Claims are re-read from the database whenever the access token is
+refreshed, so a role change or deactivation takes effect within one
+access token lifetime.
+"""
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import cache
+from .models import User
+
+USER_CLAIMS = ('username', 'role', 'is_staff', 'is_superuser')
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class LibraryTokenUser(TokenUser):
+    """TokenUser with the id typed like User.pk and the role claim exposed"""
+
+    @cached_property
+    def id(self):
+        # simplejwt stores the id claim as a string
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @property
+    def role(self):
+        return self.token.get('role', 'MEMBER')
+
+
+class LibraryTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class LibraryTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.filter(pk=access[api_settings.USER_ID_CLAIM]).first()
+        if user is None:
+            raise AuthenticationFailed('No active account found for the given token.', 'no_active_account')
+        data['access'] = str(add_user_claims(access, user))
+        if 'refresh' in data:
+            data['refresh'] = str(add_user_claims(RefreshToken(data['refresh']), user))
+        return data
+
+
+class LibraryJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that, with AUTH_STATELESS_TOKENS on, trusts the token
+    claims instead of loading the user. Tokens issued without the claims
+    still authenticate the usual way.
+    """
+
+    def get_user(self, validated_token):
+        if settings.AUTH_STATELESS_TOKENS and 'role' in validated_token:
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
+
+
+def full_user(request):
+    """The User row for request.user, cached when it is a token user"""
+    user = request.user
+    if not isinstance(user, TokenUser):
+        return user
+    try:
+        return cache.get_user(user.id)
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
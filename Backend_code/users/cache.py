@@ -0,0 +1,43 @@
+"""
+Short-lived, per-process cache of full User rows.
+
+Used by stateless token authentication for the few views that need more
+than the token claims (email, phone, ...). Entries expire after
+AUTH_USER_CACHE_TTL seconds and are dropped when the user is saved or
+deleted in this process, so other workers see changes within the TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import User
+
+_users = {}
+_lock = threading.Lock()
+
+
+def get_user(user_id):
+    """User with this id, from the cache when fresh. Raises User.DoesNotExist."""
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    user = User.objects.get(pk=user_id)
+    with _lock:
+        if len(_users) >= settings.AUTH_USER_CACHE_SIZE:
+            _users.clear()
+        _users[user_id] = (now + settings.AUTH_USER_CACHE_TTL, user)
+    return user
+
+
+def forget_user(user_id):
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def clear():
+    with _lock:
+        _users.clear()
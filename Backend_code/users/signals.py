@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    cache.forget_user(instance.pk)
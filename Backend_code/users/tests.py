@@ -1,7 +1,13 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from backend.testing import QueryBudgetMixin, query_budget
+from . import cache as user_cache
+from .authentication import LibraryTokenObtainPairSerializer
 
 User = get_user_model()
 
@@ -11,6 +17,7 @@ class LibraryAPITest(APITestCase):
 
     def setUp(self):
         """Set up test data"""
+        cache.clear()
         # Create admin user
         self.admin = User.objects.create_superuser(
             username="admin",
@@ -286,7 +293,7 @@ class LibraryAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data["results"], list)
     
     def test_list_books_unauthenticated(self):
         """Test unauthenticated user cannot list books"""
@@ -538,15 +545,15 @@ class LibraryAPITest(APITestCase):
         # Get history
         response = self.client.get("/api/transactions/my-history/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertIsInstance(response.data["results"], list)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
     
     def test_my_history_empty(self):
         """Test getting empty transaction history"""
         self.authenticate_member()
         response = self.client.get("/api/transactions/my-history/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data["results"]), 0)
     
     def test_my_history_unauthenticated_fails(self):
         """Test unauthenticated user cannot access history"""
@@ -567,7 +574,7 @@ class LibraryAPITest(APITestCase):
         self.authenticate_admin()
         response = self.client.get("/api/transactions/all/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data["results"], list)
     
     def test_member_cannot_view_all_transactions(self):
         """Test member cannot view all transactions"""
@@ -710,7 +717,7 @@ class LibraryAPITest(APITestCase):
         self.authenticate_member()
         response = self.client.get("/api/books/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 5)
+        self.assertGreaterEqual(len(response.data["results"]), 5)
     
     def test_transaction_history_for_specific_user(self):
         """Test transaction history only shows current user's transactions using raw creation"""
@@ -733,8 +740,8 @@ class LibraryAPITest(APITestCase):
         # Check Member1's history - should only show 1 transaction
         self.authenticate_member(self.member)
         response = self.client.get("/api/transactions/my-history/")
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["book"], book1["id"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["book"], book1["id"])
     
     def test_concurrent_book_issues(self):
         """Test handling of concurrent book issues for limited copies using raw creation"""
@@ -770,3 +777,167 @@ class LibraryAPITest(APITestCase):
         self.assertEqual(len(successful), 1)
         self.assertEqual(len(failed), 1)
 
+
+
+class StatelessTokenAuthTest(APITestCase):
+    """Tests for token claims and AUTH_STATELESS_TOKENS"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+        self.member = User.objects.create_user(
+            username="member",
+            email="member@test.com",
+            password="Member@123"
+        )
+
+    def login(self, email, password):
+        response = self.client.post("/api/auth/login/", {"email": email, "password": password})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_access_token_carries_user_claims(self):
+        """Test login puts username, role and staff flags into the token"""
+        token = AccessToken(self.login("admin@test.com", "Admin@123")["access"])
+        self.assertEqual(token["username"], "admin")
+        self.assertEqual(token["role"], "MEMBER")
+        self.assertTrue(token["is_staff"])
+        self.assertTrue(token["is_superuser"])
+
+    def test_default_mode_loads_the_user(self):
+        """Test the user row is still read per request by default"""
+        self.login("member@test.com", "Member@123")
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/transactions/my-history/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_read_endpoint_skips_user_query(self):
+        """Test a read endpoint runs only its own query"""
+        self.login("member@test.com", "Member@123")
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/transactions/my-history/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_staff_claim_grants_admin_endpoints(self):
+        """Test IsAdminUser is decided from the token claims"""
+        self.login("admin@test.com", "Admin@123")
+        self.assertEqual(self.client.get("/api/auth/count/").status_code, status.HTTP_200_OK)
+        self.login("member@test.com", "Member@123")
+        self.assertEqual(self.client.get("/api/auth/count/").status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_me_uses_cached_user(self):
+        """Test /me loads the full user once, then serves it from the cache"""
+        self.login("member@test.com", "Member@123")
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.data["email"], "member@test.com")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.data["role"], "MEMBER")
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_saving_user_drops_cached_row(self):
+        """Test a saved user is reloaded instead of served stale"""
+        self.login("member@test.com", "Member@123")
+        self.client.get("/api/auth/me/")
+        self.member.phone = "5550100"
+        self.member.save()
+        self.assertEqual(self.client.get("/api/auth/me/").data["phone"], "5550100")
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_issue_and_return_with_token_user(self):
+        """Test write endpoints still act on the real user's loans"""
+        from books.models import Book
+        from transactions.models import Transaction
+
+        book = Book.objects.create(
+            title="Clean Code", author="Robert C. Martin", category="Programming",
+            isbn="9780132350884", quantity=1, available_quantity=1
+        )
+        self.login("member@test.com", "Member@123")
+        response = self.client.post("/api/transactions/issue/", {"book_id": book.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        loan = Transaction.objects.get()
+        self.assertEqual(loan.user, self.member)
+
+        response = self.client.post("/api/transactions/return-batch/", {"transaction_ids": [loan.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_issue_reads_the_user_only_for_the_email(self):
+        """Test issuing loads the user once, for the email, and then from the cache"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from books.models import Book
+
+        books = Book.objects.bulk_create([
+            Book(title=f"Book {i}", author="Author", category="Fiction",
+                 isbn=f"978000000001{i}", quantity=1, available_quantity=1)
+            for i in range(2)
+        ])
+        self.login("member@test.com", "Member@123")
+        for book, user_reads in zip(books, (1, 0)):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/api/transactions/issue/", {"book_id": book.id})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            reads = [query for query in queries if 'FROM "users_user"' in query["sql"]]
+            self.assertEqual(len(reads), user_reads)
+
+    def test_refresh_restamps_claims(self):
+        """Test a role change reaches the next refreshed access token"""
+        refresh = self.login("member@test.com", "Member@123")["refresh"]
+        User.objects.filter(id=self.member.id).update(role="ADMIN", is_staff=True)
+        response = self.client.post("/api/auth/refresh/", {"refresh": refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = AccessToken(response.data["access"])
+        self.assertEqual(token["role"], "ADMIN")
+        self.assertTrue(token["is_staff"])
+
+
+class UserQueryBudgetTest(QueryBudgetMixin, APITestCase):
+    """Tests that the user endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@test.com",
+            password="Admin@123"
+        )
+
+    def add_members(self, count):
+        """Add count members and return a bearer token for the last one"""
+        members = User.objects.bulk_create([
+            User(username=f"member{i}", email=f"member{i}@test.com", password="!")
+            for i in range(count)
+        ])
+        return members[-1]
+
+    def login(self, user):
+        # A real token, so the authentication lookup is counted too
+        token = LibraryTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_me(self, size):
+        self.login(self.add_members(size))
+        return lambda: self.client.get("/api/auth/me/")
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    @query_budget(1, status=status.HTTP_200_OK)
+    def test_me_with_stateless_tokens(self, size):
+        self.login(self.add_members(size))
+        return lambda: self.client.get("/api/auth/me/")
+
+    @query_budget(2, status=status.HTTP_200_OK)
+    def test_count(self, size):
+        self.add_members(size)
+        self.login(self.admin)
+        return lambda: self.client.get("/api/auth/count/")
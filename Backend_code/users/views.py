@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from .serializers import RegisterSerializer
 from .models import User
+from .authentication import full_user
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 # Member Registration
@@ -27,7 +28,7 @@ class UserMeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = request.user
+        user = full_user(request)
         # Ensure superusers/staff are represented as ADMIN for frontend checks
         role = user.role
         if getattr(user, 'is_superuser', False) or getattr(user, 'is_staff', False):
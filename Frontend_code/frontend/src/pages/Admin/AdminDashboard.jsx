@@ -65,29 +65,28 @@ import { BookOpen, DollarSign, Zap, BarChart3 } from "lucide-react";
 import { Link } from "react-router-dom";
 
 export default function AdminDashboard() {
-  const [stats, setStats] = useState({ books: 0, issued: 0, fines: 0, totalTransactions: 0 });
+  const [stats, setStats] = useState({ books: 0, issued: 0, returned: 0, fines: 0, totalTransactions: 0 });
   const [loading, setLoading] = useState(true);
   const [transactions, setTransactions] = useState([]);
 
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        const [bookRes, transRes] = await Promise.all([
-          api.get("books/"),
-          api.get("transactions/all/")
+        // Totals come from one aggregate query, not from every transaction
+        const [bookRes, statsRes, recentRes] = await Promise.all([
+          api.get("books/count/"),
+          api.get("transactions/stats/"),
+          api.get("transactions/all/", { params: { page_size: 10 } })
         ]);
 
-        const transactionData = transRes.data;
-        const issuedCount = transactionData.filter(t => t.status === 'ISSUED').length;
-        const finesTotal = transactionData.reduce((sum, t) => sum + (t.fine_amount || 0), 0);
-
         setStats({
-          books: Array.isArray(bookRes.data) ? bookRes.data.length : bookRes.data.count || 0,
-          issued: issuedCount,
-          fines: finesTotal,
-          totalTransactions: transactionData.length
+          books: bookRes.data.count || 0,
+          issued: statsRes.data.issued,
+          returned: statsRes.data.returned,
+          fines: statsRes.data.fines,
+          totalTransactions: statsRes.data.total
         });
-        setTransactions(transactionData.slice(0, 10)); // Latest 10 transactions
+        setTransactions(recentRes.data.results); // Latest 10 transactions
       } catch (err) {
         console.error("Failed to fetch stats:", err);
       } finally {
@@ -99,13 +98,13 @@ export default function AdminDashboard() {
 
   const pieData = [
     { name: 'Issued', value: stats.issued },
-    { name: 'Returned', value: stats.totalTransactions - stats.issued },
+    { name: 'Returned', value: stats.returned },
   ];
   const COLORS = ["#0088FE", "#00C49F"];
 
   const statusData = [
     { status: 'ISSUED', count: stats.issued },
-    { status: 'RETURNED', count: stats.totalTransactions - stats.issued },
+    { status: 'RETURNED', count: stats.returned },
   ];
 
   if (loading) {
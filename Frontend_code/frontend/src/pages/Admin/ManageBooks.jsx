@@ -5,6 +5,8 @@ import Button from "../../components/Button";
 
 export default function ManageBooks() {
   const [books, setBooks] = useState([]);
+  const [next, setNext] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [title, setTitle] = useState("");
   const [author, setAuthor] = useState("");
   const [isbn, setIsbn] = useState("");
@@ -18,7 +20,8 @@ export default function ManageBooks() {
   const fetchBooks = async () => {
     try {
       const res = await api.get("books/");
-      setBooks(res.data);
+      setBooks(res.data.results);
+      setNext(res.data.next);
     } catch (err) {
       console.error("Failed to fetch books:", err);
       setError("Failed to load books");
@@ -31,6 +34,20 @@ export default function ManageBooks() {
     fetchBooks();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await api.get(next);
+      setBooks(prev => [...prev, ...res.data.results]);
+      setNext(res.data.next);
+    } catch (err) {
+      console.error("Failed to load more books:", err);
+      setError("Failed to load more books");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAddOrEdit = async e => {
     e.preventDefault();
     
@@ -248,6 +265,14 @@ export default function ManageBooks() {
         ))}
       </div>
 
+      {next && (
+        <div className="flex justify-center">
+          <Button onClick={loadMore} disabled={loadingMore} style="secondary">
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        </div>
+      )}
+
       {books.length === 0 && !loading && (
         <p className="text-center text-gray-400">No books found. Add some books to get started.</p>
       )}
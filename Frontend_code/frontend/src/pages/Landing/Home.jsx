@@ -209,7 +209,10 @@ export default function Home() {
                         <img
                           src={
                             book.cover_image
-                              ? `${import.meta.env.VITE_API_BASE_URL || "http://localhost:8000"}${book.cover_image}`
+                              ? `${import.meta.env.VITE_API_BASE_URL || "http://localhost:8000"}${
+                                  // 200px WebP thumbnail once generated, else the original
+                                  book.cover_variants?.["200"]?.webp || book.cover_image
+                                }`
                               : "/placeholder-book.svg"
                           }
                           alt={book.title}
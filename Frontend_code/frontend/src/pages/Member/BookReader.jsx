@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useMemo, useState } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import { Document, Page, pdfjs } from "react-pdf";
 import api from "../../services/api";
@@ -35,6 +35,16 @@ export default function BookReader() {
     setNumPages(numPages);
   };
 
+  // Streamed by the API with Range support, so pdf.js can show the first
+  // pages before the whole file has arrived
+  const pdfSource = useMemo(
+    () => ({
+      url: `${import.meta.env.VITE_API_BASE_URL || "http://localhost:8000"}/api/books/${bookId}/pdf/`,
+      httpHeaders: { Authorization: `Bearer ${localStorage.getItem("access_token")}` },
+    }),
+    [bookId]
+  );
+
   if (loading) {
     return (
       <div className="min-h-screen bg-gradient-to-b from-black via-gray-900 to-black flex justify-center items-center">
@@ -120,7 +130,7 @@ export default function BookReader() {
         </motion.div>
 
         {/* PDF Reader */}
-        {book.pdf_file ? (
+        {book.has_pdf ? (
           <motion.div
             initial={{ opacity: 0, y: 20 }}
             animate={{ opacity: 1, y: 0 }}
@@ -151,7 +161,7 @@ export default function BookReader() {
 
             <div className="overflow-auto max-h-[70vh] flex justify-center bg-black p-4">
               <Document
-                file={`${import.meta.env.VITE_API_BASE_URL || "http://localhost:8000"}${book.pdf_file}`}
+                file={pdfSource}
                 onLoadSuccess={onDocumentLoadSuccess}
                 onLoadError={(error) => {
                   console.error("Error loading PDF:", error);
@@ -7,18 +7,30 @@ import { Link } from "react-router-dom";
 
 export default function MemberDashboard() {
   const [transactions, setTransactions] = useState([]);
+  const [next, setNext] = useState(null);
+  const [stats, setStats] = useState({ total: 0, issued: 0, returned: 0 });
   const [totalFines, setTotalFines] = useState(0);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [returningTx, setReturningTx] = useState(null);
 
+  // Counts and fines of every loan, computed by the server
+  const fetchStats = async () => {
+    const res = await api.get("transactions/my-stats/");
+    setStats(res.data);
+    setTotalFines(Number(res.data.fines));
+  };
+
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const res = await api.get("transactions/my-history/");
-        setTransactions(res.data);
-        const fines = res.data.reduce((sum, t) => sum + (t.fine_amount || 0), 0);
-        setTotalFines(fines);
+        const [historyRes] = await Promise.all([
+          api.get("transactions/my-history/"),
+          fetchStats()
+        ]);
+        setTransactions(historyRes.data.results);
+        setNext(historyRes.data.next);
       } catch (err) {
         console.error("Failed to fetch dashboard data:", err);
         setError("Failed to load dashboard data");
@@ -29,6 +41,19 @@ export default function MemberDashboard() {
     fetchData();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await api.get(next);
+      setTransactions((prev) => [...prev, ...res.data.results]);
+      setNext(res.data.next);
+    } catch (err) {
+      console.error("Failed to load more transactions:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const chartData = transactions
     .filter(t => t.fine_amount > 0)
     .slice(0, 10)
@@ -37,8 +62,8 @@ export default function MemberDashboard() {
       fine: t.fine_amount,
     }));
 
-  const issuedCount = transactions.filter(t => t.status === 'ISSUED').length;
-  const returnedCount = transactions.filter(t => t.status === 'RETURNED').length;
+  const issuedCount = stats.issued;
+  const returnedCount = stats.returned;
 
   if (loading) {
     return (
@@ -132,7 +157,7 @@ export default function MemberDashboard() {
               <h3 className="text-sm font-semibold text-purple-100">Total Transactions</h3>
               <TrendingUp size={24} className="text-purple-200" />
             </div>
-            <p className="text-3xl font-bold">{transactions.length}</p>
+            <p className="text-3xl font-bold">{stats.total}</p>
             <p className="text-xs text-purple-100 mt-2">All time</p>
           </motion.div>
         </div>
@@ -191,6 +216,7 @@ export default function MemberDashboard() {
                                 const res = await api.post('transactions/return/', { transaction_id: t.id });
                                 // update transaction in local state
                                 setTransactions((prev) => prev.map(item => item.id === t.id ? res.data : item));
+                                fetchStats();
                                 alert('Book returned successfully');
                               } catch (err) {
                                 console.error('Return failed', err);
@@ -208,6 +234,15 @@ export default function MemberDashboard() {
                       </div>
                     </motion.div>
                   ))}
+                  {next && (
+                    <button
+                      onClick={loadMore}
+                      disabled={loadingMore}
+                      className="w-full py-2 text-sm font-semibold text-gray-300 hover:text-white transition-colors"
+                    >
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                  )}
                 </div>
               ) : (
                 <div className="text-center py-12">
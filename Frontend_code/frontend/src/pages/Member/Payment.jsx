@@ -6,7 +6,10 @@ import { Link } from "react-router-dom";
 
 export default function Payment() {
   const [transactions, setTransactions] = useState([]);
+  const [next, setNext] = useState(null);
+  const [summary, setSummary] = useState({ fined: 0, fines: 0 });
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [processingId, setProcessingId] = useState(null);
   const [successId, setSuccessId] = useState(null);
@@ -14,9 +17,14 @@ export default function Payment() {
   useEffect(() => {
     const fetchTransactions = async () => {
       try {
-        const res = await api.get("transactions/my-history/");
-        const unpaid = res.data.filter((t) => t.fine_amount > 0);
-        setTransactions(unpaid);
+        // Only the loans with a fine, one page at a time; the totals come from the server
+        const [historyRes, statsRes] = await Promise.all([
+          api.get("transactions/my-history/", { params: { fined: 1 } }),
+          api.get("transactions/my-stats/"),
+        ]);
+        setTransactions(historyRes.data.results);
+        setNext(historyRes.data.next);
+        setSummary({ fined: statsRes.data.fined, fines: Number(statsRes.data.fines) });
       } catch (err) {
         console.error("Failed to fetch transactions:", err);
         setError("Failed to load transactions");
@@ -27,13 +35,27 @@ export default function Payment() {
     fetchTransactions();
   }, []);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await api.get(next);
+      setTransactions((prev) => [...prev, ...res.data.results]);
+      setNext(res.data.next);
+    } catch (err) {
+      console.error("Failed to load more fines:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const payFine = async (id, amount) => {
     setProcessingId(id);
     try {
       await api.post("transactions/pay-fine/", { transaction_id: id, amount });
       setSuccessId(id);
       setTimeout(() => {
-        setTransactions(transactions.filter((t) => t.id !== id));
+        setTransactions((prev) => prev.filter((t) => t.id !== id));
+        setSummary((prev) => ({ fined: prev.fined - 1, fines: Math.round((prev.fines - Number(amount)) * 100) / 100 }));
         setSuccessId(null);
       }, 2000);
     } catch (err) {
@@ -44,7 +66,7 @@ export default function Payment() {
     }
   };
 
-  const totalFines = transactions.reduce((sum, t) => sum + t.fine_amount, 0);
+  const totalFines = summary.fines;
 
   if (loading) {
     return (
@@ -86,7 +108,7 @@ export default function Payment() {
         </motion.div>
 
         {/* Total Summary */}
-        {transactions.length > 0 && (
+        {summary.fined > 0 && (
           <motion.div
             initial={{ opacity: 0, y: 20 }}
             animate={{ opacity: 1, y: 0 }}
@@ -98,7 +120,7 @@ export default function Payment() {
                 <p className="text-red-100 text-sm mb-1">Total Amount Due</p>
                 <p className="text-4xl font-bold">Rs {totalFines}</p>
                 <p className="text-red-100 text-sm mt-2">
-                  {transactions.length} fine{transactions.length > 1 ? "s" : ""} pending
+                  {summary.fined} fine{summary.fined > 1 ? "s" : ""} pending
                 </p>
               </div>
               <DollarSign size={64} className="text-red-200 opacity-50" />
@@ -107,7 +129,7 @@ export default function Payment() {
         )}
 
         {/* Transactions List */}
-        {transactions.length > 0 ? (
+        {transactions.length > 0 || next ? (
           <div className="space-y-4">
             {transactions.map((t, index) => (
               <motion.div
@@ -197,6 +219,15 @@ export default function Payment() {
                 </div>
               </motion.div>
             ))}
+            {next && (
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="w-full py-3 rounded-lg font-semibold text-gray-300 hover:text-white border border-gray-700 hover:border-gray-500 transition-all"
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            )}
           </div>
         ) : (
           /* No Fines State */
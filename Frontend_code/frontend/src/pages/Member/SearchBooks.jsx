@@ -8,6 +8,11 @@ import { AuthContext } from "../../context/AuthContext";
 export default function SearchBooks() {
   const [books, setBooks] = useState([]);
   const [search, setSearch] = useState("");
+  // The text of the last full search; typing alone only fetches suggestions
+  const [query, setQuery] = useState("");
+  const [suggestions, setSuggestions] = useState([]);
+  // Corrected spelling offered by the typo-tolerant search
+  const [didYouMean, setDidYouMean] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const { user } = useContext(AuthContext);
@@ -33,9 +38,15 @@ export default function SearchBooks() {
     const fetchBooks = async () => {
       setLoading(true);
       setError(null);
+      setDidYouMean(null);
       try {
-        const res = await api.get(`books/?search=${search}`);
-        setBooks(res.data);
+        let res = await api.get("books/", { params: { search: query } });
+        if (query && res.data.results.length === 0) {
+          // Nothing matches as typed; try again allowing for typos
+          res = await api.get("books/", { params: { search: query, fuzzy: 1 } });
+          setDidYouMean(res.data.did_you_mean);
+        }
+        setBooks(res.data.results);
       } catch (err) {
         console.error("Failed to fetch books:", err);
         setError("Failed to load books");
@@ -44,10 +55,37 @@ export default function SearchBooks() {
       }
     };
 
-    // Debounce search
-    const timeoutId = setTimeout(() => fetchBooks(), 300);
-    return () => clearTimeout(timeoutId);
-  }, [search]);
+    fetchBooks();
+  }, [query]);
+
+  useEffect(() => {
+    if (!search.trim() || search === query) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const fetchSuggestions = async () => {
+      try {
+        const res = await api.get("books/autocomplete/", { params: { q: search } });
+        if (!cancelled) setSuggestions(res.data.results);
+      } catch (err) {
+        console.error("Failed to fetch suggestions:", err);
+      }
+    };
+
+    // Suggestions come from memory on the server, so a short debounce is enough
+    const timeoutId = setTimeout(() => fetchSuggestions(), 100);
+    return () => {
+      cancelled = true;
+      clearTimeout(timeoutId);
+    };
+  }, [search, query]);
+
+  const runSearch = (text) => {
+    setSearch(text);
+    setQuery(text);
+    setSuggestions([]);
+  };
 
   return (
     <div className="min-h-screen bg-gradient-to-b from-black via-gray-900 to-black text-white">
@@ -64,16 +102,37 @@ export default function SearchBooks() {
               placeholder="Search books by title, author, or category..."
               value={search}
               onChange={(e) => setSearch(e.target.value)}
+              onKeyDown={(e) => {
+                if (e.key === "Enter") runSearch(search);
+                if (e.key === "Escape") setSuggestions([]);
+              }}
               className="w-full pl-12 pr-4 py-3 bg-gray-800 border border-gray-700 rounded-lg focus:border-red-500 focus:outline-none focus:ring-2 focus:ring-red-500 focus:ring-opacity-50 text-white placeholder-gray-400 transition-all duration-200"
             />
             {search && (
               <button
-                onClick={() => setSearch("")}
+                onClick={() => runSearch("")}
                 className="absolute right-4 top-1/2 -translate-y-1/2 text-gray-400 hover:text-white transition-colors"
               >
                 <X size={20} />
               </button>
             )}
+
+            {/* Suggestions */}
+            {suggestions.length > 0 && (
+              <ul className="absolute left-0 right-0 mt-2 bg-gray-800 border border-gray-700 rounded-lg shadow-lg overflow-hidden">
+                {suggestions.map((suggestion) => (
+                  <li key={suggestion.id}>
+                    <button
+                      onClick={() => runSearch(suggestion.title)}
+                      className="w-full text-left px-4 py-2 hover:bg-gray-700 transition-colors"
+                    >
+                      <span className="font-semibold">{suggestion.title}</span>
+                      <span className="text-sm text-gray-400 ml-2">{suggestion.author}</span>
+                    </button>
+                  </li>
+                ))}
+              </ul>
+            )}
           </div>
         </div>
       </div>
@@ -108,6 +167,19 @@ export default function SearchBooks() {
           </motion.div>
         )}
 
+        {/* Spelling Suggestion */}
+        {!loading && didYouMean && (
+          <p className="text-gray-400 mb-6">
+            Showing results for{" "}
+            <button
+              onClick={() => runSearch(didYouMean)}
+              className="text-red-500 hover:text-red-400 font-semibold italic transition-colors"
+            >
+              {didYouMean}
+            </button>
+          </p>
+        )}
+
         {/* Books Grid */}
         {!loading && books.length > 0 && (
           <motion.div
@@ -182,15 +254,15 @@ export default function SearchBooks() {
         )}
 
         {/* Empty State */}
-        {!loading && !error && books.length === 0 && search && (
+        {!loading && !error && books.length === 0 && query && (
           <motion.div
             initial={{ opacity: 0, scale: 0.9 }}
             animate={{ opacity: 1, scale: 1 }}
             className="text-center py-20"
           >
-            <p className="text-gray-400 text-lg mb-4">No books found matching "{search}"</p>
+            <p className="text-gray-400 text-lg mb-4">No books found matching "{query}"</p>
             <button
-              onClick={() => setSearch("")}
+              onClick={() => runSearch("")}
               className="text-red-500 hover:text-red-400 font-semibold transition-colors"
             >
               Clear search
@@ -199,7 +271,7 @@ export default function SearchBooks() {
         )}
 
         {/* Initial State */}
-        {!loading && !error && books.length === 0 && !search && (
+        {!loading && !error && books.length === 0 && !query && (
           <motion.div
             initial={{ opacity: 0, scale: 0.9 }}
             animate={{ opacity: 1, scale: 1 }}
@@ -57,5 +57,4 @@ instance.interceptors.response.use(
   }
 );
 
-
 export default instance;